@@ -1,18 +1,20 @@
 from datetime import datetime
 import os
-from typing import Optional
 
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate, upgrade as migrate_upgrade
 from flask_login import LoginManager
-from sqlalchemy import event, text
+from jinja2 import FileSystemBytecodeCache
+from sqlalchemy import text
+from werkzeug.middleware.proxy_fix import ProxyFix
 
+from app.database import RoutingSession, configure_replicas, configure_sqlite, configure_pgbouncer
 from config import Config
 
 # Shared extensions
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 migrate = Migrate()
 login_manager = LoginManager()
 login_manager.login_view = "admin.login"
@@ -28,15 +30,10 @@ def _configure_postgres_schema(app: Flask) -> None:
         if engine.dialect.name != "postgresql":
             return
 
-        def _set_search_path(dbapi_connection, connection_record):  # pragma: no cover - driver integration
-            cursor = dbapi_connection.cursor()
-            cursor.execute(f'SET search_path TO "{schema}", public')
-            cursor.close()
-
-        event.listen(engine, "connect", _set_search_path)
-        with engine.connect() as connection:
+        # search_path is sent as a startup option (or tables are schema-qualified
+        # behind PgBouncer), so no per-connection SET round trip is needed.
+        with engine.begin() as connection:
             connection.execute(text(f'CREATE SCHEMA IF NOT EXISTS "{schema}"'))
-            connection.execute(text(f'SET search_path TO "{schema}", public'))
 
 
 def _run_database_migrations(app: Flask) -> None:
@@ -47,6 +44,13 @@ def _run_database_migrations(app: Flask) -> None:
         app.logger.info("Skipping automatic database upgrade due to AUTO_DB_UPGRADE=0")
         return
 
+    if app.config.get("TENANTS_FILE"):
+        from app.tenancy import migrate_tenants
+
+        migrate_tenants(app, jobs=app.config["TENANT_MIGRATION_JOBS"])
+        app.logger.info("Tenant schemas verified via automatic upgrade.")
+        return
+
     with app.app_context():
         try:
             migrate_upgrade()
@@ -56,37 +60,65 @@ def _run_database_migrations(app: Flask) -> None:
             raise
 
 
-def create_app() -> Flask:
+def _configure_template_cache(app: Flask) -> None:
+    # Compiled templates are shared on disk so each worker skips recompiling them at startup.
+    cache_dir = app.config.get("JINJA_CACHE_DIR")
+    if not cache_dir:
+        return
+    os.makedirs(cache_dir, exist_ok=True)
+    app.jinja_options = {**app.jinja_options, "bytecode_cache": FileSystemBytecodeCache(cache_dir)}
+
+
+def create_app(config_object: type = Config) -> Flask:
     app = Flask(__name__)
-    app.config.from_object(Config)
+    app.config.from_object(config_object)
+    _configure_template_cache(app)
+    proxies = app.config.get("PROXY_FIX_X_FOR", 0)
+    if proxies:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=proxies, x_proto=proxies)
 
     db.init_app(app)
     migrate.init_app(app, db)
     login_manager.init_app(app)
     _configure_postgres_schema(app)
+    configure_replicas(app, db)
+    configure_sqlite(app, db)
+    configure_pgbouncer(app, db)
+
+    from app.tenancy import init_tenancy, tenant_config
+
+    init_tenancy(app)
     _run_database_migrations(app)
 
-    from app.models import User  # noqa: WPS433 (import inside function to avoid circular import)
+    from app import changes  # noqa: F401 - registers the versioning and change-feed listeners
+    from app.auth import init_auth  # noqa: WPS433 (import inside function to avoid circular import)
 
-    @login_manager.user_loader
-    def load_user(user_id: str) -> Optional[User]:
-        if user_id is None:
-            return None
-        return User.query.get(int(user_id))
+    init_auth(app)
 
-    from app.routes import admin, assistant, main, shop
+    from app.routes import admin, assistant, health, main, shop
 
     app.register_blueprint(main.bp)
     app.register_blueprint(shop.bp)
     app.register_blueprint(admin.bp)
     app.register_blueprint(assistant.bp)
+    app.register_blueprint(health.bp)
+
+    from app.assets import init_assets, init_compression
+
+    init_assets(app)
+    init_compression(app)
+
+    from app.fragments import init_fragments
+
+    init_fragments(app)
 
     @app.context_processor
     def inject_globals():
+        config = tenant_config(app)
         return {
-            "shop_name": app.config.get("SHOP_NAME", "Voloskyi Saffron"),
-            "base_url": app.config.get("BASE_URL", ""),
-            "stripe_public_key": app.config.get("STRIPE_PUBLIC_KEY", ""),
+            "shop_name": config.get("SHOP_NAME", "Voloskyi Saffron"),
+            "base_url": config.get("BASE_URL", ""),
+            "stripe_public_key": config.get("STRIPE_PUBLIC_KEY", ""),
             "current_year": datetime.utcnow().year,
         }
 
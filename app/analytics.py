@@ -0,0 +1,223 @@
+import atexit
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import sqlalchemy as sa
+from flask import current_app, request
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app import db
+from app.models import BlogPost, DailyBlogStat, DailyProductStat, Product
+from app.tenancy import get_tenant, tenant_context, tenant_key
+
+logger = logging.getLogger(__name__)
+
+BOT_RE = re.compile(r"bot|crawl|spider|slurp|preview|monitor|curl|wget|python-requests", re.IGNORECASE)
+# An assistant recommendation is a stronger buying signal than a page view.
+MENTION_WEIGHT = 3
+POPULAR_LIMIT = 200
+# Past this many pending keys a failing database no longer gets its increments re-queued.
+MAX_PENDING_KEYS = 50000
+
+# (tenant key, model, day, entity_id, counter column) -> increment
+CounterKey = Tuple[str, type, object, int, str]
+
+_STAT_TABLES = {
+    DailyProductStat: (Product, "product_id", ("views", "mentions")),
+    DailyBlogStat: (BlogPost, "post_id", ("views",)),
+}
+
+
+class _Collector:
+    """Per-process view counters, flushed by a background thread as batched upserts."""
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.counts: Counter = Counter()
+        self.app = None
+        self.pid: Optional[int] = None
+
+    def add(self, keys: Iterable[CounterKey]) -> None:
+        with self.lock:
+            self.counts.update(keys)
+            if self.pid != os.getpid():
+                # First count in this process (or a forked worker): the parent's flusher thread did not survive.
+                self.pid = os.getpid()
+                self.app = current_app._get_current_object()
+                thread = threading.Thread(target=self._run, name="analytics-flusher", daemon=True)
+                thread.start()
+
+    def drain(self) -> Counter:
+        with self.lock:
+            pending, self.counts = self.counts, Counter()
+        return pending
+
+    def requeue(self, pending: Counter) -> None:
+        with self.lock:
+            if len(self.counts) + len(pending) <= MAX_PENDING_KEYS:
+                self.counts.update(pending)
+            else:
+                logger.warning("Dropping %s analytics increments; the buffer is full.", sum(pending.values()))
+
+    def _run(self) -> None:
+        interval = self.app.config["ANALYTICS_FLUSH_SECONDS"]
+        while True:
+            time.sleep(interval)
+            flush_analytics()
+
+
+_collector = _Collector()
+_popular_lock = threading.Lock()
+# tenant key -> {"ids", "expires_at"}
+_popular: Dict[str, Dict[str, object]] = {}
+
+
+def _should_count() -> bool:
+    if not current_app.config.get("ANALYTICS_ENABLED", True) or request.method != "GET":
+        return False
+    return not BOT_RE.search(request.user_agent.string or "")
+
+
+def count_product_view(product_id: int) -> None:
+    if _should_count():
+        _collector.add([(tenant_key(), DailyProductStat, datetime.utcnow().date(), product_id, "views")])
+
+
+def count_blog_view(post_id: int) -> None:
+    if _should_count():
+        _collector.add([(tenant_key(), DailyBlogStat, datetime.utcnow().date(), post_id, "views")])
+
+
+def count_mentions(product_ids: Iterable[int]) -> None:
+    if current_app.config.get("ANALYTICS_ENABLED", True):
+        today, shop = datetime.utcnow().date(), tenant_key()
+        _collector.add([(shop, DailyProductStat, today, product_id, "mentions") for product_id in product_ids])
+
+
+def _upsert(model, rows: List[Dict[str, object]]) -> None:
+    table = model.__table__
+    parent, key_column, counters = _STAT_TABLES[model]
+    existing = set(
+        db.session.scalars(sa.select(parent.id).where(parent.id.in_({row[key_column] for row in rows})))
+    )
+    rows = [row for row in rows if row[key_column] in existing]
+    if not rows:
+        return
+    insert = postgresql.insert if db.engine.dialect.name == "postgresql" else sqlite.insert
+    statement = insert(table)
+    statement = statement.on_conflict_do_update(
+        index_elements=[table.c.day, table.c[key_column]],
+        set_={column: table.c[column] + statement.excluded[column] for column in counters},
+    )
+    db.session.execute(statement, rows)
+
+
+def _flush_tenant(app, pending: Counter) -> int:
+    grouped: Dict[type, Dict[Tuple[object, int], Dict[str, object]]] = {}
+    for (_, model, day, entity_id, column), amount in pending.items():
+        _, key_column, counters = _STAT_TABLES[model]
+        row = grouped.setdefault(model, {}).get((day, entity_id))
+        if row is None:
+            row = {"day": day, key_column: entity_id, **{counter: 0 for counter in counters}}
+            grouped[model][(day, entity_id)] = row
+        row[column] += amount
+
+    with app.app_context():
+        try:
+            for model, rows in grouped.items():
+                _upsert(model, list(rows.values()))
+            db.session.commit()
+        except Exception as exc:  # pragma: no cover - defensive guard
+            db.session.rollback()
+            _collector.requeue(pending)
+            logger.exception("Flushing analytics failed: %s", exc)
+            return 0
+    return sum(pending.values())
+
+
+def flush_analytics() -> int:
+    pending = _collector.drain()
+    app = _collector.app
+    if not pending or app is None:
+        return 0
+
+    by_tenant: Dict[str, Counter] = {}
+    for key, amount in pending.items():
+        by_tenant.setdefault(key[0], Counter())[key] = amount
+    flushed = 0
+    for shop, counts in by_tenant.items():
+        tenant = get_tenant(shop, app) if shop else None
+        if shop and tenant is None:
+            continue  # the shop was removed from TENANTS_FILE
+        with tenant_context(tenant):
+            flushed += _flush_tenant(app, counts)
+    return flushed
+
+
+def popular_product_ids() -> List[int]:
+    shop = tenant_key()
+    cached = _popular.get(shop)
+    if cached is not None and cached["expires_at"] > time.monotonic():
+        return cached["ids"]
+    with _popular_lock:
+        cached = _popular.get(shop)
+        if cached is not None and cached["expires_at"] > time.monotonic():
+            return cached["ids"]
+        since = datetime.utcnow().date() - timedelta(days=current_app.config["ANALYTICS_POPULAR_DAYS"])
+        score = sa.func.sum(DailyProductStat.views + MENTION_WEIGHT * DailyProductStat.mentions)
+        ids = db.session.scalars(
+            sa.select(DailyProductStat.product_id)
+            .where(DailyProductStat.day >= since)
+            .group_by(DailyProductStat.product_id)
+            .order_by(score.desc(), DailyProductStat.product_id)
+            .limit(POPULAR_LIMIT)
+        ).all()
+        expires_at = time.monotonic() + current_app.config["ANALYTICS_POPULAR_TTL"]
+        _popular[shop] = {"ids": list(ids), "expires_at": expires_at}
+        return _popular[shop]["ids"]
+
+
+def popularity_order():
+    ranking = {product_id: rank for rank, product_id in enumerate(popular_product_ids())}
+    if not ranking:
+        return sa.literal(0)
+    return db.case(ranking, value=Product.id, else_=len(ranking))
+
+
+def popular_products(limit: int) -> List[Product]:
+    ids = popular_product_ids()
+    ranking = {product_id: rank for rank, product_id in enumerate(ids)}
+    products: List[Product] = []
+    if ids:
+        products = Product.query.filter(Product.id.in_(ids[: limit * 3]), Product.in_stock).all()
+        products = sorted(products, key=lambda product: ranking[product.id])[:limit]
+    if len(products) < limit:
+        # Not enough engagement yet (or top sellers sold out): top up with the newest products.
+        products += (
+            Product.query.filter(Product.in_stock, Product.id.notin_([product.id for product in products]))
+            .order_by(Product.created_at.desc())
+            .limit(limit - len(products))
+            .all()
+        )
+    return products
+
+
+def prune_analytics(app) -> None:
+    with app.app_context():
+        cutoff = datetime.utcnow().date() - timedelta(days=app.config["ANALYTICS_RETENTION_DAYS"])
+        try:
+            for model in _STAT_TABLES:
+                db.session.execute(sa.delete(model.__table__).where(model.__table__.c.day < cutoff))
+            db.session.commit()
+        except Exception as exc:  # pragma: no cover - defensive guard
+            db.session.rollback()
+            logger.exception("Pruning analytics failed: %s", exc)
+
+
+atexit.register(flush_analytics)
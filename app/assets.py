@@ -0,0 +1,158 @@
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+import tempfile
+from typing import Dict, Optional
+
+from flask import Flask, Response, request, send_from_directory
+
+try:  # Brotli is optional; gzip is always available.
+    import brotli
+except ImportError:  # pragma: no cover - depends on the deployment image
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+STATIC_MAX_AGE = 365 * 24 * 3600
+COMPRESSIBLE_EXTENSIONS = {".css", ".js", ".svg", ".json", ".txt", ".xml", ".html"}
+COMPRESSIBLE_MIMETYPES = {
+    "text/html",
+    "text/plain",
+    "text/css",
+    "text/xml",
+    "application/json",
+    "application/xml",
+    "application/javascript",
+    "image/svg+xml",
+}
+PRECOMPRESSED_SUFFIXES = (".gz", ".br")
+
+
+def _hashed_name(relative_path: str, digest: str) -> str:
+    root, extension = os.path.splitext(relative_path)
+    return f"{root}.{digest}{extension}"
+
+
+def _write_atomically(path: str, payload: bytes) -> None:
+    directory = os.path.dirname(path)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".asset-")
+    with os.fdopen(fd, "wb") as handle:
+        handle.write(payload)
+    os.replace(temp_path, path)
+
+
+def _precompress(path: str, payload: bytes) -> None:
+    # Variants are rebuilt only when missing or older than the source, so this runs once per deploy.
+    source_mtime = os.path.getmtime(path)
+    variants = {".gz": lambda data: gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants[".br"] = lambda data: brotli.compress(data, quality=11)
+    for suffix, compress in variants.items():
+        target = path + suffix
+        if os.path.exists(target) and os.path.getmtime(target) >= source_mtime:
+            continue
+        _write_atomically(target, compress(payload))
+
+
+def build_asset_manifest(static_folder: str) -> Dict[str, str]:
+    manifest: Dict[str, str] = {}
+    for directory, _, filenames in os.walk(static_folder):
+        for filename in filenames:
+            if filename.endswith(PRECOMPRESSED_SUFFIXES) or filename.startswith("."):
+                continue
+            path = os.path.join(directory, filename)
+            relative_path = os.path.relpath(path, static_folder).replace(os.sep, "/")
+            with open(path, "rb") as handle:
+                payload = handle.read()
+            manifest[relative_path] = _hashed_name(relative_path, hashlib.sha256(payload).hexdigest()[:12])
+            if os.path.splitext(filename)[1] in COMPRESSIBLE_EXTENSIONS:
+                try:
+                    _precompress(path, payload)
+                except OSError as exc:  # pragma: no cover - read-only deployments
+                    logger.warning("Could not precompress %s: %s", relative_path, exc)
+    return manifest
+
+
+def _guess_mimetype(filename: str) -> str:
+    return mimetypes.guess_type(filename)[0] or "application/octet-stream"
+
+
+def _accepts(encoding: str) -> bool:
+    # Membership alone would also match an explicit refusal such as "gzip;q=0".
+    return request.accept_encodings[encoding] > 0
+
+
+def init_assets(app: Flask) -> None:
+    if not app.static_folder or app.debug:
+        return
+
+    manifest = build_asset_manifest(app.static_folder)
+    originals = {hashed: original for original, hashed in manifest.items()}
+    static_folder = app.static_folder
+
+    @app.url_defaults
+    def _fingerprint_static_urls(endpoint: str, values: Dict[str, str]) -> None:
+        if endpoint == "static" and values.get("filename") in manifest:
+            values["filename"] = manifest[values["filename"]]
+
+    def serve_static(filename: str) -> Response:
+        original = originals.get(filename)
+        source = original or filename
+        encoded: Optional[str] = None
+        for encoding, suffix in (("br", ".br"), ("gzip", ".gz")):
+            if _accepts(encoding) and os.path.isfile(os.path.join(static_folder, source + suffix)):
+                encoded = encoding
+                break
+
+        if encoded:
+            suffix = ".br" if encoded == "br" else ".gz"
+            response = send_from_directory(static_folder, source + suffix, mimetype=_guess_mimetype(source))
+            response.content_encoding = encoded
+        else:
+            response = send_from_directory(static_folder, source)
+        response.vary.add("Accept-Encoding")
+        if original:
+            response.cache_control.no_cache = None
+            response.cache_control.public = True
+            response.cache_control.max_age = STATIC_MAX_AGE
+            response.cache_control.immutable = True
+        return response
+
+    app.view_functions["static"] = serve_static
+
+
+def init_compression(app: Flask) -> None:
+    min_size = app.config.get("COMPRESS_MIN_SIZE", 1024)
+
+    @app.after_request
+    def _compress_response(response: Response) -> Response:
+        if (
+            response.direct_passthrough
+            or response.is_streamed
+            or response.content_encoding
+            or response.status_code < 200
+            or response.status_code in (204, 304)
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES
+        ):
+            return response
+
+        payload = response.get_data()
+        if len(payload) < min_size:
+            return response
+
+        if brotli is not None and _accepts("br"):
+            response.set_data(brotli.compress(payload, quality=5))
+            response.content_encoding = "br"
+        elif _accepts("gzip"):
+            response.set_data(gzip.compress(payload, compresslevel=6))
+            response.content_encoding = "gzip"
+        else:
+            return response
+
+        response.vary.add("Accept-Encoding")
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
@@ -0,0 +1,194 @@
+import hashlib
+import hmac
+import secrets
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Deque, Dict, Optional, Tuple
+
+from flask import Flask, request, session
+from flask_login import UserMixin
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from app import db, login_manager
+from app.tenancy import tenant_key
+
+# Endpoints that serve files or blobs never look at the user; don't resolve one for them.
+USERLESS_ENDPOINTS = {
+    "static",
+    "health.healthz",
+    "health.readyz",
+    "shop.product_image",
+    "main.blog_image",
+    "main.download_document",
+    "main.robots",
+    "main.sitemap",
+}
+
+CSRF_SESSION_KEY = "_csrf_token"
+CSRF_FORM_FIELD = "csrf_token"
+
+# Verified against when the e-mail is unknown, so a miss costs as much as a wrong password.
+_DUMMY_HASH = generate_password_hash("not-a-real-password")
+
+PASSWORD_CHECK_WORKERS = 2
+
+_password_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def session_stamp(password_hash: str) -> str:
+    return hashlib.sha256(password_hash.encode("utf-8")).hexdigest()[:16]
+
+
+@dataclass(frozen=True)
+class SessionUser(UserMixin):
+    """Detached snapshot of an admin, safe to share between requests and threads."""
+
+    id: int
+    email: str
+    role: str
+    stamp: str
+
+    def get_id(self) -> str:
+        return f"{self.id}:{self.stamp}"
+
+
+class _UserCache:
+    def __init__(self, max_entries: int, ttl: float) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Tuple[str, int, str], Tuple[float, SessionUser]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple[str, int, str]) -> Optional[SessionUser]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, user = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return user
+
+    def put(self, key: Tuple[str, int, str], user: SessionUser) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, user)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class LoginThrottle:
+    """Sliding-window failure counter. State is per process: each gunicorn worker counts on its own."""
+
+    def __init__(self, max_attempts: int, window: float) -> None:
+        self.max_attempts = max_attempts
+        self.window = window
+        self._failures: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def _recent(self, key: str, now: float) -> Deque[float]:
+        failures = self._failures.setdefault(key, deque())
+        while failures and failures[0] <= now - self.window:
+            failures.popleft()
+        return failures
+
+    def retry_after(self, key: str) -> int:
+        now = time.monotonic()
+        with self._lock:
+            failures = self._recent(key, now)
+            if len(failures) < self.max_attempts:
+                return 0
+            return int(failures[0] + self.window - now) + 1
+
+    def failed(self, key: str) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._recent(key, now).append(now)
+            if len(self._failures) > 10_000:
+                # Drop idle keys so a spray of addresses cannot grow this without bound.
+                for stale in [k for k, v in self._failures.items() if not v]:
+                    del self._failures[stale]
+
+    def succeeded(self, key: str) -> None:
+        with self._lock:
+            self._failures.pop(key, None)
+
+
+# Entries are keyed by the password stamp, so a password change revokes old sessions once their
+# entry expires (AUTH_USER_CACHE_TTL) in every worker that had cached them.
+_user_cache = _UserCache(max_entries=128, ttl=60)
+login_throttle = LoginThrottle(max_attempts=5, window=300)
+address_throttle = LoginThrottle(max_attempts=50, window=300)
+
+
+def snapshot(user) -> SessionUser:
+    return SessionUser(id=user.id, email=user.email, role=user.role, stamp=session_stamp(user.password_hash))
+
+
+def load_session_user(session_id: str) -> Optional[SessionUser]:
+    if request.endpoint in USERLESS_ENDPOINTS:
+        return None
+    user_id, _, stamp = (session_id or "").partition(":")
+    if not user_id.isdigit() or not stamp:
+        return None
+
+    # User ids repeat across shops hosted in one process.
+    key = (tenant_key(), int(user_id), stamp)
+    cached = _user_cache.get(key)
+    if cached is not None:
+        return cached
+
+    from app.models import User  # noqa: WPS433 (import inside function to avoid circular import)
+
+    row = db.session.query(User.id, User.email, User.role, User.password_hash).filter(User.id == key[1]).first()
+    # A changed password changes the stamp, which revokes every session issued before it.
+    if row is None or session_stamp(row.password_hash) != stamp:
+        return None
+    user = SessionUser(id=row.id, email=row.email, role=row.role, stamp=stamp)
+    _user_cache.put(key, user)
+    return user
+
+
+def csrf_token() -> str:
+    """Per-session token for forms that change state; templates call it as ``csrf_token()``."""
+    token = session.get(CSRF_SESSION_KEY)
+    if token is None:
+        token = session[CSRF_SESSION_KEY] = secrets.token_urlsafe(32)
+    return token
+
+
+def csrf_valid() -> bool:
+    expected = session.get(CSRF_SESSION_KEY)
+    submitted = request.form.get(CSRF_FORM_FIELD, "")
+    return bool(expected) and hmac.compare_digest(expected, submitted)
+
+
+def verify_password(password_hash: Optional[str], password: str) -> bool:
+    # Hashing is deliberately slow; a small dedicated pool bounds how many run at once per worker.
+    future = _get_password_executor().submit(check_password_hash, password_hash or _DUMMY_HASH, password)
+    return future.result() and password_hash is not None
+
+
+def _get_password_executor() -> ThreadPoolExecutor:
+    global _password_executor
+    with _executor_lock:
+        if _password_executor is None:
+            _password_executor = ThreadPoolExecutor(max_workers=PASSWORD_CHECK_WORKERS, thread_name_prefix="password-check")
+        return _password_executor
+
+
+def init_auth(app: Flask) -> None:
+    _user_cache.max_entries = app.config["AUTH_USER_CACHE_SIZE"]
+    _user_cache.ttl = app.config["AUTH_USER_CACHE_TTL"]
+    login_throttle.max_attempts = app.config["LOGIN_MAX_ATTEMPTS"]
+    login_throttle.window = app.config["LOGIN_THROTTLE_WINDOW"]
+    address_throttle.max_attempts = app.config["LOGIN_MAX_ATTEMPTS_PER_ADDRESS"]
+    address_throttle.window = app.config["LOGIN_THROTTLE_WINDOW"]
+    login_manager.user_loader(load_session_user)
+    app.jinja_env.globals["csrf_token"] = csrf_token
@@ -0,0 +1,93 @@
+import math
+from datetime import datetime
+from decimal import Decimal
+from typing import Iterable, List, Optional
+
+import sqlalchemy as sa
+
+from app import db
+from app.changes import record_changes
+from app.models import BlogPost, Product
+from app.payments import queue_stripe_archive
+
+# Set-based statements: rows are never loaded into the session, so image blobs stay in the database.
+
+
+def _product_update(ids: List[int], **values) -> List[int]:
+    statement = (
+        sa.update(Product)
+        .where(Product.id.in_(ids))
+        .values(version=Product.version + 1, updated_at=datetime.utcnow(), **values)
+        .returning(Product.id, Product.version)
+        .execution_options(synchronize_session=False)
+    )
+    changed = db.session.execute(statement).all()
+    record_changes("product", changed, "update")
+    db.session.commit()
+    return [row.id for row in changed]
+
+
+def _price_display_expression(cents):
+    fraction = cents % 100
+    padding = db.case((fraction < 10, "0"), else_="")
+    return sa.literal("€") + sa.cast(cents // 100, db.String) + "." + padding + sa.cast(fraction, db.String)
+
+
+def _normalize_ids(ids: Iterable) -> List[int]:
+    return sorted({int(value) for value in ids if str(value).strip().isdigit()})
+
+
+def delete_products(ids: Iterable) -> int:
+    ids = _normalize_ids(ids)
+    if not ids:
+        return 0
+    statement = (
+        sa.delete(Product)
+        .where(Product.id.in_(ids))
+        .returning(Product.id, Product.version, Product.stripe_product_id, Product.stripe_payment_link_id)
+        .execution_options(synchronize_session=False)
+    )
+    deleted = db.session.execute(statement).all()
+    record_changes("product", [(row.id, row.version) for row in deleted], "delete")
+    queue_stripe_archive(db.session, deleted)
+    db.session.commit()
+    return len(deleted)
+
+
+def set_products_availability(ids: Iterable, available: bool) -> int:
+    ids = _normalize_ids(ids)
+    return len(_product_update(ids, is_available=available)) if ids else 0
+
+
+def set_products_category(ids: Iterable, category_id: Optional[int]) -> int:
+    ids = _normalize_ids(ids)
+    return len(_product_update(ids, category_id=category_id)) if ids else 0
+
+
+def reprice_products(ids: Iterable, percent: Decimal) -> int:
+    ids = _normalize_ids(ids)
+    if not ids:
+        return 0
+    if not math.isfinite(percent):
+        raise ValueError("Price change must be a finite percentage.")
+    if percent <= -100:
+        raise ValueError("Price change must be greater than -100%.")
+    factor = sa.literal((Decimal(100) + percent) / Decimal(100), sa.Numeric(12, 6))
+    new_cents = sa.cast(db.func.round(Product.price_cents * factor), db.Integer)
+    return len(_product_update(ids, price_cents=new_cents, price_display=_price_display_expression(new_cents)))
+
+
+def delete_blog_posts(ids: Iterable) -> int:
+    ids = _normalize_ids(ids)
+    if not ids:
+        return 0
+    statement = (
+        sa.delete(BlogPost)
+        .where(BlogPost.id.in_(ids))
+        .returning(BlogPost.id, BlogPost.version)
+        .execution_options(synchronize_session=False)
+    )
+    deleted = db.session.execute(statement).all()
+    record_changes("blog_post", deleted, "delete")
+    db.session.commit()
+    return len(deleted)
@@ -0,0 +1,283 @@
+import csv
+import io
+import json
+import logging
+import mimetypes
+import os
+import zipfile
+from dataclasses import dataclass, field
+from decimal import InvalidOperation
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import insert
+from werkzeug.datastructures import FileStorage
+from werkzeug.utils import secure_filename
+
+from app import db
+from app.changes import record_changes
+from app.images import describe_image
+from app.models import Category, Product, format_price, to_cents
+
+logger = logging.getLogger(__name__)
+
+IMPORT_BATCH_SIZE = 200
+# Image bytes are held in the batch until it is inserted; flush early rather than buffer 200 large images.
+IMPORT_BATCH_MAX_BYTES = 16 * 1024 * 1024
+MAX_REPORTED_ERRORS = 500
+EXPORT_FIELDS = ["title", "description", "price", "category", "is_available", "stock", "image"]
+TRUE_VALUES = {"1", "true", "yes", "y", "on"}
+FALSE_VALUES = {"0", "false", "no", "n", "off"}
+# Spreadsheets evaluate cells starting with these as formulas; exported text cells get a leading apostrophe.
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+@dataclass
+class ImportReport:
+    created: int = 0
+    rejected: int = 0
+    batches: int = 0
+    errors: List[str] = field(default_factory=list)
+    progress: List[str] = field(default_factory=list)
+
+    def reject(self, line: int, message: str) -> None:
+        self.rejected += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(f"Row {line}: {message}")
+
+    def committed(self, line: int, created: int) -> None:
+        self.created += created
+        self.batches += 1
+        self.progress.append(
+            f"Batch {self.batches}: {created} product(s) committed up to row {line}; "
+            f"{self.created} created and {self.rejected} rejected so far."
+        )
+
+
+def _iter_rows(upload: FileStorage) -> Iterator[Tuple[int, Any]]:
+    # Werkzeug has already spooled the upload; read it row by row instead of loading it whole.
+    text = io.TextIOWrapper(upload.stream, encoding="utf-8-sig", newline="")
+    if (upload.filename or "").lower().endswith((".jsonl", ".ndjson")):
+        for line_number, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield line_number, json.loads(line)
+            except ValueError:
+                yield line_number, None
+        return
+
+    reader = csv.DictReader(text)
+    for row in reader:
+        yield reader.line_num, row
+
+
+def _parse_bool(value: Any) -> bool:
+    if isinstance(value, bool):
+        return value
+    normalized = str(value if value is not None else "").strip().lower()
+    if not normalized or normalized in TRUE_VALUES:
+        return True
+    if normalized in FALSE_VALUES:
+        return False
+    raise ValueError(f"unrecognised availability {value!r}")
+
+
+def _parse_stock(value: Any) -> Optional[int]:
+    normalized = str(value if value is not None else "").strip()
+    if not normalized:
+        return None
+    if not normalized.isdigit():
+        raise ValueError(f"invalid stock {value!r}")
+    return int(normalized)
+
+
+class _ImageArchive:
+    def __init__(self, upload: Optional[FileStorage], max_bytes: int) -> None:
+        self._max_bytes = max_bytes
+        self._members: Dict[str, zipfile.ZipInfo] = {}
+        self._archive: Optional[zipfile.ZipFile] = None
+        if upload and upload.filename:
+            self._archive = zipfile.ZipFile(upload.stream)
+            for info in self._archive.infolist():
+                if not info.is_dir():
+                    self._members[os.path.basename(info.filename)] = info
+
+    def load(self, name: str) -> Tuple[bytes, str, str]:
+        info = self._members.get(os.path.basename(name))
+        if info is None or self._archive is None:
+            raise ValueError(f"image {name!r} not found in archive")
+        if info.file_size > self._max_bytes:
+            raise ValueError(f"image {name!r} is too large")
+        mimetype = mimetypes.guess_type(info.filename)[0] or ""
+        if not mimetype.startswith("image/"):
+            raise ValueError(f"{name!r} is not an image")
+        return self._archive.read(info), mimetype, secure_filename(os.path.basename(info.filename))
+
+
+def _text(value: Any) -> str:
+    # Undo the export's formula guard so an exported file imports back unchanged.
+    text = str(value or "")
+    if text.startswith("'") and text[1:2] and text[1] in FORMULA_PREFIXES:
+        return text[1:]
+    return text
+
+
+def _cell(value: str) -> str:
+    return f"'{value}" if value.startswith(FORMULA_PREFIXES) else value
+
+
+class _CategoryResolver:
+    def __init__(self) -> None:
+        self._by_name = {category.name.strip().lower(): category.id for category in Category.query.all()}
+
+    def resolve(self, value: Any) -> Optional[int]:
+        name = _text(value).strip()
+        if not name:
+            return None
+        key = name.lower()
+        if key not in self._by_name:
+            category = Category(name=name)
+            db.session.add(category)
+            db.session.flush()
+            self._by_name[key] = category.id
+        return self._by_name[key]
+
+
+def _build_mapping(row: Any, categories: _CategoryResolver, images: _ImageArchive) -> Dict[str, Any]:
+    if not isinstance(row, dict):
+        raise ValueError("malformed row")
+    title = _text(row.get("title")).strip()
+    if not title:
+        raise ValueError("title is required")
+    if len(title) > 150:
+        raise ValueError("title is longer than 150 characters")
+    price = row.get("price")
+    # to_cents() reads a missing price as zero; a product must never be imported free by accident.
+    if price is None or not str(price).strip():
+        raise ValueError("price is required")
+    try:
+        price_cents = to_cents(price)
+    except InvalidOperation:
+        raise ValueError(f"invalid price {price!r}") from None
+    if price_cents < 0:
+        raise ValueError("price cannot be negative")
+
+    # Every mapping carries the same keys so each batch is a single executemany.
+    mapping = {
+        "title": title,
+        "description": _text(row.get("description")),
+        "price_cents": price_cents,
+        "price_display": format_price(price_cents),
+        "is_available": _parse_bool(row.get("is_available")),
+        "stock": _parse_stock(row.get("stock")),
+        "category_id": None,
+        "image_data": None,
+        "image_mimetype": None,
+        "image_filename": None,
+        "image_width": None,
+        "image_height": None,
+        "image_color": None,
+        "image_placeholder": None,
+    }
+    image_name = _text(row.get("image")).strip()
+    if image_name:
+        mapping["image_data"], mapping["image_mimetype"], mapping["image_filename"] = images.load(image_name)
+        traits = describe_image(mapping["image_data"])
+        if traits:
+            mapping.update(
+                image_width=traits.width,
+                image_height=traits.height,
+                image_color=traits.color,
+                image_placeholder=traits.placeholder,
+            )
+    # Last, once the whole row is known to be valid, so a rejected row never leaves a new category behind.
+    mapping["category_id"] = categories.resolve(row.get("category"))
+    return mapping
+
+
+def _flush_batch(batch: List[Dict[str, Any]], line: int, report: ImportReport) -> None:
+    inserted = db.session.execute(insert(Product).returning(Product.id, Product.version), batch).all()
+    record_changes("product", inserted, "insert")
+    db.session.commit()
+    report.committed(line, len(inserted))
+
+
+def import_products(
+    upload: FileStorage,
+    images_upload: Optional[FileStorage] = None,
+    max_image_bytes: int = 3 * 1024 * 1024,
+    progress: Optional[Callable[[ImportReport], None]] = None,
+) -> ImportReport:
+    report = ImportReport()
+    images = _ImageArchive(images_upload, max_image_bytes)
+    categories = _CategoryResolver()
+    batch: List[Dict[str, Any]] = []
+    batch_bytes = 0
+    line_number = 0
+
+    for line_number, row in _iter_rows(upload):
+        try:
+            mapping = _build_mapping(row, categories, images)
+        except ValueError as exc:
+            report.reject(line_number, str(exc))
+            continue
+        batch.append(mapping)
+        batch_bytes += len(mapping["image_data"] or b"")
+        if len(batch) >= IMPORT_BATCH_SIZE or batch_bytes >= IMPORT_BATCH_MAX_BYTES:
+            _flush_batch(batch, line_number, report)
+            batch = []
+            batch_bytes = 0
+            if progress:
+                progress(report)
+
+    if batch:
+        _flush_batch(batch, line_number, report)
+        if progress:
+            progress(report)
+    return report
+
+
+def iter_products_csv() -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def drain() -> str:
+        chunk = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+        return chunk
+
+    writer.writerow(EXPORT_FIELDS)
+    yield drain()
+
+    rows = (
+        db.session.query(
+            Product.title,
+            Product.description,
+            Product.price_cents,
+            Category.name,
+            Product.is_available,
+            Product.stock,
+            Product.image_filename,
+        )
+        .outerjoin(Category, Product.category_id == Category.id)
+        .order_by(Product.id)
+        .yield_per(500)
+    )
+    for index, (title, description, price_cents, category_name, is_available, stock, image_filename) in enumerate(
+        rows, 1
+    ):
+        writer.writerow(
+            [
+                _cell(title),
+                _cell(description),
+                f"{price_cents // 100}.{price_cents % 100:02d}",
+                _cell(category_name or ""),
+                "1" if is_available else "0",
+                "" if stock is None else stock,
+                _cell(image_filename or ""),
+            ]
+        )
+        if index % 100 == 0:
+            yield drain()
+    yield drain()
@@ -0,0 +1,116 @@
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event, insert, select
+from sqlalchemy.orm import object_session
+
+from app import db
+from app.models import BlogPost, Category, ContentChange, Document, Product
+
+TRACKED_MODELS = {
+    Product: "product",
+    Category: "category",
+    BlogPost: "blog_post",
+    Document: "document",
+}
+
+
+def _log_change(connection, entity: str, entity_id: int, action: str, version: Any) -> None:
+    connection.execute(
+        insert(ContentChange.__table__).values(
+            entity=entity,
+            entity_id=entity_id,
+            action=action,
+            version=version,
+            changed_at=datetime.utcnow(),
+        )
+    )
+
+
+def record_changes(entity: str, rows: Iterable[Tuple[int, Optional[int]]], action: str) -> None:
+    """Log set-based writes that bypass the ORM events, in the caller's transaction.
+
+    ``rows`` are ``(id, version)`` pairs, as returned by ``RETURNING id, version``.
+    """
+    changed_at = datetime.utcnow()
+    values = [
+        {"entity": entity, "entity_id": entity_id, "action": action, "version": version, "changed_at": changed_at}
+        for entity_id, version in rows
+    ]
+    if values:
+        db.session.execute(insert(ContentChange.__table__), values)
+
+
+def settled_change_seq(settle_seconds: float) -> int:
+    """Highest seq a feed consumer may safely move its cursor to.
+
+    seq values are handed out at insert time but only become visible at commit, so on PostgreSQL a
+    transaction can commit a lower seq after a higher one has been read. The cursor therefore trails
+    the newest change by ``settle_seconds``: a change is never skipped unless the transaction that
+    logged it stayed open longer than that. SQLite serialises writers, so there seqs commit in order.
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=settle_seconds)
+    settled = db.session.query(db.func.max(ContentChange.seq)).filter(ContentChange.changed_at <= cutoff).scalar()
+    return settled or 0
+
+
+def changes_since(seq: int, upper: int, limit: int = 500) -> List[Dict[str, Any]]:
+    rows = (
+        ContentChange.query.filter(ContentChange.seq > seq, ContentChange.seq <= upper)
+        .order_by(ContentChange.seq.asc())
+        .limit(limit)
+        .all()
+    )
+    return [
+        {
+            "seq": row.seq,
+            "entity": row.entity,
+            "entity_id": row.entity_id,
+            "action": row.action,
+            "version": row.version,
+            "changed_at": row.changed_at.isoformat(),
+        }
+        for row in rows
+    ]
+
+
+def change_log_fingerprint() -> Tuple[int, int]:
+    """``(count, max seq)`` of the change log, which moves whenever a change commits.
+
+    The max seq alone misses a lower seq that commits late on PostgreSQL (see ``settled_change_seq``);
+    the count still grows.
+    """
+    count, latest = db.session.query(db.func.count(ContentChange.seq), db.func.max(ContentChange.seq)).one()
+    return count, latest or 0
+
+
+def _register(model, entity: str) -> None:
+    @event.listens_for(model, "before_update")
+    def _bump_version(mapper, connection, target):
+        session = object_session(target)
+        if session is not None and not session.is_modified(target, include_collections=False):
+            return
+        # Incremented by the UPDATE itself: two sessions that loaded the same version both count.
+        target.version = model.version + 1
+        target.updated_at = datetime.utcnow()
+
+    @event.listens_for(model, "after_update")
+    def _log_update(mapper, connection, target):
+        session = object_session(target)
+        if session is not None and not session.is_modified(target, include_collections=False):
+            return
+        # The ORM expires a version set by SQL expression, so the log reads it back from the updated row.
+        version = select(model.version).where(model.id == target.id).scalar_subquery()
+        _log_change(connection, entity, target.id, "update", version)
+
+    @event.listens_for(model, "after_insert")
+    def _log_insert(mapper, connection, target):
+        _log_change(connection, entity, target.id, "insert", target.version or 1)
+
+    @event.listens_for(model, "after_delete")
+    def _log_delete(mapper, connection, target):
+        _log_change(connection, entity, target.id, "delete", target.version)
+
+
+for _model, _entity in TRACKED_MODELS.items():
+    _register(_model, _entity)
@@ -0,0 +1,204 @@
+import logging
+import math
+import re
+from dataclasses import dataclass, field
+from html import escape
+from html.parser import HTMLParser
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from app import db
+from app.models import BlogPost
+
+logger = logging.getLogger(__name__)
+
+EXCERPT_LENGTH = 220
+META_DESCRIPTION_LENGTH = 160
+WORDS_PER_MINUTE = 200
+BACKFILL_BATCH_SIZE = 50
+META_PREFIX = "meta description:"
+
+ALLOWED_TAGS = {
+    "article", "section", "header", "footer", "div", "span",
+    "h1", "h2", "h3", "h4", "h5", "h6", "p", "blockquote", "pre", "code",
+    "ul", "ol", "li", "dl", "dt", "dd", "strong", "em", "b", "i", "u", "br", "hr",
+    "a", "img", "figure", "figcaption", "table", "thead", "tbody", "tr", "th", "td",
+}
+VOID_TAGS = {"br", "hr", "img"}
+DROPPED_WITH_CONTENT = {"script", "style", "iframe", "object", "embed", "noscript", "template", "head", "title"}
+BUFFERED_TAGS = {"p", "h1", "h2", "h3", "h4", "h5", "h6"}
+TOC_TAGS = {"h2", "h3"}
+SELF_CLOSING_SIBLINGS = {"p", "li"}
+ALLOWED_ATTRIBUTES = {
+    "a": {"href", "title"},
+    "img": {"src", "alt", "title", "width", "height"},
+    "th": {"colspan", "rowspan", "scope"},
+    "td": {"colspan", "rowspan"},
+}
+URL_ATTRIBUTES = {"href", "src"}
+SAFE_URL_SCHEMES = {"", "http", "https", "mailto"}
+CODE_FENCE_RE = re.compile(r"^```[a-zA-Z]*\s*|\s*```$")
+
+
+@dataclass
+class ProcessedArticle:
+    content: str
+    excerpt: str
+    meta_description: str
+    reading_minutes: int
+    toc: List[Dict[str, Any]] = field(default_factory=list)
+
+
+def _is_safe_url(value: str) -> bool:
+    compact = "".join(value.split()).lower()
+    return urlsplit(compact).scheme in SAFE_URL_SCHEMES
+
+
+def _truncate(text: str, limit: int) -> str:
+    if len(text) <= limit:
+        return text
+    return text[:limit].rsplit(" ", 1)[0].rstrip(",.;:") + "…"
+
+
+class _ArticleParser(HTMLParser):
+    """Single pass over the article: allow-list sanitising plus the metadata list pages need."""
+
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.parts: List[str] = []
+        self.meta_description = ""
+        self.paragraphs: List[str] = []
+        self.toc: List[Dict[str, Any]] = []
+        self.words = 0
+        self._open: List[str] = []
+        self._blocks: List[Dict[str, Any]] = []
+        self._skip_depth = 0
+        self._anchors: set = set()
+
+    def _emit(self, chunk: str) -> None:
+        (self._blocks[-1]["parts"] if self._blocks else self.parts).append(chunk)
+
+    def _attributes(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> str:
+        allowed = ALLOWED_ATTRIBUTES.get(tag, ())
+        rendered = []
+        for name, value in attrs:
+            if name not in allowed or value is None:
+                continue
+            if name in URL_ATTRIBUTES and not _is_safe_url(value):
+                continue
+            rendered.append(f' {name}="{escape(value)}"')
+        return "".join(rendered)
+
+    def _anchor(self, text: str) -> str:
+        base = re.sub(r"[^\w]+", "-", text.lower()).strip("-")[:60] or "section"
+        anchor, counter = base, 2
+        while anchor in self._anchors:
+            anchor, counter = f"{base}-{counter}", counter + 1
+        self._anchors.add(anchor)
+        return anchor
+
+    def handle_starttag(self, tag, attrs):
+        if tag in DROPPED_WITH_CONTENT:
+            self._skip_depth += 1
+            return
+        if self._skip_depth or tag not in ALLOWED_TAGS:
+            return
+        rendered_attrs = self._attributes(tag, attrs)
+        if tag in VOID_TAGS:
+            self._emit(f"<{tag}{rendered_attrs}>")
+            return
+        if tag in SELF_CLOSING_SIBLINGS and self._open and self._open[-1] == tag:
+            self._close(self._open.pop())
+        self._open.append(tag)
+        if tag in BUFFERED_TAGS:
+            self._blocks.append({"tag": tag, "attrs": rendered_attrs, "parts": [], "text": []})
+        else:
+            self._emit(f"<{tag}{rendered_attrs}>")
+
+    def handle_endtag(self, tag):
+        if tag in DROPPED_WITH_CONTENT:
+            self._skip_depth = max(self._skip_depth - 1, 0)
+            return
+        if self._skip_depth or tag not in self._open:
+            return
+        while self._open:
+            current = self._open.pop()
+            self._close(current)
+            if current == tag:
+                break
+
+    def handle_data(self, data):
+        if self._skip_depth:
+            return
+        stripped = " ".join(data.split())
+        if not self._blocks and stripped.lower().startswith(META_PREFIX):
+            self.meta_description = self.meta_description or stripped[len(META_PREFIX):].strip()
+            return
+        self.words += len(stripped.split())
+        if self._blocks:
+            self._blocks[-1]["text"].append(data)
+        self._emit(escape(data, quote=False))
+
+    def _close(self, tag: str) -> None:
+        if tag not in BUFFERED_TAGS:
+            self._emit(f"</{tag}>")
+            return
+        block = self._blocks.pop()
+        text = " ".join("".join(block["text"]).split())
+        if text.lower().startswith(META_PREFIX):
+            self.meta_description = self.meta_description or text[len(META_PREFIX):].strip()
+            return
+        attrs = block["attrs"]
+        if tag in TOC_TAGS and text:
+            anchor = self._anchor(text)
+            attrs += f' id="{anchor}"'
+            self.toc.append({"level": int(tag[1]), "id": anchor, "title": text})
+        elif tag == "p" and text:
+            self.paragraphs.append(text)
+        self._emit(f"<{tag}{attrs}>{''.join(block['parts'])}</{tag}>")
+
+    def close(self):
+        super().close()
+        while self._open:
+            self._close(self._open.pop())
+
+
+def process_article(raw_html: str) -> ProcessedArticle:
+    parser = _ArticleParser()
+    parser.feed(CODE_FENCE_RE.sub("", (raw_html or "").strip()))
+    parser.close()
+
+    excerpt = _truncate(" ".join(parser.paragraphs)[: EXCERPT_LENGTH * 2], EXCERPT_LENGTH)
+    meta_description = _truncate(parser.meta_description or excerpt, META_DESCRIPTION_LENGTH)
+    return ProcessedArticle(
+        content="".join(parser.parts).strip(),
+        excerpt=excerpt,
+        meta_description=meta_description,
+        reading_minutes=max(1, math.ceil(parser.words / WORDS_PER_MINUTE)),
+        toc=parser.toc,
+    )
+
+
+def apply_article(post: BlogPost, raw_html: str) -> None:
+    article = process_article(raw_html)
+    post.content = article.content
+    post.excerpt = article.excerpt
+    post.meta_description = article.meta_description
+    post.reading_minutes = article.reading_minutes
+    post.toc = article.toc
+
+
+def backfill_article_fields(app) -> None:
+    with app.app_context():
+        try:
+            while True:
+                posts = BlogPost.query.filter(BlogPost.excerpt.is_(None)).limit(BACKFILL_BATCH_SIZE).all()
+                if not posts:
+                    return
+                for post in posts:
+                    apply_article(post, post.content)
+                db.session.commit()
+                logger.info("Processed article fields for %s blog post(s).", len(posts))
+        except Exception as exc:  # pragma: no cover - defensive guard
+            db.session.rollback()
+            logger.exception("Blog article backfill failed: %s", exc)
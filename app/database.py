@@ -0,0 +1,285 @@
+import itertools
+import logging
+import threading
+import time
+import weakref
+from typing import Dict, List, Optional, Tuple
+
+import sqlalchemy as sa
+from flask import Flask, current_app, g, has_app_context, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, text
+from sqlalchemy.sql.expression import TextualSelect
+
+logger = logging.getLogger(__name__)
+
+_configured_apps: "weakref.WeakSet[Flask]" = weakref.WeakSet()
+
+REPLICA_BIND_PREFIX = "replica_"
+SQLITE_READER_BIND = "sqlite_reader"
+READ_ONLY_BLUEPRINTS = {"main", "shop", "assistant"}
+READ_ONLY_ENDPOINTS = {"assistant.ask"}
+STICKY_COOKIE = "db_primary_until"
+
+_replica_health: Dict[str, Tuple[bool, float]] = {}
+_replica_lock = threading.Lock()
+_replica_cycle = itertools.count()
+
+_REPLICA_LAG_SQL = {
+    "postgresql": text(
+        "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+        "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+    ),
+}
+
+
+def is_read_only_request() -> bool:
+    if not has_request_context():
+        return False
+    cached = g.get("db_read_only")
+    if cached is not None:
+        return cached
+    read_only = request.endpoint in READ_ONLY_ENDPOINTS or (
+        request.blueprint in READ_ONLY_BLUEPRINTS and request.method in ("GET", "HEAD")
+    )
+    if read_only:
+        sticky_until = request.cookies.get(STICKY_COOKIE, type=float)
+        if sticky_until and sticky_until > time.time():
+            read_only = False
+    g.db_read_only = read_only
+    return read_only
+
+
+def _replica_keys(engines) -> List[str]:
+    return sorted(key for key in engines if key and key.startswith(REPLICA_BIND_PREFIX))
+
+
+def _mark_replica(key: str, healthy: bool) -> None:
+    with _replica_lock:
+        _replica_health[key] = (healthy, time.monotonic())
+
+
+def _probe_replica(key: str, engine: sa.engine.Engine) -> bool:
+    max_lag = current_app.config.get("DB_REPLICA_MAX_LAG", 5)
+    lag_sql = _REPLICA_LAG_SQL.get(engine.dialect.name, text("SELECT 0"))
+    try:
+        with engine.connect() as connection:
+            lag = float(connection.execute(lag_sql).scalar() or 0)
+    except Exception as exc:  # pragma: no cover - depends on replica availability
+        logger.warning("Replica %s is unreachable, falling back to primary: %s", key, exc)
+        return False
+    if lag > max_lag:
+        logger.warning("Replica %s lags %.1fs behind primary, skipping it.", key, lag)
+        return False
+    return True
+
+
+def _replica_is_usable(key: str, engine: sa.engine.Engine) -> bool:
+    interval = current_app.config.get("DB_REPLICA_CHECK_INTERVAL", 5)
+    with _replica_lock:
+        healthy, checked_at = _replica_health.get(key, (False, float("-inf")))
+    if time.monotonic() - checked_at < interval:
+        return healthy
+    # Record the attempt first so concurrent requests do not all probe at once.
+    _mark_replica(key, healthy)
+    healthy = _probe_replica(key, engine)
+    _mark_replica(key, healthy)
+    return healthy
+
+
+def pick_replica(engines) -> Optional[sa.engine.Engine]:
+    keys = _replica_keys(engines)
+    if not keys:
+        return None
+    start = next(_replica_cycle)
+    for offset in range(len(keys)):
+        key = keys[(start + offset) % len(keys)]
+        if _replica_is_usable(key, engines[key]):
+            return engines[key]
+    return None
+
+
+def _is_read(clause) -> bool:
+    # Only expression-language SELECTs are known reads. text(), even text().columns() around an
+    # UPDATE ... RETURNING, and SELECT ... FOR UPDATE go to the writer: the reader is query_only.
+    return (
+        getattr(clause, "is_select", False)
+        and not isinstance(clause, TextualSelect)
+        and getattr(clause, "_for_update_arg", None) is None
+    )
+
+
+class RoutingSession(Session):
+    """Send reads of public read-only requests to a replica, everything else to the primary."""
+
+    _routing_wrote = False
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            if self._flushing or not _is_read(clause):
+                self._routing_wrote = True
+            elif not self._routing_wrote:
+                replica = self._replica_engine()
+                if replica is not None:
+                    return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _replica_engine(self) -> Optional[sa.engine.Engine]:
+        if not has_app_context():
+            return None
+        engines = self._db.engines
+        if SQLITE_READER_BIND in engines:
+            # Same file under WAL: readers see every commit at once, so any read may use the pool.
+            return engines[SQLITE_READER_BIND]
+        if not is_read_only_request():
+            return None
+        return pick_replica(engines)
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _remember_write(session: RoutingSession) -> None:
+    if session._routing_wrote and has_request_context():
+        g.db_sticky = True
+
+
+@event.listens_for(RoutingSession, "after_transaction_end")
+def _release_sqlite_writer(session: RoutingSession, transaction) -> None:
+    # Nothing lags behind a local WAL reader, so reads leave the single writer connection after each transaction.
+    if transaction.parent is None and has_app_context() and SQLITE_READER_BIND in session._db.engines:
+        session._routing_wrote = False
+
+
+def read_engine(db) -> sa.engine.Engine:
+    return db.engines.get(SQLITE_READER_BIND) or db.engine
+
+
+def dispose_engines_after_fork(db) -> None:
+    # Pooled connections inherited from the parent must never be used by the child.
+    for app in list(_configured_apps):
+        with app.app_context():
+            for engine in db.engines.values():
+                engine.dispose(close=False)
+
+
+def _sqlite_pragmas(config) -> List[str]:
+    return [
+        "PRAGMA synchronous=NORMAL",
+        f"PRAGMA busy_timeout={config['SQLITE_BUSY_TIMEOUT_MS']}",
+        f"PRAGMA cache_size=-{config['SQLITE_CACHE_SIZE_KB']}",
+        f"PRAGMA mmap_size={config['SQLITE_MMAP_SIZE']}",
+        "PRAGMA temp_store=MEMORY",
+    ]
+
+
+def configure_sqlite(app: Flask, db) -> None:
+    if not app.config.get("SQLITE_TUNED"):
+        return
+    with app.app_context():
+        writer = db.engine
+        reader = db.engines[SQLITE_READER_BIND]
+    pragmas = _sqlite_pragmas(app.config)
+    writer_pragmas = [
+        "PRAGMA journal_mode=WAL",
+        *pragmas,
+        f"PRAGMA journal_size_limit={app.config['SQLITE_JOURNAL_SIZE_LIMIT']}",
+        f"PRAGMA wal_autocheckpoint={app.config['SQLITE_WAL_AUTOCHECKPOINT']}",
+    ]
+
+    @event.listens_for(writer, "connect")
+    def _writer_connect(dbapi_connection, connection_record):
+        # The driver stays in autocommit; the begin hook below opens every transaction itself.
+        dbapi_connection.isolation_level = None
+        for pragma in writer_pragmas:
+            dbapi_connection.execute(pragma)
+
+    @event.listens_for(writer, "begin")
+    def _writer_begin(connection):
+        # Take the write lock up front so busy_timeout applies, rather than failing on a read-to-write upgrade.
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+
+    @event.listens_for(reader, "connect")
+    def _reader_connect(dbapi_connection, connection_record):
+        for pragma in (*pragmas, "PRAGMA query_only=ON"):
+            dbapi_connection.execute(pragma)
+
+
+def configure_pgbouncer(app: Flask, db) -> None:
+    if not app.config.get("DB_PGBOUNCER"):
+        return  # without PgBouncer both settings travel as startup options (config.py)
+    # Transaction pooling rejects startup options and drops session settings, so scope them to each transaction.
+    settings = []
+    if app.config.get("DB_SCHEMA"):
+        # Tables are schema-qualified already; this covers what the translate map misses (Alembic DDL, inspectors).
+        settings.append(f'SET LOCAL search_path TO "{app.config["DB_SCHEMA"]}", public')
+    if app.config.get("DB_STATEMENT_TIMEOUT_MS"):
+        settings.append(f"SET LOCAL statement_timeout = {int(app.config['DB_STATEMENT_TIMEOUT_MS'])}")
+    if not settings:
+        return
+    statement = "; ".join(settings)
+    with app.app_context():
+        engines = [engine for engine in db.engines.values() if engine.dialect.name == "postgresql"]
+
+    def _set_local(connection):
+        connection.exec_driver_sql(statement)
+
+    for engine in engines:
+        event.listen(engine, "begin", _set_local)
+
+
+def _run_on_writer(app: Flask, db, statements: List[str]) -> List[Tuple]:
+    # Raw driver calls: VACUUM and checkpoints must run outside the BEGIN IMMEDIATE that SQLAlchemy would open.
+    with app.app_context(), db.engine.connect() as connection:
+        driver_connection = connection.connection.driver_connection
+        return [driver_connection.execute(statement).fetchone() for statement in statements]
+
+
+def sqlite_checkpoint(app: Flask, db) -> None:
+    try:
+        (busy, wal_pages, checkpointed), = _run_on_writer(app, db, ["PRAGMA wal_checkpoint(TRUNCATE)"])
+    except Exception as exc:  # pragma: no cover - defensive guard
+        logger.exception("SQLite WAL checkpoint failed: %s", exc)
+        return
+    if busy:
+        logger.info("SQLite WAL checkpoint deferred by active readers (%s/%s pages).", checkpointed, wal_pages)
+
+
+def sqlite_maintenance(app: Flask, db) -> None:
+    try:
+        _run_on_writer(app, db, ["PRAGMA analysis_limit=1000", "ANALYZE"])
+        (page_count,), (freelist_count,) = _run_on_writer(app, db, ["PRAGMA page_count", "PRAGMA freelist_count"])
+        # Deleted blobs leave free pages behind; only rewrite the file once enough of it is dead space.
+        if page_count and freelist_count / page_count >= app.config["SQLITE_VACUUM_FREE_RATIO"]:
+            started = time.monotonic()
+            _run_on_writer(app, db, ["VACUUM", "PRAGMA wal_checkpoint(TRUNCATE)"])
+            logger.info(
+                "SQLite VACUUM reclaimed %s of %s pages in %.1fs.",
+                freelist_count,
+                page_count,
+                time.monotonic() - started,
+            )
+    except Exception as exc:  # pragma: no cover - defensive guard
+        logger.exception("SQLite maintenance failed: %s", exc)
+
+
+def configure_replicas(app: Flask, db) -> None:
+    _configured_apps.add(app)
+    with app.app_context():
+        keys = _replica_keys(db.engines)
+        for key in keys:
+
+            def _on_error(context, key=key):
+                if context.is_disconnect or isinstance(context.original_exception, sa.exc.OperationalError):
+                    _mark_replica(key, False)
+
+            event.listen(db.engines[key], "handle_error", _on_error)
+
+    if not keys:
+        return
+
+    @app.after_request
+    def _set_sticky_cookie(response):
+        # Read-your-writes: keep the writer on the primary until replicas catch up.
+        if g.get("db_sticky"):
+            ttl = app.config.get("DB_STICKY_SECONDS", 10)
+            response.set_cookie(STICKY_COOKIE, str(time.time() + ttl), max_age=ttl, httponly=True, samesite="Lax")
+        return response
@@ -0,0 +1,49 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable
+
+from flask import Flask, get_template_attribute
+from markupsafe import Markup
+
+from app.models import Product
+from app.tenancy import tenant_key
+
+CARD_TEMPLATE = "shop/_product_card.html"
+CARD_CACHE_SIZE = 2048
+CARD_VARIANTS: Dict[str, Dict[str, Any]] = {
+    "catalog": {},
+    "home": {
+        "heading_tag": "h3",
+        "heading_class": "h5 mb-2",
+        "text_class": "text-muted mb-3",
+        "excerpt": 150,
+        "cta": "Детальніше",
+    },
+}
+
+_cards: "OrderedDict[Hashable, Markup]" = OrderedDict()
+_cards_lock = threading.Lock()
+
+
+def render_product_card(product: Product, variant: str = "catalog") -> Markup:
+    # One LRU for every shop in the process; product ids repeat across shops, so the key carries the shop.
+    # image_width: the placeholder backfill writes traits without a version bump; keying on it retires the
+    # bare card in every worker, not just the one that ran the backfill.
+    key = (tenant_key(), variant, product.id, product.version, product.updated_at, product.image_width)
+    with _cards_lock:
+        card = _cards.get(key)
+        if card is not None:
+            _cards.move_to_end(key)
+            return card
+
+    macro = get_template_attribute(CARD_TEMPLATE, "product_card")
+    card = Markup(macro(product, **CARD_VARIANTS[variant]))
+    with _cards_lock:
+        _cards[key] = card
+        while len(_cards) > CARD_CACHE_SIZE:
+            _cards.popitem(last=False)
+    return card
+
+
+def init_fragments(app: Flask) -> None:
+    app.jinja_env.globals["product_card"] = render_product_card
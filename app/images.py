@@ -0,0 +1,206 @@
+import base64
+import binascii
+import io
+import logging
+import tempfile
+from dataclasses import dataclass
+from typing import IO, Dict, Optional, Tuple
+
+import sqlalchemy as sa
+
+try:  # Pillow is optional; without it images are stored as generated.
+    from PIL import Image, UnidentifiedImageError
+except ImportError:  # pragma: no cover - depends on the deployment image
+    Image = None
+
+from app import db
+from app.models import BlogPost, Product
+
+logger = logging.getLogger(__name__)
+
+DECODE_CHUNK_CHARS = 64 * 1024  # multiple of 4, so every chunk decodes on its own
+SPOOL_MAX_BYTES = 8 * 1024 * 1024
+OUTPUT_FORMATS: Dict[str, Tuple[str, str, str, Dict[str, object]]] = {
+    "webp": ("WEBP", "image/webp", ".webp", {"method": 6}),
+    "avif": ("AVIF", "image/avif", ".avif", {"speed": 6}),
+    "jpeg": ("JPEG", "image/jpeg", ".jpg", {"progressive": True, "optimize": True}),
+}
+# Longest edge of the inline placeholder; the browser's upscaling supplies the blur.
+PLACEHOLDER_EDGE = 16
+PLACEHOLDER_QUALITY = 40
+PALETTE_SAMPLE_EDGE = 64
+PALETTE_COLORS = 5
+
+
+@dataclass
+class EncodedImage:
+    data: bytes
+    mimetype: str
+    extension: str
+    original_size: int
+
+    @property
+    def saved_bytes(self) -> int:
+        return self.original_size - len(self.data)
+
+
+@dataclass
+class ImageTraits:
+    width: int
+    height: int
+    color: str
+    placeholder: str
+
+
+def describe_image(data: Optional[bytes]) -> Optional[ImageTraits]:
+    """Size, dominant colour and a tiny data URI preview, computed once at upload time."""
+    if Image is None or not data:
+        return None
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            width, height = image.size
+            # JPEG can decode straight at a fraction of full size; other formats ignore the hint.
+            image.draft("RGB", (PALETTE_SAMPLE_EDGE * 2, PALETTE_SAMPLE_EDGE * 2))
+            sample = image.convert("RGB")
+        sample.thumbnail((PALETTE_SAMPLE_EDGE, PALETTE_SAMPLE_EDGE))
+        quantized = sample.quantize(colors=PALETTE_COLORS)
+        _, index = max(quantized.getcolors())
+        red, green, blue = quantized.getpalette()[index * 3 : index * 3 + 3]
+
+        sample.thumbnail((PLACEHOLDER_EDGE, PLACEHOLDER_EDGE))
+        output = io.BytesIO()
+        try:
+            sample.save(output, format="WEBP", quality=PLACEHOLDER_QUALITY)
+            mimetype = "image/webp"
+        except (KeyError, OSError):  # pragma: no cover - Pillow built without WebP
+            output = io.BytesIO()
+            sample.save(output, format="JPEG", quality=PLACEHOLDER_QUALITY)
+            mimetype = "image/jpeg"
+    except (OSError, UnidentifiedImageError, ValueError) as exc:
+        logger.warning("Could not describe image: %s", exc)
+        return None
+    return ImageTraits(
+        width=width,
+        height=height,
+        color=f"#{red:02x}{green:02x}{blue:02x}",
+        placeholder=f"data:{mimetype};base64,{base64.b64encode(output.getvalue()).decode('ascii')}",
+    )
+
+
+def apply_image_traits(target, data: Optional[bytes]) -> None:
+    traits = describe_image(data)
+    target.image_width = traits.width if traits else None
+    target.image_height = traits.height if traits else None
+    target.image_color = traits.color if traits else None
+    target.image_placeholder = traits.placeholder if traits else None
+
+
+def backfill_image_traits(app, batch_size: int = 20) -> int:
+    if Image is None:
+        return 0
+    updated = 0
+    with app.app_context():
+        for model in (Product, BlogPost):
+            table = model.__table__
+            pending = db.session.scalars(
+                sa.select(table.c.id).where(table.c.image_data.isnot(None), table.c.image_width.is_(None))
+            ).all()
+            for start in range(0, len(pending), batch_size):
+                rows = db.session.execute(
+                    sa.select(table.c.id, table.c.image_data).where(table.c.id.in_(pending[start : start + batch_size]))
+                ).all()
+                values = []
+                for row_id, data in rows:
+                    traits = describe_image(data)
+                    if traits:
+                        values.append(
+                            {
+                                "row_id": row_id,
+                                "image_width": traits.width,
+                                "image_height": traits.height,
+                                "image_color": traits.color,
+                                "image_placeholder": traits.placeholder,
+                            }
+                        )
+                # Core update: derived display data must not bump the content version or the change feed.
+                if values:
+                    db.session.execute(
+                        sa.update(table)
+                        .where(table.c.id == sa.bindparam("row_id"))
+                        .values(
+                            image_width=sa.bindparam("image_width"),
+                            image_height=sa.bindparam("image_height"),
+                            image_color=sa.bindparam("image_color"),
+                            image_placeholder=sa.bindparam("image_placeholder"),
+                        ),
+                        values,
+                    )
+                db.session.commit()
+                updated += len(values)
+    if updated:
+        logger.info("Backfilled image placeholders for %s rows.", updated)
+    return updated
+
+
+def decode_base64(payload: str) -> IO[bytes]:
+    # Decode slice by slice into a spooled file rather than materialising a second full-size bytes copy.
+    buffer = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+    for start in range(0, len(payload), DECODE_CHUNK_CHARS):
+        buffer.write(base64.b64decode(payload[start : start + DECODE_CHUNK_CHARS], validate=True))
+    buffer.seek(0)
+    return buffer
+
+
+def transcode(source: IO[bytes], original_mimetype: str, target: str = "webp", quality: int = 80) -> EncodedImage:
+    source.seek(0, 2)
+    original_size = source.tell()
+    source.seek(0)
+    original_extension = "." + original_mimetype.rsplit("/", 1)[-1]
+
+    def passthrough() -> EncodedImage:
+        source.seek(0)
+        return EncodedImage(source.read(), original_mimetype, original_extension, original_size)
+
+    if Image is None or target not in OUTPUT_FORMATS:
+        return passthrough()
+
+    pil_format, mimetype, extension, options = OUTPUT_FORMATS[target]
+    try:
+        with Image.open(source) as image:
+            has_alpha = image.mode in ("RGBA", "LA") or "transparency" in image.info
+            if pil_format == "JPEG" and has_alpha:
+                flattened = Image.new("RGB", image.size, (255, 255, 255))
+                flattened.paste(image.convert("RGBA"), mask=image.convert("RGBA").split()[-1])
+                image = flattened
+            else:
+                image = image.convert("RGBA" if has_alpha else "RGB")
+            # convert() carries info over; drop EXIF/ICC/XMP so none of it is written back out.
+            image.info = {}
+            output = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+            image.save(output, format=pil_format, quality=quality, **options)
+    except (OSError, UnidentifiedImageError, ValueError) as exc:
+        logger.warning("Could not transcode %s image, keeping original: %s", original_mimetype, exc)
+        return passthrough()
+
+    if output.tell() >= original_size:
+        return passthrough()
+    output.seek(0)
+    return EncodedImage(output.read(), mimetype, extension, original_size)
+
+
+def ingest_base64_image(payload: str, original_mimetype: str, target: str = "webp", quality: int = 80) -> EncodedImage:
+    try:
+        source = decode_base64(payload)
+    except binascii.Error as exc:
+        raise ValueError(f"invalid base64 image payload: {exc}") from None
+    with source:
+        encoded = transcode(source, original_mimetype, target, quality)
+    if encoded.saved_bytes:
+        logger.info(
+            "Image transcoded to %s: %s -> %s bytes (%.0f%% saved).",
+            encoded.mimetype,
+            encoded.original_size,
+            len(encoded.data),
+            100 * encoded.saved_bytes / encoded.original_size,
+        )
+    return encoded
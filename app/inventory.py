@@ -0,0 +1,189 @@
+import logging
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import sqlalchemy as sa
+import stripe
+
+from app import db
+from app.models import Product, StockReservation
+from app.payments import expire_checkout_session, retrieve_checkout_session
+from app.tenancy import tenant_config
+
+logger = logging.getLogger(__name__)
+
+HELD = "held"
+COMPLETED = "completed"
+RELEASED = "released"
+# A 100% discount or free product completes with nothing to pay.
+PAID_STATUSES = ("paid", "no_payment_required")
+SWEEP_BATCH_SIZE = 50
+
+
+def reserve_stock(
+    product_id: int, quantity: int, ttl_minutes: int, client_address: Optional[str] = None
+) -> Optional[StockReservation]:
+    # The decrement and the availability check are one statement; concurrent buyers can never both win the last unit.
+    remaining = db.session.execute(
+        sa.update(Product)
+        .where(Product.id == product_id, Product.stock >= quantity)
+        .values(stock=Product.stock - quantity)
+        .returning(Product.stock)
+        .execution_options(synchronize_session=False)
+    ).scalar()
+    if remaining is None:
+        db.session.rollback()
+        return None
+
+    reservation = StockReservation(
+        token=str(uuid.uuid4()),
+        product_id=product_id,
+        quantity=quantity,
+        status=HELD,
+        expires_at=datetime.utcnow() + timedelta(minutes=ttl_minutes),
+        client_address=client_address,
+    )
+    db.session.add(reservation)
+    db.session.commit()
+    return reservation
+
+
+def open_reservations(client_address: str) -> int:
+    return (
+        db.session.query(sa.func.count(StockReservation.id))
+        .filter(
+            StockReservation.client_address == client_address,
+            StockReservation.status == HELD,
+            StockReservation.expires_at > datetime.utcnow(),
+        )
+        .scalar()
+    )
+
+
+def attach_checkout_session(token: str, checkout_session_id: str) -> None:
+    db.session.execute(
+        sa.update(StockReservation)
+        .where(StockReservation.token == token)
+        .values(checkout_session_id=checkout_session_id)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+
+
+def _restock(released: List[sa.Row]) -> None:
+    totals: Dict[int, int] = defaultdict(int)
+    for product_id, quantity in released:
+        totals[product_id] += quantity
+    if not totals:
+        return
+    # Core table update: an executemany on the ORM entity would switch to bulk-by-primary-key mode.
+    products = Product.__table__
+    db.session.execute(
+        sa.update(products)
+        .where(products.c.id == sa.bindparam("product_id"), products.c.stock.isnot(None))
+        .values(stock=products.c.stock + sa.bindparam("quantity")),
+        [{"product_id": product_id, "quantity": quantity} for product_id, quantity in totals.items()],
+    )
+
+
+def _finish(criterion, status: str) -> bool:
+    # Only a held reservation can change state, so a replayed redirect or a second sweep is a no-op.
+    row = db.session.execute(
+        sa.update(StockReservation)
+        .where(criterion, StockReservation.status == HELD)
+        .values(status=status)
+        .returning(StockReservation.product_id, StockReservation.quantity)
+        .execution_options(synchronize_session=False)
+    ).first()
+    if row is not None and status == RELEASED:
+        _restock([row])
+    db.session.commit()
+    return row is not None
+
+
+def release_reservation(token: str) -> bool:
+    """Give back a hold whose Checkout Session was never created."""
+    return _finish(StockReservation.token == token, RELEASED)
+
+
+def settle_checkout_session(checkout_session) -> Optional[str]:
+    """Complete or release the reservation paid for by a Checkout Session, from Stripe's own view of it.
+
+    Returns the reservation's new status, or None while the session can still be paid (or was already settled).
+    """
+    if checkout_session.payment_status in PAID_STATUSES:
+        status = COMPLETED
+    elif checkout_session.status == "expired":
+        status = RELEASED
+    else:
+        return None
+    return status if _finish(StockReservation.checkout_session_id == checkout_session.id, status) else None
+
+
+def confirm_checkout(config, checkout_session_id: str) -> Optional[str]:
+    """Settle a hold when the buyer lands on the success page; the session id alone proves nothing."""
+    if not _is_held(StockReservation.checkout_session_id == checkout_session_id):
+        return None
+    return settle_checkout_session(retrieve_checkout_session(config, checkout_session_id))
+
+
+def cancel_checkout(config, token: str) -> bool:
+    """Expire the buyer's session in Stripe first, so the released unit cannot be paid for from a stale tab."""
+    reservation = StockReservation.query.filter_by(token=token, status=HELD).first()
+    if reservation is None or reservation.checkout_session_id is None:
+        return False
+    try:
+        checkout_session = expire_checkout_session(config, reservation.checkout_session_id)
+    except stripe.StripeError as exc:
+        # Paid or expired in the meantime: the sweeper settles it from Stripe's answer.
+        logger.info("Could not expire checkout session %s: %s", reservation.checkout_session_id, exc)
+        return False
+    return settle_checkout_session(checkout_session) == RELEASED
+
+
+def _is_held(criterion) -> bool:
+    return db.session.query(StockReservation.query.filter(criterion, StockReservation.status == HELD).exists()).scalar()
+
+
+def _sweep(config, reservation: StockReservation) -> Optional[str]:
+    if reservation.checkout_session_id is None:
+        # Creating the session failed before Stripe handed out an id, so nothing can pay for this hold.
+        return RELEASED if _finish(StockReservation.id == reservation.id, RELEASED) else None
+    try:
+        checkout_session = retrieve_checkout_session(config, reservation.checkout_session_id)
+        if checkout_session.status == "open":
+            # The hold outlives the session, so this only happens with clock skew; close it before releasing.
+            checkout_session = expire_checkout_session(config, reservation.checkout_session_id)
+    except stripe.InvalidRequestError as exc:
+        if exc.http_status != 404:
+            raise
+        return RELEASED if _finish(StockReservation.id == reservation.id, RELEASED) else None
+    return settle_checkout_session(checkout_session)
+
+
+def release_expired_reservations(app) -> int:
+    """Settle holds past their expiry: released only once Stripe says their session expired unpaid."""
+    config = tenant_config(app)
+    with app.app_context():
+        expired = (
+            StockReservation.query.filter(
+                StockReservation.status == HELD, StockReservation.expires_at < datetime.utcnow()
+            )
+            .order_by(StockReservation.expires_at)
+            .limit(SWEEP_BATCH_SIZE)
+            .all()
+        )
+        settled: Dict[Optional[str], int] = defaultdict(int)
+        for reservation in expired:
+            try:
+                settled[_sweep(config, reservation)] += 1
+            except stripe.StripeError as exc:
+                db.session.rollback()
+                logger.warning("Checking checkout session %s failed: %s", reservation.checkout_session_id, exc)
+        if settled[RELEASED] or settled[COMPLETED]:
+            logger.info(
+                "Released %s expired stock reservation(s); %s had been paid.", settled[RELEASED], settled[COMPLETED]
+            )
+        return settled[RELEASED]
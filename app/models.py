@@ -1,9 +1,23 @@
 from datetime import datetime
+from decimal import ROUND_HALF_UP, Decimal
 
 from flask_login import UserMixin
+from sqlalchemy.ext.hybrid import hybrid_property
 from werkzeug.security import check_password_hash, generate_password_hash
 
 from app import db
+from app.auth import session_stamp
+
+CENTS = Decimal("0.01")
+
+
+def to_cents(value) -> int:
+    amount = Decimal(str(value or 0)).quantize(CENTS, rounding=ROUND_HALF_UP)
+    return int(amount * 100)
+
+
+def format_price(cents: int) -> str:
+    return f"€{cents // 100}.{cents % 100:02d}"
 
 
 class User(UserMixin, db.Model):
@@ -19,36 +33,137 @@ class User(UserMixin, db.Model):
     def check_password(self, password: str) -> bool:
         return check_password_hash(self.password_hash, password)
 
+    def get_id(self) -> str:
+        # Session ids carry a password stamp, so changing the password logs out every session.
+        return f"{self.id}:{session_stamp(self.password_hash)}"
+
 
 class Category(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(100), nullable=False)
+    name = db.Column(db.String(100), nullable=False, index=True)
     description = db.Column(db.Text, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    version = db.Column(db.Integer, default=1, nullable=False)
     products = db.relationship("Product", backref="category", lazy=True, cascade="all, delete-orphan")
 
 
 class Product(db.Model):
+    __table_args__ = (
+        db.Index(
+            "ix_product_available_created_at",
+            "created_at",
+            postgresql_where=db.text("is_available"),
+            sqlite_where=db.text("is_available = 1"),
+        ),
+        db.Index(
+            "ix_product_available_category_created_at",
+            "category_id",
+            "created_at",
+            postgresql_where=db.text("is_available"),
+            sqlite_where=db.text("is_available = 1"),
+        ),
+        db.Index(
+            "ix_product_available_price",
+            "price_cents",
+            postgresql_where=db.text("is_available"),
+            sqlite_where=db.text("is_available = 1"),
+        ),
+        db.Index(
+            "ix_product_available_category_price",
+            "category_id",
+            "price_cents",
+            postgresql_where=db.text("is_available"),
+            sqlite_where=db.text("is_available = 1"),
+        ),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(150), nullable=False)
     description = db.Column(db.Text, nullable=False)
-    price = db.Column(db.Float, nullable=False)
-    image_data = db.Column(db.LargeBinary, nullable=True)
+    price_cents = db.Column(db.Integer, nullable=False)
+    price_display = db.Column(db.String(32), nullable=False)
+    # Listings never need the blob itself; has_image answers the template's question in SQL.
+    image_data = db.deferred(db.Column(db.LargeBinary, nullable=True))
+    has_image = db.column_property(image_data.columns[0].isnot(None))
     image_mimetype = db.Column(db.String(255), nullable=True)
     image_filename = db.Column(db.String(255), nullable=True)
+    # Precomputed at upload so cards can paint a sized, coloured placeholder before the image loads.
+    image_width = db.Column(db.Integer, nullable=True)
+    image_height = db.Column(db.Integer, nullable=True)
+    image_color = db.Column(db.String(7), nullable=True)
+    image_placeholder = db.Column(db.Text, nullable=True)
     is_available = db.Column(db.Boolean, default=True, nullable=False)
-    category_id = db.Column(db.Integer, db.ForeignKey("category.id"), nullable=True)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    # NULL means the product is not stock-tracked; otherwise units left after open reservations.
+    stock = db.Column(db.Integer, nullable=True)
+    # Mirrors of the Stripe catalog, written by app.payments without bumping the content version.
+    stripe_product_id = db.Column(db.String(64), nullable=True)
+    stripe_price_id = db.Column(db.String(64), nullable=True)
+    stripe_price_cents = db.Column(db.Integer, nullable=True)
+    stripe_payment_link_id = db.Column(db.String(64), nullable=True)
+    stripe_payment_link_url = db.Column(db.String(255), nullable=True)
+    stripe_synced_version = db.Column(db.Integer, nullable=True)
+    # Failed syncs back off, so a product Stripe keeps rejecting cannot hold up the rest of the queue.
+    stripe_sync_attempts = db.Column(db.Integer, default=0, nullable=False)
+    stripe_sync_retry_at = db.Column(db.DateTime, nullable=True)
+    category_id = db.Column(db.Integer, db.ForeignKey("category.id"), nullable=True, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    version = db.Column(db.Integer, default=1, nullable=False)
+
+    @hybrid_property
+    def in_stock(self) -> bool:
+        return self.is_available and (self.stock is None or self.stock > 0)
+
+    @in_stock.expression
+    def in_stock(cls):
+        return db.and_(
+            cls.is_available == True,  # noqa: E712 - expressive equality check
+            db.or_(cls.stock.is_(None), cls.stock > 0),
+        )
+
+    @property
+    def price(self) -> Decimal:
+        return Decimal(self.price_cents or 0) / 100
+
+    @price.setter
+    def price(self, value) -> None:
+        self.price_cents = to_cents(value)
+        self.price_display = format_price(self.price_cents)
+
+    @property
+    def unit_amount(self) -> int:
+        # Stripe expects the smallest currency unit, which is exactly what we store.
+        return self.price_cents
 
 
 class BlogPost(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     content = db.Column(db.Text, nullable=False)
-    image_data = db.Column(db.LargeBinary, nullable=True)
+    excerpt = db.Column(db.String(300), nullable=True)
+    meta_description = db.Column(db.String(300), nullable=True)
+    reading_minutes = db.Column(db.Integer, nullable=True)
+    toc = db.Column(db.JSON, nullable=True)
+    image_data = db.deferred(db.Column(db.LargeBinary, nullable=True))
+    has_image = db.column_property(image_data.columns[0].isnot(None))
     image_mimetype = db.Column(db.String(255), nullable=True)
     image_filename = db.Column(db.String(255), nullable=True)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    image_width = db.Column(db.Integer, nullable=True)
+    image_height = db.Column(db.Integer, nullable=True)
+    image_color = db.Column(db.String(7), nullable=True)
+    image_placeholder = db.Column(db.Text, nullable=True)
+    is_pinned = db.Column(db.Boolean, default=False, nullable=False)
+    is_published = db.Column(db.Boolean, default=True, nullable=False)
+    publish_at = db.Column(db.DateTime, nullable=True)
+    editorial_date = db.Column(db.Date, nullable=True, unique=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    version = db.Column(db.Integer, default=1, nullable=False)
+
+    @classmethod
+    def published(cls):
+        return cls.query.filter(cls.is_published == True)  # noqa: E712 - expressive equality check
 
 
 class Document(db.Model):
@@ -58,4 +173,66 @@ class Document(db.Model):
     file_name = db.Column(db.String(255), nullable=False)
     file_mimetype = db.Column(db.String(255), nullable=False)
     file_data = db.Column(db.LargeBinary, nullable=False)
-    uploaded_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    uploaded_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    version = db.Column(db.Integer, default=1, nullable=False)
+
+
+class StockReservation(db.Model):
+    __table_args__ = (
+        db.Index("ix_stock_reservation_status_expires_at", "status", "expires_at"),
+        db.Index("ix_stock_reservation_client_address_status", "client_address", "status"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    token = db.Column(db.String(36), unique=True, nullable=False)
+    product_id = db.Column(db.Integer, db.ForeignKey("product.id", ondelete="CASCADE"), nullable=False, index=True)
+    quantity = db.Column(db.Integer, nullable=False)
+    status = db.Column(db.String(16), default="held", nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+    # The Stripe Checkout Session paying for it; its state, not the buyer's redirect, settles the hold.
+    checkout_session_id = db.Column(db.String(255), nullable=True, unique=True)
+    client_address = db.Column(db.String(45), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+
+class StripeArchive(db.Model):
+    # Stripe objects of locally deleted products, archived by the next catalog sync.
+    id = db.Column(db.Integer, primary_key=True)
+    stripe_product_id = db.Column(db.String(64), nullable=False)
+    stripe_payment_link_id = db.Column(db.String(64), nullable=True)
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    retry_at = db.Column(db.DateTime, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+
+class ProductRecommendation(db.Model):
+    # Precomputed neighbours per product; the primary key is exactly the product page's lookup order.
+    product_id = db.Column(db.Integer, db.ForeignKey("product.id", ondelete="CASCADE"), primary_key=True)
+    rank = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    recommended_id = db.Column(
+        db.Integer, db.ForeignKey("product.id", ondelete="CASCADE"), nullable=False, index=True
+    )
+    score = db.Column(db.Float, nullable=False)
+
+
+class DailyProductStat(db.Model):
+    day = db.Column(db.Date, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey("product.id", ondelete="CASCADE"), primary_key=True, index=True)
+    views = db.Column(db.Integer, default=0, nullable=False)
+    mentions = db.Column(db.Integer, default=0, nullable=False)
+
+
+class DailyBlogStat(db.Model):
+    day = db.Column(db.Date, primary_key=True)
+    post_id = db.Column(db.Integer, db.ForeignKey("blog_post.id", ondelete="CASCADE"), primary_key=True, index=True)
+    views = db.Column(db.Integer, default=0, nullable=False)
+
+
+class ContentChange(db.Model):
+    seq = db.Column(db.BigInteger().with_variant(db.Integer, "sqlite"), primary_key=True)
+    entity = db.Column(db.String(32), nullable=False)
+    entity_id = db.Column(db.Integer, nullable=False)
+    action = db.Column(db.String(16), nullable=False)
+    version = db.Column(db.Integer, nullable=True)
+    changed_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
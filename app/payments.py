@@ -0,0 +1,266 @@
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import sqlalchemy as sa
+import stripe
+from sqlalchemy import event
+
+from app import db
+from app.models import Product, StockReservation, StripeArchive
+from app.tenancy import tenant_config
+
+logger = logging.getLogger(__name__)
+
+SYNC_BATCH_SIZE = 20
+# Rows Stripe rejects wait 5 minutes, doubling per failure up to 6 hours.
+SYNC_RETRY_BASE = timedelta(minutes=5)
+SYNC_RETRY_MAX = timedelta(hours=6)
+
+_clients: Dict[Tuple[str, Optional[str]], stripe.StripeClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_stripe_client(config) -> stripe.StripeClient:
+    api_key = config.get("STRIPE_SECRET_KEY")
+    if not api_key:
+        raise RuntimeError("Stripe secret key is not configured.")
+    api_base = config.get("STRIPE_API_BASE") or None
+    key = (api_key, api_base)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            # RequestsClient keeps a pooled keep-alive session per thread; no per-click TLS handshakes.
+            client = stripe.StripeClient(
+                api_key,
+                http_client=stripe.RequestsClient(timeout=config["STRIPE_TIMEOUT"]),
+                max_network_retries=config["STRIPE_MAX_RETRIES"],
+                base_addresses={"api": api_base} if api_base else {},
+            )
+            _clients[key] = client
+        return client
+
+
+def _needs_sync():
+    return sa.or_(Product.stripe_synced_version.is_(None), Product.stripe_synced_version != Product.version)
+
+
+def _due(column, now: datetime):
+    return sa.or_(column.is_(None), column <= now)
+
+
+def _retry_at(attempts: int, now: datetime) -> datetime:
+    return now + min(SYNC_RETRY_BASE * 2 ** min(attempts - 1, 16), SYNC_RETRY_MAX)
+
+
+def _idempotency_scope(product: Product) -> str:
+    # SQLite hands a deleted row's id to the next insert; created_at tells the new product from the old one.
+    return f"{product.id}-{product.created_at:%Y%m%d%H%M%S%f}"
+
+
+def queue_stripe_archive(executor, rows: Iterable) -> None:
+    """Queue the Stripe objects of deleted products, in the caller's transaction.
+
+    ``rows`` need ``stripe_product_id`` and ``stripe_payment_link_id``; ``executor`` is a session or connection.
+    """
+    created_at = datetime.utcnow()
+    values = [
+        {
+            "stripe_product_id": row.stripe_product_id,
+            "stripe_payment_link_id": row.stripe_payment_link_id,
+            "attempts": 0,
+            "created_at": created_at,
+        }
+        for row in rows
+        if row.stripe_product_id
+    ]
+    if values:
+        executor.execute(sa.insert(StripeArchive.__table__), values)
+
+
+@event.listens_for(Product, "after_delete")
+def _archive_deleted_product(mapper, connection, target):
+    # ORM deletes, e.g. the category cascade; bulk_actions.delete_products queues its own rows.
+    queue_stripe_archive(connection, [target])
+
+
+def _sync_product(client: stripe.StripeClient, config, product: Product, values: Dict[str, Any]) -> None:
+    """Push one product to Stripe, collecting the columns to store in ``values`` as it goes."""
+    if product.stripe_product_id:
+        client.v1.products.update(
+            product.stripe_product_id, {"name": product.title, "active": bool(product.is_available)}
+        )
+        stripe_product_id = product.stripe_product_id
+    else:
+        stripe_product_id = client.v1.products.create(
+            {"name": product.title, "active": bool(product.is_available), "metadata": {"product_id": str(product.id)}},
+            {"idempotency_key": f"product-{_idempotency_scope(product)}"},
+        ).id
+        values["stripe_product_id"] = stripe_product_id
+
+    if product.stripe_price_id and product.stripe_price_cents == product.price_cents:
+        return
+
+    # Stripe prices are immutable: create the new one, then retire the old price and link.
+    price = client.v1.prices.create(
+        {"product": stripe_product_id, "currency": config["STRIPE_CURRENCY"], "unit_amount": product.price_cents},
+        {"idempotency_key": f"price-{_idempotency_scope(product)}-{product.price_cents}-{product.version}"},
+    )
+    client.v1.products.update(stripe_product_id, {"default_price": price.id})
+    if product.stripe_price_id:
+        client.v1.prices.update(product.stripe_price_id, {"active": False})
+    values.update(stripe_price_id=price.id, stripe_price_cents=product.price_cents)
+
+    base_url = (config.get("BASE_URL") or "").rstrip("/")
+    if config["STRIPE_PAYMENT_LINKS"] and base_url:
+        if product.stripe_payment_link_id:
+            client.v1.payment_links.update(product.stripe_payment_link_id, {"active": False})
+        link = client.v1.payment_links.create(
+            {
+                "line_items": [{"price": price.id, "quantity": 1}],
+                "after_completion": {"type": "redirect", "redirect": {"url": f"{base_url}/shop/success"}},
+            }
+        )
+        values.update(stripe_payment_link_id=link.id, stripe_payment_link_url=link.url)
+
+
+def _archive(client: stripe.StripeClient, entry: StripeArchive) -> None:
+    if entry.stripe_payment_link_id:
+        client.v1.payment_links.update(entry.stripe_payment_link_id, {"active": False})
+    # An archived product's prices cannot be used in new checkouts, so the price can stay as it is.
+    client.v1.products.update(entry.stripe_product_id, {"active": False})
+
+
+def _sync_products(client: stripe.StripeClient, config, now: datetime) -> int:
+    products = (
+        Product.query.options(db.defer(Product.description))
+        .filter(_needs_sync(), _due(Product.stripe_sync_retry_at, now))
+        .order_by(Product.id)
+        .limit(SYNC_BATCH_SIZE)
+        .all()
+    )
+    synced = 0
+    for product in products:
+        values: Dict[str, Any] = {}
+        try:
+            _sync_product(client, config, product, values)
+        except stripe.StripeError as exc:
+            attempts = product.stripe_sync_attempts + 1
+            logger.warning("Stripe sync failed for product %s (attempt %s): %s", product.id, attempts, exc)
+            # Keep a Stripe product created before the failure: idempotency keys expire after 24 hours.
+            values = {key: values[key] for key in ("stripe_product_id",) if key in values}
+            values.update(stripe_sync_attempts=attempts, stripe_sync_retry_at=_retry_at(attempts, now))
+        else:
+            values.update(stripe_synced_version=product.version, stripe_sync_attempts=0, stripe_sync_retry_at=None)
+            synced += 1
+        # Core UPDATE on purpose: Stripe ids are integration state, not content, so no version bump.
+        result = db.session.execute(
+            sa.update(Product)
+            .where(Product.id == product.id, Product.created_at == product.created_at)
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+        if not result.rowcount and "stripe_product_id" in values:
+            # Deleted (and maybe its id reused) while we were creating it in Stripe.
+            created = SimpleNamespace(
+                stripe_product_id=values["stripe_product_id"],
+                stripe_payment_link_id=values.get("stripe_payment_link_id"),
+            )
+            queue_stripe_archive(db.session, [created])
+        db.session.commit()
+    return synced
+
+
+def _archive_deleted(client: stripe.StripeClient, now: datetime) -> int:
+    entries = (
+        StripeArchive.query.filter(_due(StripeArchive.retry_at, now))
+        .order_by(StripeArchive.id)
+        .limit(SYNC_BATCH_SIZE)
+        .all()
+    )
+    archived = 0
+    for entry in entries:
+        try:
+            _archive(client, entry)
+        except stripe.StripeError as exc:
+            entry.attempts += 1
+            entry.retry_at = _retry_at(entry.attempts, now)
+            logger.warning(
+                "Archiving Stripe product %s failed (attempt %s): %s", entry.stripe_product_id, entry.attempts, exc
+            )
+        else:
+            db.session.delete(entry)
+            archived += 1
+        db.session.commit()
+    return archived
+
+
+def sync_stripe_catalog(app) -> int:
+    config = tenant_config(app)
+    with app.app_context():
+        if not config.get("STRIPE_SECRET_KEY") or not config["STRIPE_SYNC_ENABLED"]:
+            return 0
+        client = get_stripe_client(config)
+        now = datetime.utcnow()
+        synced = _sync_products(client, config, now)
+        archived = _archive_deleted(client, now)
+        if synced or archived:
+            logger.info("Synced %s product(s) to Stripe and archived %s deleted one(s).", synced, archived)
+        return synced + archived
+
+
+def is_synced(product: Product) -> bool:
+    return bool(product.stripe_price_id) and product.stripe_synced_version == product.version
+
+
+def create_checkout_url(
+    config,
+    product: Product,
+    success_url: str,
+    cancel_url: str,
+    reservation: Optional[StockReservation] = None,
+) -> Tuple[str, Optional[str]]:
+    """Return the URL to send the buyer to and the Checkout Session id (None for a Payment Link)."""
+    # Payment Links cannot expire with a stock reservation, so tracked products always get a session.
+    if reservation is None and is_synced(product) and product.stripe_payment_link_url:
+        return product.stripe_payment_link_url, None
+
+    if is_synced(product):
+        line_item: Dict[str, Any] = {"price": product.stripe_price_id, "quantity": 1}
+    else:
+        # Not synced yet (new or just edited): fall back to inline price data so checkout never waits.
+        line_item = {
+            "price_data": {
+                "currency": config["STRIPE_CURRENCY"],
+                "product_data": {"name": product.title},
+                "unit_amount": product.unit_amount,
+            },
+            "quantity": 1,
+        }
+    params: Dict[str, Any] = {
+        "payment_method_types": ["card"],
+        "line_items": [line_item],
+        "mode": "payment",
+        "success_url": success_url,
+        "cancel_url": cancel_url,
+    }
+    if reservation is not None:
+        line_item["quantity"] = reservation.quantity
+        params["client_reference_id"] = reservation.token
+        params["metadata"] = {"reservation": reservation.token}
+        # Counted from now, not from the hold: Stripe rejects sessions shorter than 30 minutes, and the
+        # hold is at least a minute longer, so the session always dies first.
+        params["expires_at"] = int(time.time()) + config["STRIPE_CHECKOUT_MINUTES"] * 60
+    session = get_stripe_client(config).v1.checkout.sessions.create(params)
+    return session.url, session.id
+
+
+def retrieve_checkout_session(config, session_id: str):
+    return get_stripe_client(config).v1.checkout.sessions.retrieve(session_id)
+
+
+def expire_checkout_session(config, session_id: str):
+    return get_stripe_client(config).v1.checkout.sessions.expire(session_id)
@@ -0,0 +1,291 @@
+import logging
+import math
+import re
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import sqlalchemy as sa
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:  # pragma: no cover - recommendations are optional
+    np = None
+    sparse = None
+
+from app import db
+from app.changes import settled_change_seq
+from app.models import ContentChange, Product, ProductRecommendation
+from app.tenancy import tenant_key
+
+logger = logging.getLogger(__name__)
+
+# Letters only, so prices, weights and SKUs in descriptions don't become shared "terms".
+TOKEN_RE = re.compile(r"[^\W\d_]{2,}")
+STOP_WORDS = frozenset(
+    "a an and are as at be by for from has in is it its of on or our per that the this to with you your".split()
+)
+TITLE_WEIGHT = 2
+BLOCK_ROWS = 256
+# Past this share of the catalog an incremental pass costs about as much as a rebuild.
+REBUILD_FRACTION = 0.25
+
+Neighbours = Dict[int, List[Tuple[int, float]]]
+
+_lock = threading.Lock()
+# tenant key -> {"index", "cursor", "built_at"}; each shop keeps its own index in memory.
+_states: Dict[str, Dict[str, object]] = {}
+
+
+@dataclass
+class _CatalogIndex:
+    ids: "np.ndarray"
+    vectors: "sparse.csr_matrix"
+    categories: "np.ndarray"
+    prices: "np.ndarray"
+    candidates: "np.ndarray"
+    vocabulary: Dict[str, int]
+    idf: "np.ndarray"
+    neighbours: Neighbours = field(default_factory=dict)
+
+    def positions(self, product_ids: Iterable[int]) -> List[int]:
+        lookup = {product_id: position for position, product_id in enumerate(self.ids.tolist())}
+        return [lookup[product_id] for product_id in product_ids if product_id in lookup]
+
+
+def _terms(title: str, description: str) -> Counter:
+    counts: Counter = Counter()
+    for weight, text in ((TITLE_WEIGHT, title), (1, description)):
+        for token in TOKEN_RE.findall((text or "").lower()):
+            if token not in STOP_WORDS:
+                counts[token] += weight
+    return counts
+
+
+def _load_rows(product_ids: Optional[Set[int]] = None) -> List[sa.Row]:
+    query = sa.select(
+        Product.id, Product.title, Product.description, Product.category_id, Product.price_cents, Product.is_available
+    ).order_by(Product.id)
+    if product_ids is not None:
+        query = query.where(Product.id.in_(product_ids))
+    return db.session.execute(query).all()
+
+
+def _vectorize(term_counts: List[Counter], vocabulary: Dict[str, int], idf: "np.ndarray") -> "sparse.csr_matrix":
+    indptr, indices, values = [0], [], []
+    for counts in term_counts:
+        for term, count in counts.items():
+            column = vocabulary.get(term)
+            if column is not None:
+                indices.append(column)
+                values.append(1.0 + math.log(count))
+        indptr.append(len(indices))
+    matrix = sparse.csr_matrix(
+        (np.asarray(values, dtype=np.float64), np.asarray(indices, dtype=np.int64), np.asarray(indptr, dtype=np.int64)),
+        shape=(len(term_counts), len(vocabulary)),
+    )
+    matrix = matrix.multiply(idf).tocsr()
+    norms = np.sqrt(matrix.multiply(matrix).sum(axis=1)).A1
+    norms[norms == 0] = 1.0
+    return sparse.diags(1.0 / norms) @ matrix
+
+
+def _columns(rows: List[sa.Row]) -> Tuple["np.ndarray", "np.ndarray", "np.ndarray", "np.ndarray"]:
+    ids = np.asarray([row.id for row in rows], dtype=np.int64)
+    categories = np.asarray([row.category_id if row.category_id is not None else -1 for row in rows], dtype=np.int64)
+    prices = np.asarray([max(row.price_cents or 0, 1) for row in rows], dtype=np.float64)
+    candidates = np.asarray([bool(row.is_available) for row in rows], dtype=bool)
+    return ids, categories, prices, candidates
+
+
+def _fit(rows: List[sa.Row]) -> _CatalogIndex:
+    term_counts = [_terms(row.title, row.description) for row in rows]
+    document_frequency: Counter = Counter()
+    for counts in term_counts:
+        document_frequency.update(counts.keys())
+    vocabulary = {term: column for column, term in enumerate(sorted(document_frequency))}
+    frequencies = np.asarray([document_frequency[term] for term in sorted(document_frequency)], dtype=np.float64)
+    idf = np.log((1.0 + len(rows)) / (1.0 + frequencies)) + 1.0
+    ids, categories, prices, candidates = _columns(rows)
+    return _CatalogIndex(ids, _vectorize(term_counts, vocabulary, idf), categories, prices, candidates, vocabulary, idf)
+
+
+def _blend(index: _CatalogIndex, positions: List[int], weights: Tuple[float, float, float]) -> "np.ndarray":
+    # Every component is symmetric, so row d of the block also holds d's score in every other product's list.
+    text_weight, category_weight, price_weight = weights
+    text = (index.vectors[positions] @ index.vectors.T).toarray()
+    categories = index.categories[positions][:, None]
+    same_category = (categories == index.categories[None, :]) & (categories >= 0)
+    prices = index.prices[positions][:, None]
+    price_proximity = np.minimum(prices, index.prices[None, :]) / np.maximum(prices, index.prices[None, :])
+    return text_weight * text + category_weight * same_category + price_weight * price_proximity
+
+
+def _rank(index: _CatalogIndex, positions: List[int], scores: "np.ndarray", top_n: int) -> Neighbours:
+    ranked = np.where(index.candidates[None, :], scores, -np.inf)
+    ranked[np.arange(len(positions)), positions] = -np.inf
+    limit = min(top_n, max(len(index.ids) - 1, 0))
+    neighbours: Neighbours = {}
+    for row, position in enumerate(positions):
+        if limit:
+            best = np.argpartition(-ranked[row], limit - 1)[:limit]
+            best = best[np.argsort(-ranked[row][best], kind="stable")]
+        else:
+            best = []
+        neighbours[int(index.ids[position])] = [
+            (int(index.ids[column]), float(ranked[row][column])) for column in best if np.isfinite(ranked[row][column])
+        ]
+    return neighbours
+
+
+def _neighbours(index: _CatalogIndex, positions: List[int], config) -> Neighbours:
+    weights = (
+        config["RECOMMENDATIONS_TEXT_WEIGHT"],
+        config["RECOMMENDATIONS_CATEGORY_WEIGHT"],
+        config["RECOMMENDATIONS_PRICE_WEIGHT"],
+    )
+    neighbours: Neighbours = {}
+    for start in range(0, len(positions), BLOCK_ROWS):
+        block = positions[start : start + BLOCK_ROWS]
+        neighbours.update(_rank(index, block, _blend(index, block, weights), config["RECOMMENDATIONS_TOP_N"]))
+    return neighbours
+
+
+def _store(neighbours: Neighbours, removed: Iterable[int] = ()) -> None:
+    removed = list(removed)
+    table = ProductRecommendation.__table__
+    if neighbours or removed:
+        db.session.execute(sa.delete(table).where(table.c.product_id.in_(list(neighbours) + removed)))
+    if removed:
+        db.session.execute(sa.delete(table).where(table.c.recommended_id.in_(removed)))
+    rows = [
+        {"product_id": product_id, "rank": rank, "recommended_id": recommended_id, "score": score}
+        for product_id, items in neighbours.items()
+        for rank, (recommended_id, score) in enumerate(items)
+    ]
+    if rows:
+        db.session.execute(sa.insert(table), rows)
+
+
+def _rebuild(config) -> _CatalogIndex:
+    rows = _load_rows()
+    index = _fit(rows)
+    index.neighbours = _neighbours(index, list(range(len(rows))), config)
+    db.session.execute(sa.delete(ProductRecommendation.__table__))
+    _store(index.neighbours)
+    db.session.commit()
+    logger.info("Rebuilt recommendations for %s products.", len(rows))
+    return index
+
+
+def _changed_product_ids(cursor: int, upper: int) -> Set[int]:
+    return set(
+        db.session.scalars(
+            sa.select(ContentChange.entity_id)
+            .where(ContentChange.entity == "product", ContentChange.seq > cursor, ContentChange.seq <= upper)
+            .distinct()
+        )
+    )
+
+
+def _apply_changes(index: _CatalogIndex, changed: Set[int], config) -> int:
+    rows = _load_rows(changed)
+    present = {row.id for row in rows}
+    removed = changed - present
+
+    # New terms stay out of the vocabulary until the next full rebuild; existing weights keep the ranking stable.
+    keep = np.flatnonzero(~np.isin(index.ids, list(changed)))
+    ids, categories, prices, candidates = _columns(rows)
+    term_counts = [_terms(row.title, row.description) for row in rows]
+    index.vectors = sparse.vstack([index.vectors[keep], _vectorize(term_counts, index.vocabulary, index.idf)]).tocsr()
+    index.ids = np.concatenate([index.ids[keep], ids])
+    index.categories = np.concatenate([index.categories[keep], categories])
+    index.prices = np.concatenate([index.prices[keep], prices])
+    index.candidates = np.concatenate([index.candidates[keep], candidates])
+    for product_id in removed:
+        index.neighbours.pop(product_id, None)
+
+    top_n = config["RECOMMENDATIONS_TOP_N"]
+    dirty = index.positions(sorted(present))
+    updates = _neighbours(index, dirty, config)
+
+    # Another product's list only moves if it showed a changed product, or a changed product now beats its last entry.
+    affected = {
+        product_id
+        for product_id, items in index.neighbours.items()
+        if product_id not in present and any(recommended_id in changed for recommended_id, _ in items)
+    }
+    contenders = [position for position in dirty if index.candidates[position]]
+    if contenders:
+        thresholds = np.full(len(index.ids), -np.inf)
+        for position, product_id in enumerate(index.ids.tolist()):
+            items = index.neighbours.get(product_id, [])
+            if len(items) >= top_n:
+                thresholds[position] = items[-1][1]
+        weights = (
+            config["RECOMMENDATIONS_TEXT_WEIGHT"],
+            config["RECOMMENDATIONS_CATEGORY_WEIGHT"],
+            config["RECOMMENDATIONS_PRICE_WEIGHT"],
+        )
+        for start in range(0, len(contenders), BLOCK_ROWS):
+            block = contenders[start : start + BLOCK_ROWS]
+            beaten = (_blend(index, block, weights) > thresholds[None, :]).any(axis=0)
+            affected.update(int(product_id) for product_id in index.ids[beaten])
+    affected -= present
+    updates.update(_neighbours(index, index.positions(sorted(affected)), config))
+
+    index.neighbours.update(updates)
+    _store(updates, removed)
+    db.session.commit()
+    return len(updates)
+
+
+def refresh_recommendations(app) -> None:
+    if np is None:
+        logger.debug("Skipping recommendations; numpy/scipy are not installed.")
+        return
+    config = app.config
+    with app.app_context(), _lock:
+        state = _states.setdefault(tenant_key(), {"index": None, "cursor": 0, "built_at": float("-inf")})
+        try:
+            index: Optional[_CatalogIndex] = state["index"]
+            # Re-applying a change is harmless; skipping one that commits late is not, so the cursor trails.
+            upper = max(settled_change_seq(config["CHANGE_FEED_SETTLE_SECONDS"]), state["cursor"])
+            stale = time.monotonic() - state["built_at"] > config["RECOMMENDATIONS_REBUILD_HOURS"] * 3600
+            changed = set() if index is None or stale else _changed_product_ids(state["cursor"], upper)
+            if index is None or stale or len(changed) > REBUILD_FRACTION * max(len(index.ids), 1):
+                state["index"] = _rebuild(config)
+                state["built_at"] = time.monotonic()
+            elif changed:
+                updated = _apply_changes(index, changed, config)
+                logger.info("Refreshed recommendations for %s products after %s change(s).", updated, len(changed))
+            state["cursor"] = upper
+        except Exception as exc:  # pragma: no cover - defensive guard
+            db.session.rollback()
+            state["index"] = None
+            logger.exception("Refreshing recommendations failed: %s", exc)
+
+
+def related_products(product: Product, limit: int = 3) -> List[Product]:
+    related = (
+        Product.query.join(ProductRecommendation, ProductRecommendation.recommended_id == Product.id)
+        .filter(ProductRecommendation.product_id == product.id, Product.in_stock)
+        .order_by(ProductRecommendation.rank)
+        .limit(limit)
+        .all()
+    )
+    if related or not product.category_id:
+        return related
+    # Not ranked yet (new product, or numpy/scipy missing): fall back to the same category.
+    return (
+        Product.query.filter(
+            Product.category_id == product.category_id,
+            Product.id != product.id,
+            Product.in_stock,
+        )
+        .limit(limit)
+        .all()
+    )
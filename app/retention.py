@@ -0,0 +1,117 @@
+import json
+import logging
+import os
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+import sqlalchemy as sa
+
+from app import db
+from app.changes import record_changes
+from app.models import BlogPost
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RetentionPolicy:
+    max_posts: Optional[int] = 30
+    max_age_days: Optional[int] = None
+    keep_pinned: bool = True
+    archive_dir: Optional[str] = None
+
+    @classmethod
+    def from_config(cls, config) -> "RetentionPolicy":
+        return cls(
+            max_posts=config.get("BLOG_RETENTION_MAX_POSTS") or None,
+            max_age_days=config.get("BLOG_RETENTION_MAX_AGE_DAYS") or None,
+            keep_pinned=config.get("BLOG_RETENTION_KEEP_PINNED", True),
+            archive_dir=config.get("BLOG_ARCHIVE_DIR") or None,
+        )
+
+
+def _expiry_condition(policy: RetentionPolicy):
+    conditions = []
+    # Scheduled drafts are never pruned; they have not had their turn yet.
+    base_filters = [BlogPost.is_published == True]  # noqa: E712 - expressive equality check
+    if policy.keep_pinned:
+        base_filters.append(BlogPost.is_pinned == False)  # noqa: E712 - expressive equality check
+
+    if policy.max_posts:
+        # One indexed probe finds the newest post that falls outside the window.
+        cutoff = (
+            db.session.query(BlogPost.created_at, BlogPost.id)
+            .filter(*base_filters)
+            .order_by(BlogPost.created_at.desc(), BlogPost.id.desc())
+            .offset(policy.max_posts)
+            .limit(1)
+            .first()
+        )
+        if cutoff:
+            cutoff_created_at, cutoff_id = cutoff
+            conditions.append(
+                sa.or_(
+                    BlogPost.created_at < cutoff_created_at,
+                    sa.and_(BlogPost.created_at == cutoff_created_at, BlogPost.id <= cutoff_id),
+                )
+            )
+
+    if policy.max_age_days:
+        conditions.append(BlogPost.created_at < datetime.utcnow() - timedelta(days=policy.max_age_days))
+
+    if not conditions:
+        return None
+    return sa.and_(*base_filters, sa.or_(*conditions))
+
+
+def _archive_posts(condition, archive_dir: str) -> None:
+    os.makedirs(archive_dir, exist_ok=True)
+    posts = db.session.query(BlogPost).options(db.undefer(BlogPost.image_data)).filter(condition).yield_per(20)
+    for post in posts:
+        record = {
+            "id": post.id,
+            "title": post.title,
+            "content": post.content,
+            "created_at": post.created_at.isoformat(),
+            "image_filename": post.image_filename,
+            "image_mimetype": post.image_mimetype,
+        }
+        with open(os.path.join(archive_dir, f"blog-{post.id}.json"), "w", encoding="utf-8") as handle:
+            json.dump(record, handle, ensure_ascii=False)
+        if post.image_data:
+            extension = os.path.splitext(post.image_filename or "")[1] or ".bin"
+            with open(os.path.join(archive_dir, f"blog-{post.id}{extension}"), "wb") as handle:
+                handle.write(post.image_data)
+        db.session.expunge(post)
+
+
+def apply_blog_retention(policy: RetentionPolicy) -> List[int]:
+    condition = _expiry_condition(policy)
+    if condition is None:
+        return []
+
+    if policy.archive_dir:
+        _archive_posts(condition, policy.archive_dir)
+
+    statement = (
+        sa.delete(BlogPost)
+        .where(condition)
+        .returning(BlogPost.id, BlogPost.version)
+        .execution_options(synchronize_session=False)
+    )
+    deleted = db.session.execute(statement).all()
+    record_changes("blog_post", deleted, "delete")
+    db.session.commit()
+    if deleted:
+        logger.info("Blog retention removed %s post(s).", len(deleted))
+    return [row.id for row in deleted]
+
+
+def run_blog_retention(app) -> None:
+    with app.app_context():
+        try:
+            apply_blog_retention(RetentionPolicy.from_config(app.config))
+        except Exception as exc:  # pragma: no cover - defensive guard
+            db.session.rollback()
+            logger.exception("Blog retention failed: %s", exc)
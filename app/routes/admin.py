@@ -1,13 +1,25 @@
+import csv
+import io
+import zipfile
+from decimal import Decimal, InvalidOperation
 from typing import Optional, Tuple
 
-from flask import (Blueprint, current_app, flash, redirect, render_template,
-                   request, url_for)
+from flask import (Blueprint, Response, abort, current_app, flash, jsonify,
+                   redirect, render_template, request, send_file,
+                   stream_with_context, url_for)
 from flask_login import current_user, login_required, login_user, logout_user
 from werkzeug.datastructures import FileStorage
 from werkzeug.utils import secure_filename
 
 from app import db
+from app import bulk_actions
+from app.auth import address_throttle, login_throttle, verify_password
+from app.catalog_io import ImportReport, import_products, iter_products_csv
+from app.changes import changes_since, settled_change_seq
+from app.content import apply_article
+from app.images import apply_image_traits
 from app.models import BlogPost, Category, Document, Product, User
+from app.tenancy import tenant_key
 from app.utils import trigger_blog_post_generation
 
 bp = Blueprint("admin", __name__, url_prefix="/admin")
@@ -17,6 +29,12 @@ def _get_category_options():
     return Category.query.order_by(Category.name.asc()).all()
 
 
+def _parse_stock(value: Optional[str]) -> Optional[int]:
+    # Blank means the product is not stock-tracked.
+    value = (value or "").strip()
+    return max(int(value), 0) if value.lstrip("-").isdigit() else None
+
+
 MAX_IMAGE_BYTES = 3 * 1024 * 1024
 MAX_DOCUMENT_BYTES = 10 * 1024 * 1024
 
@@ -70,11 +88,25 @@ def login():
     if request.method == "POST":
         email = request.form.get("email", "").strip().lower()
         password = request.form.get("password", "")
+        # Accounts are throttled per shop; the looser per-address limit spans every shop in the process,
+        # so admins behind one office NAT do not lock each other out.
+        throttles = (
+            (login_throttle, f"email:{tenant_key()}:{email}"),
+            (address_throttle, f"ip:{request.remote_addr}"),
+        )
+        retry_after = max(throttle.retry_after(key) for throttle, key in throttles)
+        if retry_after:
+            flash(f"Too many login attempts. Try again in {retry_after} seconds.", "danger")
+            return render_template("admin/login.html"), 429
+
         user: Optional[User] = User.query.filter_by(email=email).first()
-        if user and user.check_password(password):
+        if verify_password(user.password_hash if user else None, password):
+            login_throttle.succeeded(throttles[0][1])
             login_user(user)
             flash("Welcome back!", "success")
             return redirect(url_for("admin.dashboard"))
+        for throttle, key in throttles:
+            throttle.failed(key)
         flash("Invalid credentials. Please try again.", "danger")
     return render_template("admin/login.html")
 
@@ -100,11 +132,56 @@ def dashboard():
     return render_template("admin/dashboard.html", stats=stats, latest_products=latest_orders)
 
 
+@bp.route("/api/changes")
+@login_required
+def content_changes():
+    # Pass `next` back as `since`. Only settled changes are returned (see settled_change_seq), so
+    # the cursor never jumps past a change that is still being committed; the newest few seconds
+    # of edits show up on a later poll instead.
+    since = request.args.get("since", 0, type=int)
+    limit = min(request.args.get("limit", 500, type=int), 1000)
+    changes = changes_since(since, settled_change_seq(current_app.config["CHANGE_FEED_SETTLE_SECONDS"]), limit)
+    next_seq = changes[-1]["seq"] if changes else since
+    return jsonify({"changes": changes, "next": next_seq})
+
+
 @bp.route("/products")
 @login_required
 def products():
     items = Product.query.order_by(Product.created_at.desc()).all()
-    return render_template("admin/products.html", products=items)
+    return render_template("admin/products.html", products=items, categories=_get_category_options())
+
+
+@bp.route("/products/bulk", methods=["POST"])
+@login_required
+def bulk_products():
+    form = request.form
+    ids = form.getlist("ids")
+    action = form.get("action", "")
+    if not ids:
+        flash("Select at least one product.", "warning")
+        return redirect(url_for("admin.products"))
+
+    if action == "delete":
+        count = bulk_actions.delete_products(ids)
+        flash(f"{count} product(s) removed.", "success")
+    elif action in ("make_available", "make_unavailable"):
+        count = bulk_actions.set_products_availability(ids, action == "make_available")
+        flash(f"{count} product(s) updated.", "success")
+    elif action == "set_category":
+        category_value = form.get("category_id") or None
+        count = bulk_actions.set_products_category(ids, int(category_value) if category_value else None)
+        flash(f"{count} product(s) moved.", "success")
+    elif action == "reprice":
+        try:
+            count = bulk_actions.reprice_products(ids, Decimal(form.get("percent", "").strip()))
+        except (InvalidOperation, ValueError) as exc:
+            flash(f"Invalid price change: {exc}" if str(exc) else "Invalid price change.", "warning")
+            return redirect(url_for("admin.products"))
+        flash(f"{count} product(s) repriced.", "success")
+    else:
+        flash("Unknown bulk action.", "warning")
+    return redirect(url_for("admin.products"))
 
 
 @bp.route("/products/add", methods=["GET", "POST"])
@@ -117,8 +194,9 @@ def add_product():
         product = Product(
             title=form.get("title", "").strip(),
             description=form.get("description", ""),
-            price=float(form.get("price", 0) or 0),
+            price=form.get("price", 0),
             is_available=form.get("is_available") == "on",
+            stock=_parse_stock(form.get("stock")),
             category_id=int(category_value) if category_value else None,
         )
         upload = request.files.get("image")
@@ -127,6 +205,7 @@ def add_product():
             product.image_data = image_data
             product.image_mimetype = image_mimetype
             product.image_filename = image_filename
+            apply_image_traits(product, image_data)
         db.session.add(product)
         db.session.commit()
         flash("Product created successfully.", "success")
@@ -134,6 +213,54 @@ def add_product():
     return render_template("admin/add_product.html", categories=categories)
 
 
+@bp.route("/products/import", methods=["GET", "POST"])
+@login_required
+def import_products_view():
+    if request.method == "POST":
+        upload = request.files.get("file")
+        if not upload or not upload.filename:
+            flash("Please choose a CSV or JSONL file to import.", "warning")
+            return redirect(url_for("admin.import_products_view"))
+
+        def _log_progress(report: ImportReport) -> None:
+            current_app.logger.info(
+                "Product import: batch %s committed, %s created, %s rejected so far.",
+                report.batches,
+                report.created,
+                report.rejected,
+            )
+
+        try:
+            report = import_products(
+                upload,
+                images_upload=request.files.get("images"),
+                max_image_bytes=MAX_IMAGE_BYTES,
+                progress=_log_progress,
+            )
+        except (UnicodeDecodeError, zipfile.BadZipFile, csv.Error) as exc:
+            db.session.rollback()
+            flash(f"Import aborted: {exc}", "danger")
+            return redirect(url_for("admin.import_products_view"))
+
+        flash(
+            f"Imported {report.created} products in {report.batches} batch(es); {report.rejected} row(s) rejected.",
+            "success" if not report.rejected else "warning",
+        )
+        # Rendered rather than flashed: hundreds of rejected rows would not fit in the session cookie.
+        return render_template("admin/import_products.html", report=report)
+    return render_template("admin/import_products.html", report=None)
+
+
+@bp.route("/products/export.csv")
+@login_required
+def export_products():
+    return Response(
+        stream_with_context(iter_products_csv()),
+        mimetype="text/csv",
+        headers={"Content-Disposition": "attachment; filename=products.csv"},
+    )
+
+
 @bp.route("/products/<int:product_id>/edit", methods=["GET", "POST"])
 @login_required
 def edit_product(product_id: int):
@@ -143,20 +270,26 @@ def edit_product(product_id: int):
         form = request.form
         product.title = form.get("title", "").strip()
         product.description = form.get("description", "")
-        product.price = float(form.get("price", 0) or 0)
+        product.price = form.get("price", 0)
         product.is_available = form.get("is_available") == "on"
+        # Only overwrite stock the admin actually changed, so checkouts since the form loaded are not lost.
+        stock = _parse_stock(form.get("stock"))
+        if stock != _parse_stock(form.get("stock_seen")):
+            product.stock = stock
         category_value = form.get("category_id") or None
         product.category_id = int(category_value) if category_value else None
         if form.get("remove_image") == "on":
             product.image_data = None
             product.image_mimetype = None
             product.image_filename = None
+            apply_image_traits(product, None)
         upload = request.files.get("image")
         image_data, image_mimetype, image_filename = _extract_image_payload(upload)
         if image_data:
             product.image_data = image_data
             product.image_mimetype = image_mimetype
             product.image_filename = image_filename
+            apply_image_traits(product, image_data)
         db.session.commit()
         flash("Product updated.", "success")
         return redirect(url_for("admin.products"))
@@ -166,9 +299,8 @@ def edit_product(product_id: int):
 @bp.route("/products/<int:product_id>/delete", methods=["POST"])
 @login_required
 def delete_product(product_id: int):
-    product = Product.query.get_or_404(product_id)
-    db.session.delete(product)
-    db.session.commit()
+    if not bulk_actions.delete_products([product_id]):
+        abort(404)
     flash("Product removed.", "success")
     return redirect(url_for("admin.products"))
 
@@ -207,32 +339,59 @@ def blog_posts():
         form = request.form
         post = BlogPost(
             title=form.get("title", "").strip(),
-            content=form.get("content", ""),
+            is_pinned=form.get("is_pinned") == "on",
         )
+        apply_article(post, form.get("content", ""))
         upload = request.files.get("image")
         image_data, image_mimetype, image_filename = _extract_image_payload(upload)
         if image_data:
             post.image_data = image_data
             post.image_mimetype = image_mimetype
             post.image_filename = image_filename
+            apply_image_traits(post, image_data)
         db.session.add(post)
         db.session.commit()
         flash("Blog post published.", "success")
         return redirect(url_for("admin.blog_posts"))
-    posts = BlogPost.query.order_by(BlogPost.created_at.desc()).all()
+    posts = (
+        BlogPost.query.options(
+            db.load_only(
+                BlogPost.id,
+                BlogPost.title,
+                BlogPost.excerpt,
+                BlogPost.is_pinned,
+                BlogPost.is_published,
+                BlogPost.publish_at,
+                BlogPost.created_at,
+            )
+        )
+        .order_by(BlogPost.created_at.desc())
+        .all()
+    )
     return render_template("admin/blog_posts.html", posts=posts)
 
 
 @bp.route("/blog/<int:post_id>/delete", methods=["POST"])
 @login_required
 def delete_blog_post(post_id: int):
-    post = BlogPost.query.get_or_404(post_id)
-    db.session.delete(post)
-    db.session.commit()
+    if not bulk_actions.delete_blog_posts([post_id]):
+        abort(404)
     flash("Blog post removed.", "success")
     return redirect(url_for("admin.blog_posts"))
 
 
+@bp.route("/blog/bulk", methods=["POST"])
+@login_required
+def bulk_blog_posts():
+    ids = request.form.getlist("ids")
+    if request.form.get("action") != "delete" or not ids:
+        flash("Select posts and an action.", "warning")
+        return redirect(url_for("admin.blog_posts"))
+    count = bulk_actions.delete_blog_posts(ids)
+    flash(f"{count} blog post(s) removed.", "success")
+    return redirect(url_for("admin.blog_posts"))
+
+
 @bp.route("/blog/<int:post_id>/edit", methods=["GET", "POST"])
 @login_required
 def edit_blog_post(post_id: int):
@@ -240,30 +399,60 @@ def edit_blog_post(post_id: int):
     if request.method == "POST":
         form = request.form
         post.title = form.get("title", "").strip()
-        post.content = form.get("content", "")
+        apply_article(post, form.get("content", ""))
+        post.is_pinned = form.get("is_pinned") == "on"
         if form.get("remove_image") == "on":
             post.image_data = None
             post.image_mimetype = None
             post.image_filename = None
+            apply_image_traits(post, None)
         upload = request.files.get("image")
         image_data, image_mimetype, image_filename = _extract_image_payload(upload)
         if image_data:
             post.image_data = image_data
             post.image_mimetype = image_mimetype
             post.image_filename = image_filename
+            apply_image_traits(post, image_data)
         db.session.commit()
         flash("Blog post updated.", "success")
         return redirect(url_for("admin.blog_posts"))
     return render_template("admin/edit_blog_post.html", post=post)
 
 
+@bp.route("/blog/<int:post_id>/preview")
+@login_required
+def preview_blog_post(post_id: int):
+    post = BlogPost.query.get_or_404(post_id)
+    return render_template(
+        "blog/detail.html",
+        post=post,
+        preview=True,
+        page_title=post.title,
+        page_description=post.meta_description or "Saffron inspiration.",
+    )
+
+
+@bp.route("/blog/<int:post_id>/image")
+@login_required
+def blog_image(post_id: int):
+    # Drafts are not public yet, so previews fetch their cover here instead of main.blog_image.
+    post = BlogPost.query.options(db.undefer(BlogPost.image_data)).filter_by(id=post_id).first_or_404()
+    if not post.image_data:
+        abort(404)
+    return send_file(
+        io.BytesIO(post.image_data),
+        mimetype=post.image_mimetype or "application/octet-stream",
+        download_name=post.image_filename or f"blog-{post_id}",
+    )
+
+
 @bp.route("/blog/generate", methods=["POST"])
 @login_required
 def generate_blog_post_now():
     app = current_app._get_current_object()
     success = trigger_blog_post_generation(app)
     if success:
-        flash("AI-generated blog post published.", "success")
+        flash("Today's blog post is published.", "success")
     else:
         flash("AI blog generation failed. Check logs and API key.", "warning")
     return redirect(url_for("admin.blog_posts"))
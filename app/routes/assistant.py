@@ -4,15 +4,24 @@ from typing import Any, Dict
 from flask import Blueprint, current_app, jsonify, request
 from openai import OpenAI
 
+from app import db
+from app.analytics import count_mentions
 from app.models import BlogPost, Category, Product
+from app.tenancy import current_tenant, tenant_config
 
 bp = Blueprint("assistant", __name__, url_prefix="/assistant")
 
 
 def _collect_context() -> Dict[str, Any]:
-    products = Product.query.filter_by(is_available=True).all()
+    products = Product.query.filter(Product.in_stock).all()
     categories = Category.query.order_by(Category.name.asc()).all()
-    blog_posts = BlogPost.query.order_by(BlogPost.created_at.desc()).limit(5).all()
+    blog_posts = (
+        BlogPost.published()
+        .options(db.load_only(BlogPost.title, BlogPost.excerpt, BlogPost.created_at))
+        .order_by(BlogPost.created_at.desc())
+        .limit(5)
+        .all()
+    )
 
     return {
         "categories": categories,
@@ -24,13 +33,13 @@ def _collect_context() -> Dict[str, Any]:
 def _format_context(context: Dict[str, Any]) -> str:
     category_section = "\n".join(f"- {category.name}: {category.description}" for category in context["categories"])
     product_section = "\n".join(
-        f"- {product.title} (EUR {product.price:.2f}) — {product.description[:160]}" for product in context["products"]
+        f"- {product.title} ({product.price_display}) — {product.description[:160]}" for product in context["products"]
     )
     blog_section = "\n".join(
-        f"- {post.title} ({post.created_at.strftime('%Y-%m-%d')}): {post.content[:160]}" for post in context["blog_posts"]
+        f"- {post.title} ({post.created_at.strftime('%Y-%m-%d')}): {post.excerpt or ''}" for post in context["blog_posts"]
     )
     return (
-        "You are a sales assistant for Voloskyi Saffron.\n"
+        f"You are a sales assistant for {tenant_config().get('SHOP_NAME', 'Voloskyi Saffron')}.\n"
         f"Categories:\n{category_section or 'No categories yet.'}\n\n"
         f"Products:\n{product_section or 'No products yet.'}\n\n"
         f"Blog highlights:\n{blog_section or 'No blog posts yet.'}"
@@ -38,7 +47,9 @@ def _format_context(context: Dict[str, Any]) -> str:
 
 
 def _get_openai_client() -> OpenAI:
-    api_key = current_app.config.get("OPENAI_API_KEY") or os.getenv("OPENAI_API_KEY")
+    api_key = tenant_config().get("OPENAI_API_KEY")
+    if not api_key and current_tenant() is None:
+        api_key = os.getenv("OPENAI_API_KEY")
     if not api_key:
         raise RuntimeError("OPENAI_API_KEY is not configured.")
     return OpenAI(api_key=api_key)
@@ -57,7 +68,7 @@ def ask():
 
     try:
         client = _get_openai_client()
-        system_prompt = current_app.config.get(
+        system_prompt = tenant_config().get(
             "ASSISTANT_PROMPT", "You are a helpful AI sales assistant for Voloskyi Saffron."
         )
         response = client.responses.create(
@@ -69,4 +80,6 @@ def ask():
         current_app.logger.exception("Assistant request failed: %s", exc)
         return jsonify({"error": "Assistant service is unavailable right now."}), 503
 
+    reply_text = (reply or "").lower()
+    count_mentions(product.id for product in context["products"] if product.title.lower() in reply_text)
     return jsonify({"reply": reply})
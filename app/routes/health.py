@@ -0,0 +1,87 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any, Dict, Optional, Tuple
+
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from flask import Blueprint, current_app, jsonify
+from sqlalchemy import text
+
+from app import db
+from app.database import read_engine
+from app.tenancy import tenant_context, tenants
+from app.utils import scheduler_status
+
+bp = Blueprint("health", __name__)
+
+_ping_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="readiness-ping")
+_state_lock = threading.Lock()
+_ping_in_flight = False
+_last_ping: Tuple[float, Optional[str]] = (0.0, None)
+_migrations_current = False
+
+
+def _ping_database(app) -> None:
+    global _ping_in_flight, _last_ping
+    error = None
+    try:
+        with app.app_context():
+            with read_engine(db).connect() as connection:
+                connection.execute(text("SELECT 1"))
+    except Exception as exc:  # pragma: no cover - depends on the database
+        error = exc.__class__.__name__
+    with _state_lock:
+        _last_ping = (time.monotonic(), error)
+        _ping_in_flight = False
+
+
+def _database_check() -> str:
+    global _ping_in_flight
+    app = current_app._get_current_object()
+    with _state_lock:
+        checked_at, error = _last_ping
+        if time.monotonic() - checked_at < app.config["READINESS_CACHE_SECONDS"]:
+            return error or "ok"
+        if _ping_in_flight:
+            # A previous ping is still stuck; don't queue another connection behind it.
+            return "timeout"
+        _ping_in_flight = True
+    future = _ping_executor.submit(_ping_database, app)
+    try:
+        future.result(timeout=app.config["READINESS_DB_TIMEOUT"])
+    except FutureTimeoutError:
+        return "timeout"
+    return _last_ping[1] or "ok"
+
+
+def _migrations_check() -> str:
+    global _migrations_current
+    if _migrations_current:
+        return "ok"
+    migrate = current_app.extensions["migrate"]
+    script = ScriptDirectory.from_config(migrate.migrate.get_config(migrate.directory))
+    heads = set(script.get_heads())
+    for tenant in tenants() or [None]:
+        with tenant_context(tenant), read_engine(db).connect() as connection:
+            if set(MigrationContext.configure(connection).get_current_heads()) != heads:
+                return "pending"
+    # Once every schema has caught up it stays current for the life of this process.
+    _migrations_current = True
+    return "ok"
+
+
+@bp.route("/healthz")
+def healthz():
+    return jsonify({"status": "ok"})
+
+
+@bp.route("/readyz")
+def readyz():
+    checks: Dict[str, Any] = {"database": _database_check()}
+    if checks["database"] == "ok":
+        checks["migrations"] = _migrations_check()
+    checks["scheduler"] = scheduler_status()
+    ready = checks["database"] == "ok" and checks.get("migrations") == "ok"
+    return jsonify({"status": "ready" if ready else "unavailable", "checks": checks}), 200 if ready else 503
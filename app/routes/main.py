@@ -1,21 +1,34 @@
 import io
 
-from flask import Blueprint, Response, abort, current_app, render_template, send_file
+from flask import Blueprint, Response, abort, render_template, request, send_file
 
-from app.models import BlogPost, Document, Product
+from app import db
+from app.analytics import count_blog_view, popular_products
+from app.models import BlogPost, Document
+from app.sitemap import get_sitemap_document
+from app.tenancy import tenant_config
 
 bp = Blueprint("main", __name__)
 
+# Cards only need the precomputed summary fields, never the article body or image bytes.
+_BLOG_CARD_FIELDS = db.load_only(
+    BlogPost.id,
+    BlogPost.title,
+    BlogPost.excerpt,
+    BlogPost.reading_minutes,
+    BlogPost.created_at,
+    BlogPost.has_image,
+    BlogPost.image_width,
+    BlogPost.image_height,
+    BlogPost.image_color,
+    BlogPost.image_placeholder,
+)
+
 
 @bp.route("/")
 def index():
-    posts = BlogPost.query.order_by(BlogPost.created_at.desc()).limit(3).all()
-    products = (
-        Product.query.filter_by(is_available=True)
-        .order_by(Product.created_at.desc())
-        .limit(4)
-        .all()
-    )
+    posts = BlogPost.published().options(_BLOG_CARD_FIELDS).order_by(BlogPost.created_at.desc()).limit(3).all()
+    products = popular_products(4)
     return render_template(
         "index.html",
         posts=posts,
@@ -60,7 +73,7 @@ def download_document(doc_id: int):
 
 @bp.route("/blog")
 def blog_list():
-    posts = BlogPost.query.order_by(BlogPost.created_at.desc()).all()
+    posts = BlogPost.published().options(_BLOG_CARD_FIELDS).order_by(BlogPost.created_at.desc()).all()
     return render_template(
         "blog/list.html",
         posts=posts,
@@ -71,18 +84,19 @@ def blog_list():
 
 @bp.route("/blog/<int:post_id>")
 def blog_detail(post_id: int):
-    post = BlogPost.query.get_or_404(post_id)
+    post = BlogPost.published().filter_by(id=post_id).first_or_404()
+    count_blog_view(post.id)
     return render_template(
         "blog/detail.html",
         post=post,
         page_title=post.title,
-        page_description=post.content[:155] if post.content else "Saffron inspiration.",
+        page_description=post.meta_description or "Saffron inspiration.",
     )
 
 
 @bp.route("/blog/<int:post_id>/image")
 def blog_image(post_id: int):
-    post = BlogPost.query.get_or_404(post_id)
+    post = BlogPost.published().options(db.undefer(BlogPost.image_data)).filter_by(id=post_id).first_or_404()
     if not post.image_data:
         abort(404)
 
@@ -95,12 +109,43 @@ def blog_image(post_id: int):
 
 @bp.route("/robots.txt")
 def robots() -> Response:
-    base_url = current_app.config.get("BASE_URL", "").rstrip("/")
+    base_url = (tenant_config().get("BASE_URL") or "").rstrip("/")
     lines = [
         "User-agent: *",
         "Allow: /",
+        "Disallow: /shop/checkout/",
     ]
     if base_url:
         lines.append(f"Sitemap: {base_url}/sitemap.xml")
     content = "\n".join(lines) + "\n"
     return Response(content, mimetype="text/plain")
+
+
+@bp.route("/sitemap.xml", defaults={"page": None})
+@bp.route("/sitemap-<int:page>.xml")
+def sitemap(page):
+    name = f"sitemap-{page}.xml" if page is not None else "sitemap.xml"
+    document = get_sitemap_document(name)
+    if document is None:
+        abort(404)
+
+    raw, compressed, etag = document
+    use_gzip = request.accept_encodings["gzip"] > 0
+    if use_gzip:
+        # Each representation has its own strong ETag, so a cache never revalidates one body with the other's tag.
+        etag = f"{etag}-gzip"
+    response = Response(mimetype="application/xml")
+    response.set_etag(etag)
+    response.vary.add("Accept-Encoding")
+    response.cache_control.public = True
+    response.cache_control.max_age = 3600
+    if request.if_none_match.contains(etag):
+        response.status_code = 304
+        return response
+
+    if use_gzip:
+        response.set_data(compressed)
+        response.content_encoding = "gzip"
+    else:
+        response.set_data(raw)
+    return response
@@ -1,27 +1,42 @@
 import io
-import os
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, List, Optional
 
 import stripe
-from flask import (Blueprint, abort, current_app, redirect, render_template,
-                   request, send_file, url_for)
+from flask import (Blueprint, abort, current_app, flash, jsonify, redirect,
+                   render_template, request, send_file, url_for)
+from flask_login import current_user
 
 from app import db
-from app.models import Category, Product
+from app.analytics import count_product_view, popularity_order
+from app.auth import csrf_valid
+from app.inventory import (attach_checkout_session, cancel_checkout, confirm_checkout, open_reservations,
+                           release_reservation, reserve_stock)
+from app.models import Category, Product, format_price, to_cents
+from app.payments import create_checkout_url
+from app.recommendations import related_products
+from app.tenancy import tenant_config
 
 bp = Blueprint("shop", __name__, url_prefix="/shop")
 
-
-def _init_stripe() -> None:
-    api_key = current_app.config.get("STRIPE_SECRET_KEY") or os.getenv("STRIPE_SECRET_KEY")
-    if not api_key:
-        raise RuntimeError("Stripe secret key is not configured.")
-    stripe.api_key = api_key
+PRODUCTS_PER_PAGE = 24
+PRODUCTS_PER_PAGE_MAX = 60
+# Upper bounds (exclusive, in cents) of the price facet buckets; the last bucket is open-ended.
+PRICE_BUCKET_EDGES = [1000, 2500, 5000, 10000]
+PRODUCT_SORTS = {
+    "newest": (Product.created_at.desc(),),
+    "price_asc": (Product.price_cents.asc(), Product.id.asc()),
+    "price_desc": (Product.price_cents.desc(), Product.id.desc()),
+    "title": (Product.title.asc(), Product.id.asc()),
+    # Resolved per request from the cached popularity ranking.
+    "popular": None,
+}
 
 
 @bp.route("/")
 def catalog():
     categories = Category.query.order_by(Category.name.asc()).all()
-    products = Product.query.filter_by(is_available=True).order_by(Product.created_at.desc()).all()
+    products = Product.query.filter(Product.in_stock).order_by(Product.created_at.desc()).all()
     return render_template(
         "shop/catalog.html",
         categories=categories,
@@ -34,28 +49,161 @@ def catalog():
 @bp.route("/category/<int:category_id>")
 def category(category_id: int):
     cat = Category.query.get_or_404(category_id)
+    products = (
+        Product.query.filter(Product.category_id == cat.id, Product.in_stock)
+        .order_by(Product.created_at.desc())
+        .all()
+    )
     return render_template(
         "shop/category.html",
         cat=cat,
+        products=products,
         page_title=f"{cat.name} Products",
         page_description=cat.description or "Browse premium saffron selections by category.",
     )
 
 
+def _parse_price_arg(name: str) -> Optional[int]:
+    value = request.args.get(name, "").strip()
+    if not value:
+        return None
+    amount = Decimal(value)
+    # NaN would get past quantize and only fail in int(); refuse it with the other malformed prices.
+    if not amount.is_finite():
+        raise InvalidOperation(f"{name} must be a finite number")
+    return to_cents(amount)
+
+
+def _parse_availability_arg() -> Optional[bool]:
+    # Hidden and sold-out products are only listed to signed-in staff.
+    if not current_user.is_authenticated:
+        return True
+    value = request.args.get("available", "1").strip().lower()
+    if value in ("", "any", "all"):
+        return None
+    return value in ("1", "true", "yes", "on")
+
+
+def _price_bucket_expression():
+    return db.case(
+        *[(Product.price_cents < edge, index) for index, edge in enumerate(PRICE_BUCKET_EDGES)],
+        else_=len(PRICE_BUCKET_EDGES),
+    )
+
+
+def _price_bucket_bounds(index: int) -> Dict[str, Any]:
+    lower = PRICE_BUCKET_EDGES[index - 1] if index > 0 else 0
+    upper = PRICE_BUCKET_EDGES[index] if index < len(PRICE_BUCKET_EDGES) else None
+    label = f"{format_price(lower)} – {format_price(upper)}" if upper else f"{format_price(lower)}+"
+    return {"min_cents": lower, "max_cents": upper, "label": label}
+
+
+def _collect_facets(
+    available: Optional[bool], category_id: Optional[int], min_cents: Optional[int], max_cents: Optional[int]
+) -> Dict[str, List[Dict[str, Any]]]:
+    # One grouped pass feeds both facets: each facet honours the other facet's filter but not its own.
+    price_filters = []
+    if min_cents is not None:
+        price_filters.append(Product.price_cents >= min_cents)
+    if max_cents is not None:
+        price_filters.append(Product.price_cents <= max_cents)
+    in_price_range = db.and_(*price_filters) if price_filters else db.true()
+    bucket = _price_bucket_expression().label("bucket")
+
+    query = db.session.query(
+        Product.category_id,
+        bucket,
+        db.func.count(Product.id),
+        db.func.sum(db.case((in_price_range, 1), else_=0)),
+    )
+    if available is not None:
+        query = query.filter(Product.in_stock if available else db.not_(Product.in_stock))
+    rows = query.group_by(Product.category_id, bucket).all()
+
+    category_counts: Dict[Optional[int], int] = {}
+    bucket_counts = [0] * (len(PRICE_BUCKET_EDGES) + 1)
+    for row_category_id, row_bucket, total, total_in_range in rows:
+        category_counts[row_category_id] = category_counts.get(row_category_id, 0) + int(total_in_range or 0)
+        if category_id is None or row_category_id == category_id:
+            bucket_counts[row_bucket] += total
+
+    categories = Category.query.order_by(Category.name.asc()).all()
+    return {
+        "categories": [
+            {"id": cat.id, "name": cat.name, "count": category_counts.get(cat.id, 0)} for cat in categories
+        ],
+        "price_buckets": [
+            {**_price_bucket_bounds(index), "count": count} for index, count in enumerate(bucket_counts)
+        ],
+    }
+
+
+def _serialize_product(product_obj: Product) -> Dict[str, Any]:
+    return {
+        "id": product_obj.id,
+        "title": product_obj.title,
+        "description": product_obj.description[:140],
+        "price_cents": product_obj.price_cents,
+        "price_display": product_obj.price_display,
+        "is_available": product_obj.in_stock,
+        "stock": product_obj.stock,
+        "category_id": product_obj.category_id,
+        "url": url_for("shop.product", product_id=product_obj.id),
+        "image_url": url_for("shop.product_image", product_id=product_obj.id) if product_obj.has_image else None,
+        "image_width": product_obj.image_width,
+        "image_height": product_obj.image_height,
+        "image_color": product_obj.image_color,
+        "image_placeholder": product_obj.image_placeholder,
+    }
+
+
+@bp.route("/api/products")
+def api_products():
+    category_id = request.args.get("category", type=int)
+    try:
+        min_cents = _parse_price_arg("min_price")
+        max_cents = _parse_price_arg("max_price")
+    except InvalidOperation:
+        return jsonify({"error": "Invalid price range."}), 400
+    available = _parse_availability_arg()
+    sort = request.args.get("sort", "newest")
+    if sort not in PRODUCT_SORTS:
+        return jsonify({"error": "Unknown sort order."}), 400
+    page = max(request.args.get("page", 1, type=int), 1)
+    # per_page=0 answers only the totals and facets, which is all the catalog page needs on load.
+    per_page = min(max(request.args.get("per_page", PRODUCTS_PER_PAGE, type=int), 0), PRODUCTS_PER_PAGE_MAX)
+
+    query = Product.query
+    if available is not None:
+        query = query.filter(Product.in_stock if available else db.not_(Product.in_stock))
+    if category_id is not None:
+        query = query.filter(Product.category_id == category_id)
+    if min_cents is not None:
+        query = query.filter(Product.price_cents >= min_cents)
+    if max_cents is not None:
+        query = query.filter(Product.price_cents <= max_cents)
+    total = query.order_by(None).count()
+    products = []
+    if per_page:
+        order_by = PRODUCT_SORTS[sort] or (popularity_order(), Product.created_at.desc())
+        products = query.order_by(*order_by).limit(per_page).offset((page - 1) * per_page).all()
+
+    return jsonify(
+        {
+            "products": [_serialize_product(item) for item in products],
+            "total": total,
+            "page": page,
+            "per_page": per_page,
+            "facets": _collect_facets(available, category_id, min_cents, max_cents),
+        }
+    )
+
+
 @bp.route("/product/<int:product_id>")
 def product(product_id: int):
     product_obj = Product.query.get_or_404(product_id)
-    related = (
-        Product.query.filter(
-            Product.category_id == product_obj.category_id,
-            Product.id != product_obj.id,
-            Product.is_available == True,  # noqa: E712 - expressive equality check
-        )
-        .limit(3)
-        .all()
-        if product_obj.category_id
-        else []
-    )
+    count_product_view(product_obj.id)
+    related = related_products(product_obj)
     return render_template(
         "shop/product.html",
         p=product_obj,
@@ -67,7 +215,7 @@ def product(product_id: int):
 
 @bp.route("/product/<int:product_id>/image")
 def product_image(product_id: int):
-    product_obj = Product.query.get_or_404(product_id)
+    product_obj = Product.query.options(db.undefer(Product.image_data)).filter_by(id=product_id).first_or_404()
     if not product_obj.image_data:
         abort(404)
 
@@ -86,7 +234,7 @@ def search():
         like_pattern = f"%{query.lower()}%"
         results = (
             Product.query.filter(
-                Product.is_available == True,  # noqa: E712 - expressive equality check
+                Product.in_stock,
                 db.func.lower(Product.title).like(like_pattern),
             )
             .order_by(Product.created_at.desc())
@@ -101,32 +249,54 @@ def search():
     )
 
 
-@bp.route("/checkout/<int:product_id>")
+@bp.route("/checkout/<int:product_id>", methods=["POST"])
 def checkout(product_id: int):
+    # POST with a session token: crawlers, link prefetchers and other sites cannot hold stock.
+    if not csrf_valid():
+        abort(400)
     product_obj = Product.query.get_or_404(product_id)
-    _init_stripe()
-
-    session = stripe.checkout.Session.create(
-        payment_method_types=["card"],
-        line_items=[
-            {
-                "price_data": {
-                    "currency": "eur",
-                    "product_data": {"name": product_obj.title},
-                    "unit_amount": int(product_obj.price * 100),
-                },
-                "quantity": 1,
-            }
-        ],
-        mode="payment",
-        success_url=url_for("shop.success", _external=True),
-        cancel_url=url_for("shop.cancel", _external=True),
-    )
-    return redirect(session.url, code=303)
+    if not product_obj.is_available:
+        abort(404)
+
+    config = tenant_config()
+    reservation = None
+    if product_obj.stock is not None:
+        if open_reservations(request.remote_addr) >= config["STOCK_RESERVATIONS_PER_CLIENT"]:
+            flash("You already have checkouts in progress. Finish or cancel one of them first.", "warning")
+            return redirect(url_for("shop.product", product_id=product_obj.id))
+        reservation = reserve_stock(product_obj.id, 1, config["STOCK_RESERVATION_MINUTES"], request.remote_addr)
+        if reservation is None:
+            flash("Sorry, this product has just sold out.", "warning")
+            return redirect(url_for("shop.product", product_id=product_obj.id))
+
+    token = reservation.token if reservation else None
+    try:
+        checkout_url, session_id = create_checkout_url(
+            config,
+            product_obj,
+            # Stripe fills in the placeholder; url_for would percent-encode its braces.
+            success_url=url_for("shop.success", _external=True) + "?session_id={CHECKOUT_SESSION_ID}",
+            cancel_url=url_for("shop.cancel", reservation=token, _external=True),
+            reservation=reservation,
+        )
+    except Exception:
+        if token:
+            release_reservation(token)
+        raise
+    if token:
+        attach_checkout_session(token, session_id)
+    return redirect(checkout_url, code=303)
 
 
 @bp.route("/success")
 def success():
+    session_id = request.args.get("session_id")
+    if session_id:
+        try:
+            confirm_checkout(tenant_config(), session_id)
+        except stripe.StripeError as exc:
+            # The sweeper asks Stripe again once the hold expires.
+            current_app.logger.warning("Confirming checkout session %s failed: %s", session_id, exc)
     return render_template(
         "shop/success.html",
         page_title="Payment Successful",
@@ -136,6 +306,9 @@ def success():
 
 @bp.route("/cancel")
 def cancel():
+    token = request.args.get("reservation")
+    if token:
+        cancel_checkout(tenant_config(), token)
     return render_template(
         "shop/cancel.html",
         page_title="Payment Cancelled",
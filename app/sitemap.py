@@ -0,0 +1,151 @@
+import gzip
+import hashlib
+import io
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+from xml.sax.saxutils import escape
+
+from flask import url_for
+
+from app import db
+from app.changes import change_log_fingerprint
+from app.models import BlogPost, Category, Document, Product
+from app.tenancy import tenant_config, tenant_key
+
+SITEMAP_MAX_URLS = 50000
+SITEMAP_CHECK_SECONDS = 30
+XML_HEADER = '<?xml version="1.0" encoding="UTF-8"?>\n'
+SITEMAP_NS = "http://www.sitemaps.org/schemas/sitemap/0.9"
+
+# name -> (xml bytes, gzipped bytes, etag)
+SitemapDocument = Tuple[bytes, bytes, str]
+
+_lock = threading.Lock()
+# tenant key -> {"fingerprint", "checked_at", "documents", "render_lock"}
+_states: Dict[str, Dict[str, object]] = {}
+
+
+def _absolute(path: str) -> str:
+    base_url = (tenant_config().get("BASE_URL") or "").rstrip("/")
+    return f"{base_url}{path}"
+
+
+def _content_fingerprint() -> Tuple[int, int]:
+    return change_log_fingerprint()
+
+
+def _iter_entries() -> Iterator[Tuple[str, Optional[datetime]]]:
+    for endpoint in ("main.index", "shop.catalog", "main.blog_list", "main.documents", "main.about"):
+        yield _absolute(url_for(endpoint)), None
+
+    for category_id, updated_at in db.session.query(Category.id, Category.updated_at).order_by(Category.id).yield_per(1000):
+        yield _absolute(url_for("shop.category", category_id=category_id)), updated_at
+
+    products = (
+        db.session.query(Product.id, Product.updated_at)
+        .filter(Product.is_available == True)  # noqa: E712 - expressive equality check
+        .order_by(Product.id)
+        .yield_per(1000)
+    )
+    for product_id, updated_at in products:
+        yield _absolute(url_for("shop.product", product_id=product_id)), updated_at
+
+    posts = (
+        db.session.query(BlogPost.id, BlogPost.updated_at)
+        .filter(BlogPost.is_published == True)  # noqa: E712 - expressive equality check
+        .order_by(BlogPost.id)
+        .yield_per(1000)
+    )
+    for post_id, updated_at in posts:
+        yield _absolute(url_for("main.blog_detail", post_id=post_id)), updated_at
+
+    for doc_id, updated_at in db.session.query(Document.id, Document.updated_at).order_by(Document.id).yield_per(1000):
+        yield _absolute(url_for("main.download_document", doc_id=doc_id)), updated_at
+
+
+def _url_element(loc: str, lastmod: Optional[datetime]) -> str:
+    lastmod_tag = f"<lastmod>{lastmod.strftime('%Y-%m-%d')}</lastmod>" if lastmod else ""
+    return f"<url><loc>{escape(loc)}</loc>{lastmod_tag}</url>\n"
+
+
+class _DocumentWriter:
+    """Writes one sitemap file, gzipping alongside so the XML is never joined into one big string."""
+
+    def __init__(self, root: str) -> None:
+        self.raw = io.BytesIO()
+        self.compressed = io.BytesIO()
+        self._gzip = gzip.GzipFile(fileobj=self.compressed, mode="wb", compresslevel=9, mtime=0)
+        self._root = root
+        self.write(f'{XML_HEADER}<{root} xmlns="{SITEMAP_NS}">\n')
+
+    def write(self, chunk: str) -> None:
+        data = chunk.encode("utf-8")
+        self.raw.write(data)
+        self._gzip.write(data)
+
+    def close(self) -> SitemapDocument:
+        self.write(f"</{self._root}>\n")
+        self._gzip.close()
+        raw = self.raw.getvalue()
+        return raw, self.compressed.getvalue(), hashlib.sha1(raw).hexdigest()
+
+
+def _render_documents() -> Dict[str, SitemapDocument]:
+    pages: List[SitemapDocument] = []
+    writer = _DocumentWriter("urlset")
+    count = 0
+    for loc, lastmod in _iter_entries():
+        if count == SITEMAP_MAX_URLS:
+            pages.append(writer.close())
+            writer = _DocumentWriter("urlset")
+            count = 0
+        writer.write(_url_element(loc, lastmod))
+        count += 1
+    pages.append(writer.close())
+
+    if len(pages) == 1:
+        return {"sitemap.xml": pages[0]}
+
+    documents = {f"sitemap-{index}.xml": page for index, page in enumerate(pages, start=1)}
+    index_writer = _DocumentWriter("sitemapindex")
+    for name in documents:
+        index_writer.write(f"<sitemap><loc>{escape(_absolute('/' + name))}</loc></sitemap>\n")
+    documents["sitemap.xml"] = index_writer.close()
+    return documents
+
+
+def get_sitemap_document(name: str) -> Optional[SitemapDocument]:
+    now = time.monotonic()
+    with _lock:
+        state = _states.setdefault(
+            tenant_key(),
+            {"fingerprint": None, "checked_at": float("-inf"), "documents": {}, "render_lock": threading.Lock()},
+        )
+        if now - state["checked_at"] < SITEMAP_CHECK_SECONDS:
+            return state["documents"].get(name)
+        documents = state["documents"]
+
+    fingerprint = _content_fingerprint()
+    if fingerprint == state["fingerprint"] and documents:
+        with _lock:
+            state["checked_at"] = now
+        return documents.get(name)
+
+    # Rendering runs outside _lock so other shops are never blocked. Within a shop a single request
+    # renders while the rest keep serving the previous sitemap; only the very first render makes them wait.
+    render_lock: threading.Lock = state["render_lock"]
+    if not render_lock.acquire(blocking=not documents):
+        return documents.get(name)
+    try:
+        with _lock:
+            if fingerprint == state["fingerprint"] and state["documents"]:
+                return state["documents"].get(name)
+        # The fingerprint was read before rendering, so a change made meanwhile triggers another render.
+        rendered = _render_documents()
+        with _lock:
+            state.update(documents=rendered, fingerprint=fingerprint, checked_at=now)
+        return rendered.get(name)
+    finally:
+        render_lock.release()
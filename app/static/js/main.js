@@ -41,3 +41,162 @@ document.addEventListener("DOMContentLoaded", () => {
         }
     });
 });
+
+document.addEventListener("DOMContentLoaded", () => {
+    const filterForm = document.querySelector("#catalog-filters");
+    const grid = document.querySelector("#catalog-grid");
+    if (!filterForm || !grid) {
+        return;
+    }
+
+    const endpoint = filterForm.dataset.endpoint;
+    const categorySelect = filterForm.querySelector("[name='category']");
+    const minInput = filterForm.querySelector("[name='min_price']");
+    const maxInput = filterForm.querySelector("[name='max_price']");
+    const bucketContainer = filterForm.querySelector("#filter-price-buckets");
+    let pendingRequest = null;
+    let debounceTimer = null;
+    let moreButton = null;
+
+    const element = (tag, className, text) => {
+        const node = document.createElement(tag);
+        if (className) {
+            node.className = className;
+        }
+        if (text !== undefined) {
+            node.textContent = text;
+        }
+        return node;
+    };
+
+    const renderCard = (product) => {
+        const card = element("article", "content-card product-card h-100");
+        const media = element("div", "media-frame");
+        if (product.image_url) {
+            media.classList.add("media-frame--placeholder");
+            media.style.backgroundColor = product.image_color || "";
+            if (product.image_placeholder) {
+                media.style.backgroundImage = `url("${product.image_placeholder}")`;
+            }
+            const image = element("img");
+            image.alt = product.title;
+            if (product.image_width && product.image_height) {
+                // Sized like the server-rendered cards, so the grid does not shift while images load.
+                image.width = product.image_width;
+                image.height = product.image_height;
+            }
+            image.src = product.image_url;
+            image.loading = "lazy";
+            image.decoding = "async";
+            media.appendChild(image);
+        } else {
+            media.appendChild(element("div", "media-placeholder", "Фото скоро"));
+        }
+        card.appendChild(media);
+
+        const body = element("div", "content-card-body");
+        body.appendChild(element("h2", "h5", product.title));
+        body.appendChild(element("p", "text-muted flex-grow-1", product.description));
+        const footer = element("div", "d-flex justify-content-between align-items-center");
+        footer.appendChild(element("span", "price-tag", product.price_display));
+        const link = element("a", "btn btn-soft", "Переглянути");
+        link.href = product.url;
+        footer.appendChild(link);
+        body.appendChild(footer);
+        card.appendChild(body);
+        return card;
+    };
+
+    const renderFacets = (facets) => {
+        facets.categories.forEach((facet) => {
+            const option = categorySelect.querySelector(`option[value='${facet.id}']`);
+            if (option) {
+                option.textContent = `${option.dataset.name} (${facet.count})`;
+            }
+        });
+
+        bucketContainer.replaceChildren();
+        facets.price_buckets.forEach((bucket) => {
+            const button = element("button", "btn btn-sm btn-outline-secondary", `${bucket.label} (${bucket.count})`);
+            button.type = "button";
+            button.disabled = bucket.count === 0;
+            button.addEventListener("click", () => {
+                minInput.value = (bucket.min_cents / 100).toFixed(2);
+                maxInput.value = bucket.max_cents ? ((bucket.max_cents - 1) / 100).toFixed(2) : "";
+                refresh();
+            });
+            bucketContainer.appendChild(button);
+        });
+    };
+
+    const fetchProducts = async (page, perPage) => {
+        const params = new URLSearchParams();
+        new FormData(filterForm).forEach((value, key) => {
+            if (value !== "") {
+                params.append(key, value);
+            }
+        });
+        params.set("page", page);
+        if (perPage !== undefined) {
+            params.set("per_page", perPage);
+        }
+
+        if (pendingRequest) {
+            pendingRequest.abort();
+        }
+        pendingRequest = new AbortController();
+
+        try {
+            const response = await fetch(`${endpoint}?${params.toString()}`, { signal: pendingRequest.signal });
+            const data = await response.json();
+            return response.ok ? data : null;
+        } catch (error) {
+            if (error.name !== "AbortError") {
+                console.error(error);
+            }
+            return null;
+        }
+    };
+
+    const showMore = (data) => {
+        if (moreButton) {
+            moreButton.remove();
+            moreButton = null;
+        }
+        if (data.page * data.per_page >= data.total) {
+            return;
+        }
+        moreButton = element("button", "btn btn-outline-secondary", grid.dataset.moreText);
+        moreButton.type = "button";
+        moreButton.addEventListener("click", async () => {
+            const next = await fetchProducts(data.page + 1);
+            if (next) {
+                grid.append(...next.products.map(renderCard));
+                showMore(next);
+            }
+        });
+        grid.after(moreButton);
+    };
+
+    const refresh = async () => {
+        const data = await fetchProducts(1);
+        if (!data) {
+            return;
+        }
+        grid.replaceChildren(...data.products.map(renderCard));
+        if (!data.products.length) {
+            grid.appendChild(element("p", "text-muted", grid.dataset.emptyText));
+        }
+        renderFacets(data.facets);
+        showMore(data);
+    };
+
+    filterForm.addEventListener("submit", (event) => event.preventDefault());
+    filterForm.addEventListener("change", refresh);
+    filterForm.addEventListener("input", () => {
+        clearTimeout(debounceTimer);
+        debounceTimer = setTimeout(refresh, 300);
+    });
+    // The server already rendered every card; the page load only needs the facet counts.
+    fetchProducts(1, 0).then((data) => data && renderFacets(data.facets));
+});
@@ -0,0 +1,310 @@
+import json
+import logging
+import multiprocessing
+import os
+import re
+import time
+from collections import ChainMap
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+from urllib.parse import urlsplit
+
+import click
+from flask import Flask, abort, current_app, g, request
+from flask.cli import AppGroup
+from flask_migrate import upgrade as migrate_upgrade
+from sqlalchemy import event, text
+
+from app import db
+from app.database import dispose_engines_after_fork
+
+logger = logging.getLogger(__name__)
+
+# TENANTS_FILE is JSON keyed by shop:
+#   {"saffron": {"hosts": ["saffron.example"], "schema": "shop_saffron",
+#                "config": {"SHOP_NAME": "Saffron", "STRIPE_SECRET_KEY": "env:SAFFRON_STRIPE_SECRET_KEY"}}}
+# "env:NAME" values are read from the environment so secrets stay out of the file.
+IDENTIFIER_RE = re.compile(r"^[a-z_][a-z0-9_]{0,62}$")
+TENANT_CONFIG_KEYS = frozenset(
+    {
+        "SHOP_NAME",
+        "BASE_URL",
+        "STRIPE_PUBLIC_KEY",
+        "STRIPE_SECRET_KEY",
+        "STRIPE_CURRENCY",
+        "OPENAI_API_KEY",
+        "ASSISTANT_PROMPT",
+    }
+)
+# Never inherited from the process config: a shop without its own keys must not bill another shop's accounts.
+TENANT_PRIVATE_KEYS = ("STRIPE_PUBLIC_KEY", "STRIPE_SECRET_KEY", "OPENAI_API_KEY")
+# Load balancer probes and shared assets are answered for any host.
+TENANTLESS_BLUEPRINTS = {"health"}
+TENANTLESS_ENDPOINTS = {"static"}
+# Outside a shop a connection resolves no application tables, instead of whichever shop used it last.
+NO_TENANT_SEARCH_PATH = "pg_catalog"
+
+
+@dataclass(frozen=True)
+class Tenant:
+    key: str
+    schema: str
+    hosts: Tuple[str, ...]
+    config: Mapping[str, object] = field(default_factory=dict)
+
+    @property
+    def search_path(self) -> str:
+        return f'"{self.schema}"'
+
+
+@dataclass
+class _Registry:
+    tenants: Dict[str, Tenant]
+    hosts: Dict[str, Tenant]
+    default: Optional[Tenant]
+
+
+_current: ContextVar[Optional[Tenant]] = ContextVar("tenant", default=None)
+
+
+def _resolve(value: object) -> object:
+    if isinstance(value, str) and value.startswith("env:"):
+        return os.getenv(value[4:])
+    return value
+
+
+def load_tenants(path: str) -> Dict[str, Tenant]:
+    with open(path, encoding="utf-8") as handle:
+        specs = json.load(handle)
+
+    loaded: Dict[str, Tenant] = {}
+    owners: Dict[str, str] = {}
+    for key, spec in specs.items():
+        schema = spec.get("schema", key)
+        if not IDENTIFIER_RE.match(key) or not IDENTIFIER_RE.match(schema) or schema.startswith("pg_"):
+            raise ValueError(f"Tenant {key!r}: keys and schemas must be lowercase SQL identifiers, not pg_*.")
+        unknown = set(spec.get("config", {})) - TENANT_CONFIG_KEYS
+        if unknown:
+            raise ValueError(f"Tenant {key!r}: {', '.join(sorted(unknown))} cannot be set per shop.")
+        hosts = tuple(host.lower() for host in spec.get("hosts", []))
+        for name in (f"schema:{schema}", *hosts):
+            if name in owners:
+                raise ValueError(f"{name!r} is claimed by both {owners[name]!r} and {key!r}.")
+            owners[name] = key
+
+        config: Dict[str, object] = {name: None for name in TENANT_PRIVATE_KEYS}
+        if hosts:
+            config["BASE_URL"] = f"https://{hosts[0]}"
+        config.update((name, _resolve(value)) for name, value in spec.get("config", {}).items())
+        loaded[key] = Tenant(key=key, schema=schema, hosts=hosts, config=config)
+    return loaded
+
+
+def _registry(app: Optional[Flask] = None) -> Optional[_Registry]:
+    return (app or current_app).extensions.get("tenancy")
+
+
+def tenants(app: Optional[Flask] = None) -> List[Tenant]:
+    registry = _registry(app)
+    return list(registry.tenants.values()) if registry else []
+
+
+def get_tenant(key: str, app: Optional[Flask] = None) -> Optional[Tenant]:
+    registry = _registry(app)
+    return registry.tenants.get(key) if registry else None
+
+
+def current_tenant() -> Optional[Tenant]:
+    return _current.get()
+
+
+def tenant_key() -> str:
+    tenant = _current.get()
+    return tenant.key if tenant else ""
+
+
+def tenant_config(app: Optional[Flask] = None) -> Mapping[str, object]:
+    config = (app or current_app).config
+    tenant = _current.get()
+    return ChainMap(tenant.config, config) if tenant else config
+
+
+@contextmanager
+def tenant_context(tenant: Optional[Tenant]) -> Iterator[None]:
+    token = _current.set(tenant)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+def each_tenant(app: Flask, job: Callable[[Flask], object]) -> Callable[[], None]:
+    """Wrap a scheduler job so it runs once per shop, or once when tenancy is off."""
+
+    def run() -> None:
+        for tenant in tenants(app) or [None]:
+            with tenant_context(tenant):
+                try:
+                    job(app)
+                except Exception as exc:  # pragma: no cover - one shop's failure must not starve the rest
+                    logger.exception("Job %s failed for tenant %s: %s", job.__name__, tenant_key() or "-", exc)
+
+    return run
+
+
+def _search_path() -> str:
+    tenant = _current.get()
+    return tenant.search_path if tenant else NO_TENANT_SEARCH_PATH
+
+
+def _install_search_path(engine, pgbouncer: bool) -> None:
+    if pgbouncer:
+
+        @event.listens_for(engine, "begin")
+        def _set_local_search_path(connection):
+            # Transaction pooling hands out a different server connection per transaction.
+            connection.exec_driver_sql(f"SET LOCAL search_path TO {_search_path()}")
+
+        return
+
+    @event.listens_for(engine, "checkout")
+    def _set_search_path(dbapi_connection, connection_record, connection_proxy):
+        # Shops share one pool; a connection only pays the round trip when it changes hands between shops.
+        path = _search_path()
+        if connection_record.info.get("search_path") == path:
+            return
+        # Outside a transaction: one round trip, and the pool's rollback on return cannot undo it.
+        dbapi_connection.autocommit = True
+        try:
+            cursor = dbapi_connection.cursor()
+            cursor.execute(f"SET search_path TO {path}")
+            cursor.close()
+        finally:
+            dbapi_connection.autocommit = False
+        connection_record.info["search_path"] = path
+
+
+def init_tenancy(app: Flask) -> None:
+    app.cli.add_command(tenants_cli)
+    path = app.config.get("TENANTS_FILE")
+    if not path:
+        return
+
+    loaded = load_tenants(path)
+    default_key = app.config.get("TENANT_DEFAULT")
+    if default_key and default_key not in loaded:
+        raise ValueError(f"TENANT_DEFAULT {default_key!r} is not in {path}.")
+    with app.app_context():
+        engines = list(db.engines.values())
+    if any(engine.dialect.name != "postgresql" for engine in engines):
+        raise RuntimeError("Multi-tenant hosting needs PostgreSQL; shops are separated by schema.")
+    for engine in engines:
+        _install_search_path(engine, app.config["DB_PGBOUNCER"])
+    hosts = {host: tenant for tenant in loaded.values() for host in tenant.hosts}
+    app.extensions["tenancy"] = _Registry(tenants=loaded, hosts=hosts, default=loaded.get(default_key))
+    app.before_request(_resolve_tenant)
+    app.teardown_request(_release_tenant)
+
+
+def _resolve_tenant():
+    registry: _Registry = current_app.extensions["tenancy"]
+    tenant = registry.hosts.get(urlsplit(f"//{request.host}").hostname or "", registry.default)
+    if tenant is None:
+        if request.blueprint in TENANTLESS_BLUEPRINTS or request.endpoint in TENANTLESS_ENDPOINTS:
+            return None
+        abort(404)
+    g.tenant_token = _current.set(tenant)
+    return None
+
+
+def _release_tenant(exc):
+    token = g.pop("tenant_token", None)
+    if token is not None:
+        _current.reset(token)
+
+
+def _upgrade_tenant(app: Flask, key: str, revision: str) -> None:
+    tenant = get_tenant(key, app)
+    with app.app_context(), tenant_context(tenant):
+        with db.engine.begin() as connection:
+            connection.execute(text(f'CREATE SCHEMA IF NOT EXISTS "{tenant.schema}"'))
+        # alembic_version lands in the shop's schema too, so every shop migrates independently.
+        migrate_upgrade(revision=revision)
+
+
+def _upgrade_tenants(app: Flask, keys: List[str], revision: str) -> List[str]:
+    failed = []
+    for key in keys:
+        try:
+            _upgrade_tenant(app, key, revision)
+        except Exception as exc:
+            logger.exception("Migrating tenant %s failed: %s", key, exc)
+            failed.append(key)
+    return failed
+
+
+def _upgrade_in_child(app: Flask, keys: List[str], revision: str, results) -> None:
+    dispose_engines_after_fork(db)
+    results.send(_upgrade_tenants(app, keys, revision))
+    results.close()
+
+
+def migrate_tenants(app: Flask, keys: Iterable[str] = (), jobs: int = 4, revision: str = "head") -> List[str]:
+    keys = set(keys)
+    selected = [tenant.key for tenant in tenants(app) if not keys or tenant.key in keys]
+    if jobs <= 1 or len(selected) <= 1 or "fork" not in multiprocessing.get_all_start_methods():
+        failed = _upgrade_tenants(app, selected, revision)
+    else:
+        # Alembic keeps the running migration in module globals (context, op), so parallel runs need processes.
+        # Plain forked processes pickle nothing, which also keeps this safe while `app` is still being imported.
+        context = multiprocessing.get_context("fork")
+        count = min(jobs, len(selected))
+        workers = []
+        for index in range(count):
+            receiver, sender = context.Pipe(duplex=False)
+            share = selected[index::count]
+            process = context.Process(target=_upgrade_in_child, args=(app, share, revision, sender))
+            process.start()
+            sender.close()
+            workers.append((share, process, receiver))
+
+        failed = []
+        for share, process, receiver in workers:
+            try:
+                failed += receiver.recv()
+            except EOFError:
+                failed += share  # the worker died before reporting back
+            process.join()
+    if failed:
+        raise RuntimeError(f"Migrations failed for tenant(s): {', '.join(sorted(failed))}")
+    return selected
+
+
+tenants_cli = AppGroup("tenants", help="Manage the shops served by this deployment.")
+
+
+@tenants_cli.command("list")
+def list_tenants_command():
+    for tenant in tenants():
+        click.echo(f"{tenant.key}\t{tenant.schema}\t{', '.join(tenant.hosts)}")
+
+
+@tenants_cli.command("migrate")
+@click.option("--tenant", "keys", multiple=True, help="Only migrate this shop (repeatable).")
+@click.option("--jobs", "-j", type=int, default=None, help="Schemas migrated in parallel (TENANT_MIGRATION_JOBS).")
+@click.option("--revision", default="head", show_default=True)
+def migrate_tenants_command(keys, jobs, revision):
+    app = current_app._get_current_object()
+    if _registry(app) is None:
+        raise click.ClickException("TENANTS_FILE is not set; use `flask db upgrade` for a single shop.")
+    unknown = set(keys) - {tenant.key for tenant in tenants(app)}
+    if unknown:
+        raise click.BadParameter(f"unknown tenant(s): {', '.join(sorted(unknown))}", param_hint="--tenant")
+    started = time.monotonic()
+    try:
+        migrated = migrate_tenants(app, keys, jobs or app.config["TENANT_MIGRATION_JOBS"], revision)
+    except RuntimeError as exc:
+        raise click.ClickException(str(exc)) from exc
+    click.echo(f"Migrated {len(migrated)} tenant schema(s) in {time.monotonic() - started:.1f}s.")
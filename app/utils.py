@@ -1,22 +1,46 @@
 import atexit
-import base64
 import datetime
 import logging
 import os
 import textwrap
-from typing import Optional
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import IO, Callable, List, Optional, TypeVar
 
+try:  # Scheduler leadership uses flock where the platform has it.
+    import fcntl
+except ImportError:  # pragma: no cover - Windows development machines
+    fcntl = None
+
+import sqlalchemy as sa
 from apscheduler.schedulers.background import BackgroundScheduler
 from openai import OpenAI
+from sqlalchemy.exc import IntegrityError
 
 from app import db
+from app.analytics import prune_analytics
+from app.changes import record_changes
+from app.content import apply_article, backfill_article_fields
+from app.database import sqlite_checkpoint, sqlite_maintenance
+from app.images import EncodedImage, apply_image_traits, backfill_image_traits, ingest_base64_image
+from app.inventory import release_expired_reservations
 from app.models import BlogPost
+from app.payments import sync_stripe_catalog
+from app.recommendations import refresh_recommendations
+from app.retention import run_blog_retention
+from app.tenancy import each_tenant, tenant_config
 
 logger = logging.getLogger(__name__)
 
 _scheduler: Optional[BackgroundScheduler] = None
+_scheduler_lock: Optional[IO[str]] = None
+_scheduler_standby = False
+
+T = TypeVar("T")
+RETRY_BASE_DELAY = 5
+SCHEDULER_RETRY_SECONDS = 30
 
-MAX_BLOG_POSTS = 30
 EDITORIAL_START_DATE = datetime.date(2025, 1, 1)
 EDITORIAL_TOPICS = [
     {
@@ -168,20 +192,6 @@ def _select_topic(today: datetime.date) -> tuple[int, dict[str, str]]:
     return index, EDITORIAL_TOPICS[index]
 
 
-def _prune_old_posts(max_posts: int = MAX_BLOG_POSTS) -> None:
-    excess_posts = (
-        BlogPost.query.order_by(BlogPost.created_at.desc())
-        .offset(max_posts)
-        .all()
-    )
-    if not excess_posts:
-        return
-
-    for stale_post in excess_posts:
-        db.session.delete(stale_post)
-    db.session.commit()
-
-
 def _build_image_prompt(topic: dict[str, str]) -> str:
     return (
         "Elegant editorial photograph illustrating "
@@ -190,92 +200,339 @@ def _build_image_prompt(topic: dict[str, str]) -> str:
     )
 
 
-def _generate_blog_post(app) -> bool:
+def _with_retries(label: str, func: Callable[[], T], attempts: int) -> T:
+    for attempt in range(1, attempts):
+        try:
+            return func()
+        except Exception as exc:  # pragma: no cover - network failures
+            delay = RETRY_BASE_DELAY * 2 ** (attempt - 1)
+            logger.warning("%s failed (attempt %s/%s): %s; retrying in %ss", label, attempt, attempts, exc, delay)
+            time.sleep(delay)
+    return func()
+
+
+def _request_article(client: OpenAI, topic_index: int, topic: dict[str, str]) -> str:
+    completion = client.responses.create(
+        model="gpt-4.1-mini",
+        temperature=0.7,
+        max_output_tokens=1500,
+        input=[
+            {"role": "system", "content": EDITORIAL_SYSTEM_PROMPT},
+            {
+                "role": "user",
+                "content": (
+                    "Produce today's article for the Voloskyi Saffron blog. "
+                    f"Focus on topic #{topic_index + 1}: {topic['title']} — {topic['angle']}. "
+                    "Incorporate long-tail keywords for premium saffron buyers in Europe, "
+                    "mention Ukrainian provenance where relevant, and ensure the article remains evergreen. "
+                    "Return only HTML as described."
+                ),
+            },
+        ],
+    )
+    return completion.output_text
+
+
+def _request_image(app, client: OpenAI, topic: dict[str, str]) -> EncodedImage:
+    image_response = client.images.generate(
+        model="gpt-image-1",
+        prompt=_build_image_prompt(topic),
+        size="1024x1024",
+        quality="high",
+    )
+    # The PNG original is discarded once transcoded; only the web-ready rendition is stored.
+    return ingest_base64_image(
+        image_response.data[0].b64_json,
+        "image/png",
+        app.config["BLOG_IMAGE_FORMAT"],
+        app.config["BLOG_IMAGE_QUALITY"],
+    )
+
+
+def _publish_time(app, editorial_date: datetime.date) -> datetime.datetime:
+    return datetime.datetime.combine(editorial_date, datetime.time(hour=app.config["BLOG_PUBLISH_HOUR_UTC"]))
+
+
+def _generate_draft(app, client: OpenAI, editorial_date: datetime.date) -> Optional[BlogPost]:
+    topic_index, topic = _select_topic(editorial_date)
+    attempts = app.config["BLOG_GENERATION_RETRIES"]
+    logger.info("Generating blog draft for %s, topic #%s: %s", editorial_date, topic_index + 1, topic["title"])
+
+    # Text and image are independent requests; run them side by side instead of back to back.
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        text_future = executor.submit(
+            _with_retries, "Blog text generation", lambda: _request_article(client, topic_index, topic), attempts
+        )
+        image_future = executor.submit(
+            _with_retries, "Blog image generation", lambda: _request_image(app, client, topic), attempts
+        )
+        try:
+            content = text_future.result()
+        except Exception as exc:  # pragma: no cover - defensive guard
+            logger.exception("Failed to generate blog post text: %s", exc)
+            return None
+        try:
+            image = image_future.result()
+        except Exception as exc:  # pragma: no cover - defensive guard
+            logger.warning("Failed to generate blog image: %s", exc)
+            image = None
+
+    post = BlogPost(
+        title=f"{topic['title']} ({editorial_date.strftime('%d %B %Y')})",
+        is_published=False,
+        editorial_date=editorial_date,
+        publish_at=_publish_time(app, editorial_date),
+    )
+    apply_article(post, content)
+    if image:
+        post.image_data = image.data
+        post.image_mimetype = image.mimetype
+        post.image_filename = f"blog-{editorial_date.isoformat()}-{topic_index + 1}{image.extension}"
+        apply_image_traits(post, image.data)
+    return post
+
+
+def _fill_editorial_buffer(app) -> int:
     with app.app_context():
-        api_key = os.getenv("OPENAI_API_KEY")
+        api_key = tenant_config(app).get("OPENAI_API_KEY")
         if not api_key:
             logger.warning("Skipping blog generation; OPENAI_API_KEY missing.")
-            return False
+            return 0
 
+        today = datetime.datetime.utcnow().date()
+        upcoming = [today + datetime.timedelta(days=offset) for offset in range(app.config["BLOG_BUFFER_DAYS"])]
+        scheduled = {
+            value
+            for (value,) in db.session.query(BlogPost.editorial_date).filter(BlogPost.editorial_date.in_(upcoming))
+        }
         client = OpenAI(api_key=api_key)
-        today = datetime.date.today()
-        topic_index, topic = _select_topic(today)
-        timestamp_label = datetime.datetime.now().strftime("%d %B %Y")
-        logger.info("Generating blog post for topic #%s: %s", topic_index + 1, topic["title"])
+        created = 0
+        for editorial_date in upcoming:
+            if editorial_date in scheduled:
+                continue
+            post = _generate_draft(app, client, editorial_date)
+            if post is None:
+                # Later days would fail the same way; the next run picks the gap up again.
+                break
+            db.session.add(post)
+            try:
+                db.session.commit()
+            except IntegrityError:
+                # Another worker filled this day first; the unique editorial_date keeps one draft.
+                db.session.rollback()
+                continue
+            created += 1
+        return created
 
-        try:
-            completion = client.responses.create(
-                model="gpt-4.1-mini",
-                temperature=0.7,
-                max_output_tokens=1500,
-                input=[
-                    {"role": "system", "content": EDITORIAL_SYSTEM_PROMPT},
-                    {
-                        "role": "user",
-                        "content": (
-                            "Produce today's article for the Voloskyi Saffron blog. "
-                            f"Focus on topic #{topic_index + 1}: {topic['title']} — {topic['angle']}. "
-                            "Incorporate long-tail keywords for premium saffron buyers in Europe, "
-                            "mention Ukrainian provenance where relevant, and ensure the article remains evergreen. "
-                            "Return only HTML as described."
-                        ),
-                    },
-                ],
-            )
-        except Exception as exc:  # pragma: no cover - defensive guard
-            logger.exception("Failed to generate blog post text: %s", exc)
-            return False
 
-        content = completion.output_text
-        post_title = f"{topic['title']} ({timestamp_label})"
-        post = BlogPost(
-            title=post_title,
-            content=content,
+def _publish_due_posts(app) -> List[int]:
+    with app.app_context():
+        now = datetime.datetime.utcnow()
+        statement = (
+            sa.update(BlogPost)
+            .where(BlogPost.is_published == False, BlogPost.publish_at <= now)  # noqa: E712 - expressive equality check
+            .values(
+                is_published=True,
+                created_at=BlogPost.publish_at,
+                updated_at=now,
+                version=BlogPost.version + 1,
+            )
+            .returning(BlogPost.id, BlogPost.version)
+            .execution_options(synchronize_session=False)
         )
+        published = db.session.execute(statement).all()
+        record_changes("blog_post", published, "update")
+        db.session.commit()
+        if published:
+            logger.info("Published %s scheduled blog post(s).", len(published))
+        return [row.id for row in published]
 
-        try:
-            image_response = client.images.generate(
-                model="gpt-image-1",
-                prompt=_build_image_prompt(topic),
-                size="1024x1024",
-                quality="high",
-            )
-            image_base64 = image_response.data[0].b64_json
-            post.image_data = base64.b64decode(image_base64)
-            post.image_mimetype = "image/png"
-            post.image_filename = f"blog-{today.isoformat()}-{topic_index + 1}.png"
-        except Exception as exc:  # pragma: no cover - defensive guard
-            logger.warning("Failed to generate blog image: %s", exc)
 
-        db.session.add(post)
+def trigger_blog_post_generation(app) -> bool:
+    with app.app_context():
+        today = datetime.datetime.utcnow().date()
+        draft = BlogPost.query.filter_by(editorial_date=today).first()
+        if draft is None:
+            api_key = tenant_config(app).get("OPENAI_API_KEY")
+            if not api_key:
+                logger.warning("Skipping blog generation; OPENAI_API_KEY missing.")
+                return False
+            draft = _generate_draft(app, OpenAI(api_key=api_key), today)
+            if draft is None:
+                return False
+            db.session.add(draft)
+        if not draft.is_published:
+            draft.is_published = True
+            draft.publish_at = draft.created_at = datetime.datetime.utcnow()
         db.session.commit()
-        _prune_old_posts()
         return True
 
 
-def trigger_blog_post_generation(app) -> bool:
-    return _generate_blog_post(app)
+def scheduler_status() -> str:
+    if _scheduler is None:
+        return "standby" if _scheduler_standby else "disabled"
+    return "running" if _scheduler.running else "stopped"
 
 
-def start_scheduler(app) -> None:
-    global _scheduler
+def _acquire_scheduler_lock(app) -> bool:
+    global _scheduler_lock
+
+    path = app.config.get("SCHEDULER_LOCK_FILE")
+    if not path or fcntl is None:
+        return True
+    handle = open(path, "a+")
+    try:
+        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        handle.close()
+        return False
+    _scheduler_lock = handle
+    return True
+
+
+def _shutdown_scheduler() -> None:
+    if _scheduler is not None and _scheduler.running:
+        _scheduler.shutdown(wait=False)
 
-    if app.config.get("TESTING"):
+
+def release_scheduler_after_fork() -> None:
+    global _scheduler, _scheduler_lock, _scheduler_standby
+
+    # The scheduler thread stays in the parent; forked workers only keep a stale handle to it.
+    if _scheduler is not None:
+        _scheduler = None
+        _scheduler_standby = True
+    if _scheduler_lock is not None:
+        _scheduler_lock.close()
+        _scheduler_lock = None
+
+
+def start_scheduler(app) -> None:
+    """Run the jobs in this process when SCHEDULER_MODE is "app" (flask run, single-process servers)."""
+    if app.config.get("TESTING") or app.config["SCHEDULER_MODE"] != "app":
         return
 
     if app.config.get("DEBUG") and os.getenv("WERKZEUG_RUN_MAIN") != "true":
         return
 
-    if _scheduler and _scheduler.running:
+    _run_scheduler(app)
+
+
+def start_worker_scheduler(app) -> None:
+    """Called by gunicorn's post_worker_init in SCHEDULER_MODE "worker".
+
+    The app is preloaded in the master, which must never run jobs: it would do the OpenAI calls,
+    image work and VACUUMs itself and fork workers while job threads hold locks. Instead every
+    worker competes for the lock file after it has forked; one runs the jobs and the rest poll, so
+    a standby takes over when the leader is recycled (max_requests) or dies.
+    """
+    if app.config.get("TESTING") or app.config["SCHEDULER_MODE"] != "worker":
         return
+    if _run_scheduler(app):
+        return
+    threading.Thread(target=_await_scheduler_lock, args=(app,), name="scheduler-standby", daemon=True).start()
+
+
+def _await_scheduler_lock(app) -> None:
+    # Polls instead of a blocking flock, which would stall a gevent worker's event loop.
+    while True:
+        time.sleep(SCHEDULER_RETRY_SECONDS)
+        if _run_scheduler(app):
+            return
 
+
+def _run_scheduler(app) -> bool:
+    global _scheduler, _scheduler_standby
+
+    if _scheduler and _scheduler.running:
+        return True
+
+    # One scheduler per host: whichever process holds the lock file runs the jobs.
+    if not _acquire_scheduler_lock(app):
+        if not _scheduler_standby:
+            logger.info("Scheduler lock held by another process; this one stays on standby.")
+        _scheduler_standby = True
+        return False
+
+    _scheduler_standby = False
+    logger.info("Scheduler started in process %s.", os.getpid())
     _scheduler = BackgroundScheduler()
     _scheduler.add_job(
-        func=lambda: _generate_blog_post(app),
+        func=each_tenant(app, _fill_editorial_buffer),
+        trigger="interval",
+        hours=6,
+        id="editorial_buffer",
+        next_run_time=datetime.datetime.now(),
+        replace_existing=True,
+    )
+    _scheduler.add_job(
+        func=each_tenant(app, _publish_due_posts),
+        trigger="interval",
+        minutes=5,
+        id="publish_blog_posts",
+        replace_existing=True,
+    )
+    _scheduler.add_job(
+        func=each_tenant(app, backfill_article_fields),
+        id="backfill_blog_articles",
+        replace_existing=True,
+    )
+    _scheduler.add_job(
+        func=each_tenant(app, backfill_image_traits),
+        id="backfill_image_traits",
+        replace_existing=True,
+    )
+    if app.config.get("SQLITE_TUNED"):
+        _scheduler.add_job(
+            func=lambda: sqlite_checkpoint(app, db),
+            trigger="interval",
+            minutes=app.config["SQLITE_CHECKPOINT_MINUTES"],
+            id="sqlite_checkpoint",
+            replace_existing=True,
+        )
+        _scheduler.add_job(
+            func=lambda: sqlite_maintenance(app, db),
+            trigger="interval",
+            hours=app.config["SQLITE_MAINTENANCE_HOURS"],
+            id="sqlite_maintenance",
+            replace_existing=True,
+        )
+    _scheduler.add_job(
+        func=each_tenant(app, prune_analytics),
+        trigger="interval",
+        hours=24,
+        id="analytics_retention",
+        replace_existing=True,
+    )
+    _scheduler.add_job(
+        func=each_tenant(app, refresh_recommendations),
+        trigger="interval",
+        minutes=5,
+        id="product_recommendations",
+        next_run_time=datetime.datetime.now(),
+        replace_existing=True,
+    )
+    _scheduler.add_job(
+        func=each_tenant(app, release_expired_reservations),
+        trigger="interval",
+        minutes=1,
+        id="release_expired_reservations",
+        replace_existing=True,
+    )
+    _scheduler.add_job(
+        func=each_tenant(app, sync_stripe_catalog),
+        trigger="interval",
+        minutes=1,
+        id="stripe_catalog_sync",
+        replace_existing=True,
+    )
+    _scheduler.add_job(
+        func=each_tenant(app, run_blog_retention),
         trigger="interval",
-        days=1,
-        id="daily_blog_post",
+        hours=6,
+        id="blog_retention",
         replace_existing=True,
     )
     _scheduler.start()
-    atexit.register(lambda: _scheduler.shutdown(wait=False))
+    atexit.register(_shutdown_scheduler)
+    return True
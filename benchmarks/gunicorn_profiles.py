@@ -0,0 +1,146 @@
+"""Compare the gunicorn worker profiles on a seeded throwaway SQLite database.
+
+    python benchmarks/gunicorn_profiles.py [--profiles sync,gthread,gevent] [--concurrency 16] [--seconds 10]
+
+Each profile is started with gunicorn.conf.py, warmed up, then driven by --concurrency client threads
+over a mix of storefront pages. Prints requests per second, latency percentiles and errors.
+"""
+
+import argparse
+import os
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PATHS = ("/", "/shop/", "/shop/api/products?per_page=24", "/blog", "/healthz")
+PRODUCTS = 500
+
+
+def _seed(env: Dict[str, str]) -> None:
+    script = (
+        "from app import app, db\n"
+        "from app.models import Product\n"
+        "with app.app_context():\n"
+        f"    db.session.add_all(Product(title=f'Product {{i}}', description='saffron ' * 40,"
+        f" price=str(i % 90 + 1)) for i in range({PRODUCTS}))\n"
+        "    db.session.commit()\n"
+    )
+    subprocess.run([sys.executable, "-c", script], cwd=ROOT, env=dict(env, SCHEDULER_MODE="off"), check=True)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_ready(base: str, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f"{base}/healthz", timeout=2):
+                return
+        except (urllib.error.URLError, ConnectionError):
+            time.sleep(0.2)
+    raise RuntimeError(f"gunicorn did not answer on {base}")
+
+
+def _drive(base: str, concurrency: int, seconds: float) -> Dict[str, float]:
+    latencies: List[float] = []
+    errors = [0]
+    lock = threading.Lock()
+    stop = time.monotonic() + seconds
+
+    def client(offset: int) -> None:
+        local, failed, n = [], 0, offset
+        while time.monotonic() < stop:
+            path = PATHS[n % len(PATHS)]
+            n += 1
+            started = time.perf_counter()
+            try:
+                with urllib.request.urlopen(f"{base}{path}", timeout=30) as response:
+                    response.read()
+                local.append(time.perf_counter() - started)
+            except (urllib.error.URLError, ConnectionError, TimeoutError):
+                failed += 1
+        with lock:
+            latencies.extend(local)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+
+    latencies.sort()
+    pick = lambda q: latencies[int(q * (len(latencies) - 1))] * 1000 if latencies else 0.0  # noqa: E731
+    return {"rps": len(latencies) / elapsed, "p50": pick(0.5), "p99": pick(0.99), "errors": errors[0]}
+
+
+def run_profile(profile: str, env: Dict[str, str], concurrency: int, seconds: float) -> Dict[str, float]:
+    port = _free_port()
+    env = dict(env, GUNICORN_PROFILE=profile, PORT=str(port))
+    base = f"http://127.0.0.1:{port}"
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "wsgi:app"],
+        cwd=ROOT,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        _wait_ready(base)
+        _drive(base, concurrency, 2)  # warm up every worker's caches
+        return _drive(base, concurrency, seconds)
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=60)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--profiles", default="sync,gthread,gevent")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--workers", default="", help="WEB_CONCURRENCY; defaults to gunicorn.conf.py's sizing")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="gunicorn-bench-")
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{workdir}/bench.db",
+        SECRET_KEY="benchmark",
+        SCHEDULER_LOCK_FILE=os.path.join(workdir, "scheduler.lock"),
+        JINJA_CACHE_DIR=os.path.join(workdir, "jinja"),
+        STRIPE_SYNC_ENABLED="0",
+        GUNICORN_MAX_REQUESTS="0",
+    )
+    if args.workers:
+        env["WEB_CONCURRENCY"] = args.workers
+    try:
+        _seed(env)
+        print(f"{os.cpu_count()} CPU(s), {args.concurrency} clients, {args.seconds:.0f}s per profile")
+        for profile in args.profiles.split(","):
+            result = run_profile(profile, env, args.concurrency, args.seconds)
+            print(
+                f"{profile:8s} {result['rps']:7.1f} req/s  p50 {result['p50']:6.1f}ms  "
+                f"p99 {result['p99']:7.1f}ms  errors {result['errors']}"
+            )
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
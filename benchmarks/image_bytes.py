@@ -0,0 +1,118 @@
+"""Measure the bytes saved by app.images.transcode for each output format and quality.
+
+    python benchmarks/image_bytes.py [--targets webp,avif,jpeg] [--qualities 60,80] [images ...]
+
+Without paths it generates a sample set with Pillow: a camera-sized JPEG with EXIF, a PNG photo, a flat
+PNG screenshot and a PNG with transparency. Prints the original and output sizes, bytes saved and encode
+time per image, then the totals per target and quality. Outputs that would be larger keep the original,
+exactly as uploads do.
+"""
+
+import argparse
+import io
+import mimetypes
+import os
+import shutil
+import sys
+import tempfile
+import time
+from typing import Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _samples() -> List[Tuple[str, bytes, str]]:
+    from PIL import Image, ImageDraw
+
+    def encode(image, format: str, **options) -> bytes:
+        buffer = io.BytesIO()
+        image.save(buffer, format=format, **options)
+        return buffer.getvalue()
+
+    size = (2400, 1600)
+    gradient = Image.linear_gradient("L").resize(size)
+    photo = Image.merge(
+        "RGB", (gradient, Image.effect_noise(size, 24), gradient.transpose(Image.Transpose.FLIP_LEFT_RIGHT))
+    )
+    exif = Image.Exif()
+    exif[0x010F] = "Camera maker"
+
+    screenshot = Image.new("RGB", (1280, 800), (248, 249, 250))
+    draw = ImageDraw.Draw(screenshot)
+    for row in range(0, 800, 40):
+        draw.rectangle((40, row + 8, 1240, row + 28), fill=(220, 224, 228) if row % 80 else (13, 110, 253))
+        draw.text((52, row + 12), f"Saffron 1g - row {row // 40}", fill=(33, 37, 41))
+
+    cutout = photo.resize((800, 800)).convert("RGBA")
+    mask = Image.new("L", cutout.size, 0)
+    ImageDraw.Draw(mask).ellipse((80, 80, 720, 720), fill=255)
+    cutout.putalpha(mask)
+
+    return [
+        ("photo.jpg", encode(photo, "JPEG", quality=92, exif=exif.tobytes()), "image/jpeg"),
+        ("photo.png", encode(photo.resize((1200, 800)), "PNG"), "image/png"),
+        ("screenshot.png", encode(screenshot, "PNG", optimize=True), "image/png"),
+        ("cutout.png", encode(cutout, "PNG"), "image/png"),
+    ]
+
+
+def _files(paths: List[str]) -> List[Tuple[str, bytes, str]]:
+    loaded = []
+    for path in paths:
+        with open(path, "rb") as handle:
+            loaded.append((os.path.basename(path), handle.read(), mimetypes.guess_type(path)[0] or "image/jpeg"))
+    return loaded
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--targets", default="webp,avif,jpeg")
+    parser.add_argument("--qualities", default="60,80")
+    parser.add_argument("images", nargs="*", help="image files to measure instead of the generated samples")
+    args = parser.parse_args()
+
+    # app.images imports the app package, which builds the app; keep that off any real database.
+    workdir = tempfile.mkdtemp(prefix="image-bench-")
+    os.environ.update(
+        DATABASE_URL=f"sqlite:///{workdir}/bench.db",
+        SECRET_KEY="benchmark",
+        SCHEDULER_MODE="off",
+        JINJA_CACHE_DIR=os.path.join(workdir, "jinja"),
+        ANALYTICS_ENABLED="0",
+    )
+    sys.path.insert(0, ROOT)
+    try:
+        from app.images import Image, transcode
+
+        if Image is None:
+            raise SystemExit("Pillow is not installed; uploads are stored as sent.")
+        images = _files(args.images) if args.images else _samples()
+        totals: Dict[Tuple[str, int], List[float]] = {}
+        print(f"{'image':16s} {'target':6s} {'q':>3s} {'original':>10s} {'output':>10s} {'saved':>7s} {'ms':>7s}")
+        for target in args.targets.split(","):
+            for quality in (int(value) for value in args.qualities.split(",")):
+                total = totals.setdefault((target, quality), [0, 0, 0.0])
+                for name, data, mimetype in images:
+                    started = time.perf_counter()
+                    encoded = transcode(io.BytesIO(data), mimetype, target, quality)
+                    elapsed = (time.perf_counter() - started) * 1000
+                    total[0] += encoded.original_size
+                    total[1] += len(encoded.data)
+                    total[2] += elapsed
+                    print(
+                        f"{name:16s} {target:6s} {quality:3d} {encoded.original_size:10d} {len(encoded.data):10d} "
+                        f"{100 * encoded.saved_bytes / encoded.original_size:6.1f}% {elapsed:7.1f}"
+                        + ("" if encoded.saved_bytes else "  (kept original)")
+                    )
+        print()
+        for (target, quality), (original, output, elapsed) in totals.items():
+            print(
+                f"total {target:6s} q{quality:<3d} {original:10d} -> {output:10d} bytes, "
+                f"{100 * (original - output) / original:5.1f}% saved, {elapsed:7.1f} ms"
+            )
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
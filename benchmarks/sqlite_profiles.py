@@ -0,0 +1,161 @@
+"""Compare SQLITE_PROFILE=default and production under concurrent storefront reads and blob writes.
+
+    python benchmarks/sqlite_profiles.py [--profiles default,production] [--readers 4] [--writes 15]
+
+Each profile runs in its own interpreter (config.py reads the profile at import) against a fresh
+database. Reader processes run the catalog query plus a product lookup in a loop. Two writer processes
+insert blog posts with 3 MB images, paced like admin uploads. Prints read throughput and latency,
+write latency and errors (a "database is locked" surfaces as an error).
+"""
+
+import argparse
+import multiprocessing
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PRODUCTS = 2000
+BLOB_SIZE = 3 * 1024 * 1024
+WRITE_PACE_SECONDS = 0.2
+
+
+def _reader(app, db, start, stop, results) -> None:
+    from app.database import dispose_engines_after_fork
+    from app.models import Product
+
+    dispose_engines_after_fork(db)
+    latencies: List[float] = []
+    errors = 0
+    start.wait()
+    while not stop.is_set():
+        started = time.perf_counter()
+        try:
+            with app.test_request_context("/shop/"):
+                Product.query.filter(Product.in_stock).order_by(Product.price_cents, Product.id).limit(24).all()
+                db.session.get(Product, 1 + int(started * 1000) % PRODUCTS)
+                db.session.remove()
+            latencies.append(time.perf_counter() - started)
+        except Exception:
+            errors += 1
+    results.put((latencies, errors))
+
+
+def _writer(app, db, start, writes, results) -> None:
+    from app.database import dispose_engines_after_fork
+    from app.models import BlogPost
+
+    dispose_engines_after_fork(db)
+    blob = os.urandom(BLOB_SIZE)
+    latencies: List[float] = []
+    errors = 0
+    start.wait()
+    for index in range(writes):
+        started = time.perf_counter()
+        with app.app_context():
+            try:
+                db.session.add(
+                    BlogPost(title=f"Post {index}", content="<p>x</p>", image_data=blob, image_mimetype="image/webp")
+                )
+                db.session.commit()
+                latencies.append(time.perf_counter() - started)
+            except Exception:
+                db.session.rollback()
+                errors += 1
+        time.sleep(WRITE_PACE_SECONDS)
+    results.put((latencies, errors))
+
+
+def _percentile(values: List[float], q: float) -> float:
+    return values[int(q * (len(values) - 1))] * 1000 if values else 0.0
+
+
+def _collect(queue, count: int) -> Tuple[List[float], int]:
+    latencies: List[float] = []
+    errors = 0
+    for _ in range(count):
+        chunk, failed = queue.get()
+        latencies.extend(chunk)
+        errors += failed
+    return sorted(latencies), errors
+
+
+def run_profile(readers: int, writes: int) -> None:
+    from app import app, db
+    from app.models import Product
+
+    with app.app_context():
+        db.session.add_all(
+            Product(title=f"Product {i}", description="saffron " * 50, price=str(i % 90 + 1)) for i in range(PRODUCTS)
+        )
+        db.session.commit()
+        db.session.remove()
+
+    context = multiprocessing.get_context("fork")
+    start, stop = context.Event(), context.Event()
+    read_results, write_results = context.Queue(), context.Queue()
+    processes = [context.Process(target=_reader, args=(app, db, start, stop, read_results)) for _ in range(readers)]
+    processes += [context.Process(target=_writer, args=(app, db, start, writes, write_results)) for _ in range(2)]
+    for process in processes:
+        process.start()
+    time.sleep(1)
+    started = time.perf_counter()
+    start.set()
+    write_latencies, write_errors = _collect(write_results, 2)
+    elapsed = time.perf_counter() - started
+    stop.set()
+    read_latencies, read_errors = _collect(read_results, readers)
+    for process in processes:
+        process.join()
+
+    print(
+        f"{app.config['SQLITE_PROFILE']:10s} {len(read_latencies) / elapsed:6.0f} reads/s  "
+        f"p50 {_percentile(read_latencies, 0.5):5.2f}ms  p99 {_percentile(read_latencies, 0.99):7.2f}ms  "
+        f"errors {read_errors} | writes p50 {_percentile(write_latencies, 0.5):6.1f}ms  "
+        f"max {_percentile(write_latencies, 1):7.1f}ms  errors {write_errors}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--profiles", default="default,production")
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--writes", type=int, default=15, help="blob inserts per writer process")
+    parser.add_argument("--run", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        sys.path.insert(0, ROOT)
+        run_profile(args.readers, args.writes)
+        return
+
+    print(f"{os.cpu_count()} CPU(s), {args.readers} reader processes, 2 writers x {args.writes} x 3 MB")
+    for profile in args.profiles.split(","):
+        workdir = tempfile.mkdtemp(prefix="sqlite-bench-")
+        env = dict(
+            os.environ,
+            DATABASE_URL=f"sqlite:///{workdir}/bench.db",
+            SQLITE_PROFILE=profile,
+            SECRET_KEY="benchmark",
+            SCHEDULER_MODE="off",
+            JINJA_CACHE_DIR=os.path.join(workdir, "jinja"),
+            ANALYTICS_ENABLED="0",
+        )
+        command = [sys.executable, os.path.abspath(__file__), "--run", f"--readers={args.readers}"]
+        try:
+            subprocess.run(
+                [*command, f"--writes={args.writes}"],
+                cwd=ROOT,
+                env=env,
+                check=True,
+            )
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,6 @@
 import os
+import tempfile
+
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -6,6 +8,7 @@ load_dotenv()
 
 class Config:
     SECRET_KEY = os.getenv("SECRET_KEY")
+    TESTING = os.getenv("TESTING", "0") == "1"  # skips automatic migrations and the scheduler (tests/conftest.py)
     _database_url = os.getenv("DATABASE_URL") or os.getenv("SQLALCHEMY_DATABASE_URI")
     if not _database_url:
         _database_url = "sqlite:///saffron.db"
@@ -15,16 +18,141 @@ class Config:
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     STRIPE_PUBLIC_KEY = os.getenv("STRIPE_PUBLIC_KEY")
     STRIPE_SECRET_KEY = os.getenv("STRIPE_SECRET_KEY")
+    STRIPE_API_BASE = os.getenv("STRIPE_API_BASE")  # e.g. http://localhost:12111 for stripe-mock
+    STRIPE_CURRENCY = os.getenv("STRIPE_CURRENCY", "eur")
+    STRIPE_TIMEOUT = float(os.getenv("STRIPE_TIMEOUT", "10"))
+    STRIPE_MAX_RETRIES = int(os.getenv("STRIPE_MAX_RETRIES", "2"))
+    STRIPE_SYNC_ENABLED = os.getenv("STRIPE_SYNC_ENABLED", "1") == "1"
+    # Checkout Sessions live 30 minutes to 24 hours. Held stock outlives its session by at least a minute,
+    # so a unit never goes back on sale while its session can still be paid.
+    STRIPE_CHECKOUT_MINUTES = min(max(int(os.getenv("STRIPE_CHECKOUT_MINUTES", "30")), 30), 1440)
+    STOCK_RESERVATION_MINUTES = max(int(os.getenv("STOCK_RESERVATION_MINUTES", "31")), STRIPE_CHECKOUT_MINUTES + 1)
+    # Open (unpaid, unexpired) reservations one client address may hold; stops a script from emptying stock.
+    STOCK_RESERVATIONS_PER_CLIENT = int(os.getenv("STOCK_RESERVATIONS_PER_CLIENT", "3"))
+    STRIPE_PAYMENT_LINKS = os.getenv("STRIPE_PAYMENT_LINKS", "0") == "1"
+    # Change feed cursors trail the newest change by this much, so a transaction that commits a lower
+    # seq after a higher one is still picked up (app/changes.py).
+    CHANGE_FEED_SETTLE_SECONDS = float(os.getenv("CHANGE_FEED_SETTLE_SECONDS", "30"))
+    RECOMMENDATIONS_TOP_N = int(os.getenv("RECOMMENDATIONS_TOP_N", "6"))
+    RECOMMENDATIONS_TEXT_WEIGHT = float(os.getenv("RECOMMENDATIONS_TEXT_WEIGHT", "0.7"))
+    RECOMMENDATIONS_CATEGORY_WEIGHT = float(os.getenv("RECOMMENDATIONS_CATEGORY_WEIGHT", "0.2"))
+    RECOMMENDATIONS_PRICE_WEIGHT = float(os.getenv("RECOMMENDATIONS_PRICE_WEIGHT", "0.1"))
+    RECOMMENDATIONS_REBUILD_HOURS = int(os.getenv("RECOMMENDATIONS_REBUILD_HOURS", "24"))
+    ANALYTICS_ENABLED = os.getenv("ANALYTICS_ENABLED", "1") == "1"
+    ANALYTICS_FLUSH_SECONDS = float(os.getenv("ANALYTICS_FLUSH_SECONDS", "5"))
+    ANALYTICS_POPULAR_DAYS = int(os.getenv("ANALYTICS_POPULAR_DAYS", "30"))
+    ANALYTICS_POPULAR_TTL = int(os.getenv("ANALYTICS_POPULAR_TTL", "300"))
+    ANALYTICS_RETENTION_DAYS = int(os.getenv("ANALYTICS_RETENTION_DAYS", "400"))
     OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
     ASSISTANT_PROMPT = os.getenv("ASSISTANT_PROMPT", "You are a helpful AI sales assistant.")
     SHOP_NAME = os.getenv("SHOP_NAME", "Saffron Shop")
     BASE_URL = os.getenv("BASE_URL", "http://127.0.0.1:5000")
-    DB_SCHEMA = os.getenv("DB_SCHEMA")
-    _schema = os.getenv("DB_SCHEMA")
+    JINJA_CACHE_DIR = os.getenv("JINJA_CACHE_DIR", os.path.join(tempfile.gettempdir(), "saffron-jinja-cache"))
+    COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+    BLOG_BUFFER_DAYS = int(os.getenv("BLOG_BUFFER_DAYS", "3"))
+    BLOG_PUBLISH_HOUR_UTC = int(os.getenv("BLOG_PUBLISH_HOUR_UTC", "7"))
+    BLOG_GENERATION_RETRIES = int(os.getenv("BLOG_GENERATION_RETRIES", "3"))
+    BLOG_IMAGE_FORMAT = os.getenv("BLOG_IMAGE_FORMAT", "webp")
+    BLOG_IMAGE_QUALITY = int(os.getenv("BLOG_IMAGE_QUALITY", "80"))
+    BLOG_RETENTION_MAX_POSTS = int(os.getenv("BLOG_RETENTION_MAX_POSTS", "30"))
+    BLOG_RETENTION_MAX_AGE_DAYS = int(os.getenv("BLOG_RETENTION_MAX_AGE_DAYS", "0"))
+    BLOG_RETENTION_KEEP_PINNED = os.getenv("BLOG_RETENTION_KEEP_PINNED", "1") == "1"
+    BLOG_ARCHIVE_DIR = os.getenv("BLOG_ARCHIVE_DIR")
+    AUTH_USER_CACHE_SIZE = int(os.getenv("AUTH_USER_CACHE_SIZE", "128"))
+    AUTH_USER_CACHE_TTL = int(os.getenv("AUTH_USER_CACHE_TTL", "60"))
+    # Failed logins are counted per account; the per-address limit only slows sprays across many accounts.
+    # Counters live in each worker process, so with N workers a client gets up to N times these attempts.
+    LOGIN_MAX_ATTEMPTS = int(os.getenv("LOGIN_MAX_ATTEMPTS", "5"))
+    LOGIN_MAX_ATTEMPTS_PER_ADDRESS = int(os.getenv("LOGIN_MAX_ATTEMPTS_PER_ADDRESS", "50"))
+    LOGIN_THROTTLE_WINDOW = int(os.getenv("LOGIN_THROTTLE_WINDOW", "300"))
+    # Number of reverse proxies in front of the app (1 on Render). Their X-Forwarded-For/-Proto
+    # headers are trusted, so remote_addr is the client rather than the proxy. 0 trusts none.
+    PROXY_FIX_X_FOR = int(os.getenv("PROXY_FIX_X_FOR", "0"))
+    # "app" starts the background jobs in create_app; "worker" leaves them to gunicorn.conf.py, which
+    # starts them in one worker after forking; "off" runs none (e.g. a second host sharing the database).
+    SCHEDULER_MODE = os.getenv("SCHEDULER_MODE", "app")
+    SCHEDULER_LOCK_FILE = os.getenv(
+        "SCHEDULER_LOCK_FILE", os.path.join(tempfile.gettempdir(), "saffron-scheduler.lock")
+    )
+    READINESS_DB_TIMEOUT = float(os.getenv("READINESS_DB_TIMEOUT", "2"))
+    READINESS_CACHE_SECONDS = float(os.getenv("READINESS_CACHE_SECONDS", "2"))
+    # Many shops per process: a JSON file mapping each shop to its hosts, schema and settings (app/tenancy.py).
+    TENANTS_FILE = os.getenv("TENANTS_FILE")
+    TENANT_DEFAULT = os.getenv("TENANT_DEFAULT")  # shop served for unknown hosts; unset answers them with 404
+    TENANT_MIGRATION_JOBS = int(os.getenv("TENANT_MIGRATION_JOBS", "4"))
+    DB_SCHEMA = None if TENANTS_FILE else os.getenv("DB_SCHEMA")
+    # Transaction-pooling PgBouncer drops session state between transactions and
+    # rejects startup options, so tables are schema-qualified instead and
+    # search_path is re-set with SET LOCAL in every transaction (app/database.py).
+    DB_PGBOUNCER = os.getenv("DB_PGBOUNCER", "0") == "1"
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "5"))
+    DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "10"))
+    DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+    DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1") == "1"
+    # Sent as a startup option; behind PgBouncer it is applied with SET LOCAL at the start of every
+    # transaction instead (app/database.py). Set 0 when the role already has `ALTER ROLE ... SET statement_timeout`.
+    DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "15000"))
+    _schema = DB_SCHEMA
     _options = []
-    if _schema:
+    if _schema and not DB_PGBOUNCER:
         _options.append(f"-c search_path={_schema},public")
-    SQLALCHEMY_ENGINE_OPTIONS = {
-        "pool_pre_ping": True,
-        "connect_args": {"options": " ".join(_options)} if _options else {},
-    }
+    if DB_STATEMENT_TIMEOUT_MS and not DB_PGBOUNCER:
+        _options.append(f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}")
+    _engine_options = {"pool_pre_ping": DB_POOL_PRE_PING}
+    if not _database_url.startswith("sqlite"):
+        _engine_options.update(
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+        )
+    if _options and _database_url.startswith("postgresql"):
+        _engine_options["connect_args"] = {"options": " ".join(_options)}
+    if _schema and DB_PGBOUNCER:
+        _engine_options["execution_options"] = {"schema_translate_map": {None: _schema}}
+
+    # Opt-in single-node SQLite tuning: SQLITE_PROFILE=production turns on WAL, one writer connection per
+    # process and a query_only reader pool. The default keeps stock SQLite (benchmarks/sqlite_profiles.py).
+    SQLITE_PROFILE = os.getenv("SQLITE_PROFILE", "default")
+    SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+    SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536"))
+    SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+    SQLITE_JOURNAL_SIZE_LIMIT = int(os.getenv("SQLITE_JOURNAL_SIZE_LIMIT", str(64 * 1024 * 1024)))
+    SQLITE_WAL_AUTOCHECKPOINT = int(os.getenv("SQLITE_WAL_AUTOCHECKPOINT", "1000"))
+    SQLITE_READER_POOL_SIZE = int(os.getenv("SQLITE_READER_POOL_SIZE", "8"))
+    SQLITE_CHECKPOINT_MINUTES = int(os.getenv("SQLITE_CHECKPOINT_MINUTES", "5"))
+    SQLITE_MAINTENANCE_HOURS = int(os.getenv("SQLITE_MAINTENANCE_HOURS", "24"))
+    SQLITE_VACUUM_FREE_RATIO = float(os.getenv("SQLITE_VACUUM_FREE_RATIO", "0.2"))
+    _sqlite_file = _database_url.startswith("sqlite") and ":memory:" not in _database_url
+    _sqlite_file = _sqlite_file and _database_url.rstrip("/") != "sqlite:"
+    SQLITE_TUNED = _sqlite_file and SQLITE_PROFILE == "production"
+    _sqlite_reader_options = None
+    if SQLITE_TUNED:
+        _sqlite_reader_options = {
+            "url": _database_url,
+            "pool_size": SQLITE_READER_POOL_SIZE,
+            "max_overflow": SQLITE_READER_POOL_SIZE,
+            "pool_timeout": DB_POOL_TIMEOUT,
+        }
+        _engine_options.update(pool_size=1, max_overflow=0, pool_timeout=DB_POOL_TIMEOUT)
+    SQLALCHEMY_ENGINE_OPTIONS = _engine_options
+
+    # Optional streaming replicas for read-only storefront traffic:
+    # DATABASE_URL_REPLICA, DATABASE_URL_REPLICA_1, DATABASE_URL_REPLICA_2, ...
+    _replica_urls = []
+    for _key in sorted(key for key in os.environ if key.startswith("DATABASE_URL_REPLICA")):
+        _replica_url = os.environ[_key]
+        if _replica_url.startswith("postgres://"):
+            _replica_url = _replica_url.replace("postgres://", "postgresql://", 1)
+        if _replica_url:
+            _replica_urls.append(_replica_url)
+    DATABASE_URL_REPLICAS = _replica_urls
+    SQLALCHEMY_BINDS = {}
+    for _index, _replica_url in enumerate(_replica_urls):
+        SQLALCHEMY_BINDS[f"replica_{_index}"] = {"url": _replica_url, **_engine_options}
+    if _sqlite_reader_options:
+        SQLALCHEMY_BINDS["sqlite_reader"] = _sqlite_reader_options
+    DB_REPLICA_MAX_LAG = float(os.getenv("DB_REPLICA_MAX_LAG", "5"))
+    DB_REPLICA_CHECK_INTERVAL = float(os.getenv("DB_REPLICA_CHECK_INTERVAL", "5"))
+    DB_STICKY_SECONDS = int(os.getenv("DB_STICKY_SECONDS", "10"))
@@ -0,0 +1,101 @@
+"""Gunicorn settings. Pick a worker model with GUNICORN_PROFILE=sync|gthread|gevent (default gthread).
+
+The gevent profile needs `pip install gevent psycogreen` on top of requirements.txt.
+"""
+
+import os
+
+PROFILE = os.getenv("GUNICORN_PROFILE", "gthread")
+# Read by config.py when the app is preloaded below: the master must not run the background jobs.
+os.environ.setdefault("SCHEDULER_MODE", "worker")
+
+if PROFILE == "gevent":
+    # With preload_app the application is imported in the master, before the gevent worker
+    # would patch; patch here so ssl, sockets and psycopg2 are cooperative from the start.
+    # gevent is optional (not in requirements.txt); the default gthread profile needs neither package.
+    try:
+        from gevent import monkey
+    except ImportError as exc:
+        raise RuntimeError("GUNICORN_PROFILE=gevent needs gevent: pip install gevent psycogreen") from exc
+
+    monkey.patch_all()
+    try:
+        from psycogreen.gevent import patch_psycopg
+    except ImportError as exc:
+        if os.getenv("DATABASE_URL", "").startswith("postgres"):
+            # Unpatched psycopg2 blocks the whole worker on every query.
+            raise RuntimeError("GUNICORN_PROFILE=gevent on PostgreSQL needs: pip install psycogreen") from exc
+    else:
+        patch_psycopg()
+
+WORKER_MEMORY_MB = int(os.getenv("WEB_WORKER_MEMORY_MB", "160"))
+
+
+def _memory_limit_mb():
+    # Respect the container's cgroup limit first, then fall back to physical memory.
+    for path in ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes"):
+        try:
+            with open(path) as handle:
+                value = handle.read().strip()
+        except OSError:
+            continue
+        if value.isdigit() and int(value) < 1 << 60:
+            return int(value) // (1024 * 1024)
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") // (1024 * 1024)
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def _default_workers():
+    cpus = os.cpu_count() or 1
+    by_cpu = cpus + 1 if PROFILE in ("gthread", "gevent") else 2 * cpus + 1
+    memory = _memory_limit_mb()
+    by_memory = max(memory // WORKER_MEMORY_MB, 1) if memory else by_cpu
+    return max(min(by_cpu, by_memory), 1)
+
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY") or _default_workers())
+worker_class = {"sync": "sync", "gthread": "gthread", "gevent": "gevent"}[PROFILE]
+if PROFILE == "gthread":
+    threads = int(os.getenv("GUNICORN_THREADS", "4"))
+if PROFILE == "gevent":
+    worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", "100"))
+
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = 30
+keepalive = 5
+
+# Load the app once in the master: workers fork with templates and the asset manifest ready.
+# The scheduler starts after the fork, in exactly one worker (post_worker_init).
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") == "1"
+
+# Recycle workers periodically; blob responses fragment the heap and it never shrinks back.
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "1000"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "100"))
+
+accesslog = "-"
+errorlog = "-"
+
+
+def post_fork(server, worker):
+    from app import db
+    from app.database import dispose_engines_after_fork
+    from app.utils import release_scheduler_after_fork
+
+    dispose_engines_after_fork(db)
+    release_scheduler_after_fork()
+
+
+def post_worker_init(worker):
+    from app.utils import start_worker_scheduler
+
+    start_worker_scheduler(worker.wsgi)
+
+
+def worker_exit(server, worker):
+    # Push this worker's buffered view counters before it goes away.
+    from app.analytics import flush_analytics
+
+    flush_analytics()
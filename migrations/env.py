@@ -97,6 +97,13 @@ def run_migrations_online():
     connectable = get_engine()
 
     with connectable.connect() as connection:
+        # Behind PgBouncer DB_SCHEMA arrives as a schema_translate_map, which Alembic's
+        # version table lookup does not honour; point it at the schema explicitly.
+        schema = connection.get_execution_options().get(
+            "schema_translate_map", {}).get(None)
+        if schema and "version_table_schema" not in conf_args:
+            conf_args["version_table_schema"] = schema
+
         context.configure(
             connection=connection,
             target_metadata=get_metadata(),
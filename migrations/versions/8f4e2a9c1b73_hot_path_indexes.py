@@ -0,0 +1,51 @@
+"""hot path indexes
+
+Revision ID: 8f4e2a9c1b73
+Revises: 6d3b5d7f0df1
+Create Date: 2025-11-18 10:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "8f4e2a9c1b73"
+down_revision = "6d3b5d7f0df1"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Storefront listings only ever show available products, newest first.
+    op.create_index(
+        "ix_product_available_created_at",
+        "product",
+        ["created_at"],
+        postgresql_where=sa.text("is_available"),
+        sqlite_where=sa.text("is_available = 1"),
+    )
+    # Category pages and "related products" filter by category among available items.
+    op.create_index(
+        "ix_product_available_category_created_at",
+        "product",
+        ["category_id", "created_at"],
+        postgresql_where=sa.text("is_available"),
+        sqlite_where=sa.text("is_available = 1"),
+    )
+    # Admin listings and category cascades touch every product regardless of availability.
+    op.create_index("ix_product_created_at", "product", ["created_at"])
+    op.create_index("ix_product_category_id", "product", ["category_id"])
+    op.create_index("ix_category_name", "category", ["name"])
+    # Blog lists and retention pruning order by creation date.
+    op.create_index("ix_blog_post_created_at", "blog_post", ["created_at"])
+    op.create_index("ix_document_uploaded_at", "document", ["uploaded_at"])
+
+
+def downgrade():
+    op.drop_index("ix_document_uploaded_at", table_name="document")
+    op.drop_index("ix_blog_post_created_at", table_name="blog_post")
+    op.drop_index("ix_category_name", table_name="category")
+    op.drop_index("ix_product_category_id", table_name="product")
+    op.drop_index("ix_product_created_at", table_name="product")
+    op.drop_index("ix_product_available_category_created_at", table_name="product")
+    op.drop_index("ix_product_available_created_at", table_name="product")
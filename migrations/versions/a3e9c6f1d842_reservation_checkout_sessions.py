@@ -0,0 +1,33 @@
+"""reservation checkout sessions
+
+Revision ID: a3e9c6f1d842
+Revises: f6d3a8c2b951
+Create Date: 2025-12-17 14:05:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "a3e9c6f1d842"
+down_revision = "f6d3a8c2b951"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("stock_reservation", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("checkout_session_id", sa.String(length=255), nullable=True))
+        batch_op.add_column(sa.Column("client_address", sa.String(length=45), nullable=True))
+        batch_op.create_unique_constraint("uq_stock_reservation_checkout_session_id", ["checkout_session_id"])
+        batch_op.create_index(
+            "ix_stock_reservation_client_address_status", ["client_address", "status"], unique=False
+        )
+
+
+def downgrade():
+    with op.batch_alter_table("stock_reservation", schema=None) as batch_op:
+        batch_op.drop_index("ix_stock_reservation_client_address_status")
+        batch_op.drop_constraint("uq_stock_reservation_checkout_session_id", type_="unique")
+        batch_op.drop_column("client_address")
+        batch_op.drop_column("checkout_session_id")
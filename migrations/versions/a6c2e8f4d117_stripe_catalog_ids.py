@@ -0,0 +1,35 @@
+"""stripe catalog ids
+
+Revision ID: a6c2e8f4d117
+Revises: f1b8d4e6a903
+Create Date: 2025-12-03 16:10:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "a6c2e8f4d117"
+down_revision = "f1b8d4e6a903"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("product", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("stripe_product_id", sa.String(length=64), nullable=True))
+        batch_op.add_column(sa.Column("stripe_price_id", sa.String(length=64), nullable=True))
+        batch_op.add_column(sa.Column("stripe_price_cents", sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column("stripe_payment_link_id", sa.String(length=64), nullable=True))
+        batch_op.add_column(sa.Column("stripe_payment_link_url", sa.String(length=255), nullable=True))
+        batch_op.add_column(sa.Column("stripe_synced_version", sa.Integer(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table("product", schema=None) as batch_op:
+        batch_op.drop_column("stripe_synced_version")
+        batch_op.drop_column("stripe_payment_link_url")
+        batch_op.drop_column("stripe_payment_link_id")
+        batch_op.drop_column("stripe_price_cents")
+        batch_op.drop_column("stripe_price_id")
+        batch_op.drop_column("stripe_product_id")
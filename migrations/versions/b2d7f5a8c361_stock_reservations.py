@@ -0,0 +1,48 @@
+"""stock reservations
+
+Revision ID: b2d7f5a8c361
+Revises: a6c2e8f4d117
+Create Date: 2025-12-05 11:20:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "b2d7f5a8c361"
+down_revision = "a6c2e8f4d117"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("product", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("stock", sa.Integer(), nullable=True))
+
+    op.create_table(
+        "stock_reservation",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("token", sa.String(length=36), nullable=False),
+        sa.Column("product_id", sa.Integer(), nullable=False),
+        sa.Column("quantity", sa.Integer(), nullable=False),
+        sa.Column("status", sa.String(length=16), nullable=False),
+        sa.Column("expires_at", sa.DateTime(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["product_id"], ["product.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("token"),
+    )
+    with op.batch_alter_table("stock_reservation", schema=None) as batch_op:
+        batch_op.create_index(batch_op.f("ix_stock_reservation_product_id"), ["product_id"], unique=False)
+        batch_op.create_index("ix_stock_reservation_status_expires_at", ["status", "expires_at"], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table("stock_reservation", schema=None) as batch_op:
+        batch_op.drop_index("ix_stock_reservation_status_expires_at")
+        batch_op.drop_index(batch_op.f("ix_stock_reservation_product_id"))
+
+    op.drop_table("stock_reservation")
+
+    with op.batch_alter_table("product", schema=None) as batch_op:
+        batch_op.drop_column("stock")
@@ -0,0 +1,110 @@
+"""price in cents
+
+Revision ID: b7c3e91d4a28
+Revises: 8f4e2a9c1b73
+Create Date: 2025-11-20 09:30:00.000000
+"""
+
+from decimal import ROUND_HALF_UP, Decimal
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "b7c3e91d4a28"
+down_revision = "8f4e2a9c1b73"
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 500
+
+
+def _product_table(schema=None):
+    return sa.table(
+        "product",
+        sa.column("id", sa.Integer),
+        sa.column("price", sa.Float),
+        sa.column("price_cents", sa.Integer),
+        sa.column("price_display", sa.String),
+        schema=schema,
+    )
+
+
+def _target_schema(bind):
+    # Behind PgBouncer DB_SCHEMA is applied through schema_translate_map, which neither the
+    # inspector nor lightweight sa.table() constructs honour, so name the schema explicitly.
+    return bind.get_execution_options().get("schema_translate_map", {}).get(None)
+
+
+def _to_cents(value) -> int:
+    amount = Decimal(str(value or 0)).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+    return int(amount * 100)
+
+
+def _backfill_cents(bind, product) -> None:
+    # Each batch commits on its own, so an interrupted upgrade resumes from the
+    # rows that still have no price_cents.
+    update = (
+        product.update()
+        .where(product.c.id == sa.bindparam("row_id"))
+        .values(price_cents=sa.bindparam("cents"), price_display=sa.bindparam("display"))
+    )
+    while True:
+        rows = bind.execute(
+            sa.select(product.c.id, product.c.price)
+            .where(product.c.price_cents.is_(None))
+            .order_by(product.c.id)
+            .limit(BATCH_SIZE)
+        ).fetchall()
+        if not rows:
+            break
+        params = []
+        for row_id, price in rows:
+            cents = _to_cents(price)
+            params.append({"row_id": row_id, "cents": cents, "display": f"€{cents // 100}.{cents % 100:02d}"})
+        bind.execute(update, params)
+
+
+def upgrade():
+    bind = op.get_bind()
+    schema = _target_schema(bind)
+    columns = {column["name"] for column in sa.inspect(bind).get_columns("product", schema=schema)}
+    if "price_cents" not in columns:
+        with op.batch_alter_table("product", schema=None) as batch_op:
+            batch_op.add_column(sa.Column("price_cents", sa.Integer(), nullable=True))
+            batch_op.add_column(sa.Column("price_display", sa.String(length=32), nullable=True))
+
+    with op.get_context().autocommit_block():
+        _backfill_cents(bind, _product_table(schema))
+
+    with op.batch_alter_table("product", schema=None) as batch_op:
+        batch_op.alter_column("price_cents", existing_type=sa.Integer(), nullable=False)
+        batch_op.alter_column("price_display", existing_type=sa.String(length=32), nullable=False)
+        batch_op.drop_column("price")
+        batch_op.create_index(
+            "ix_product_available_price",
+            ["price_cents"],
+            postgresql_where=sa.text("is_available"),
+            sqlite_where=sa.text("is_available = 1"),
+        )
+        batch_op.create_index(
+            "ix_product_available_category_price",
+            ["category_id", "price_cents"],
+            postgresql_where=sa.text("is_available"),
+            sqlite_where=sa.text("is_available = 1"),
+        )
+
+
+def downgrade():
+    with op.batch_alter_table("product", schema=None) as batch_op:
+        batch_op.drop_index("ix_product_available_category_price")
+        batch_op.drop_index("ix_product_available_price")
+        batch_op.add_column(sa.Column("price", sa.Float(), nullable=True))
+
+    product = _product_table(_target_schema(op.get_bind()))
+    op.execute(product.update().values(price=product.c.price_cents / 100.0))
+
+    with op.batch_alter_table("product", schema=None) as batch_op:
+        batch_op.alter_column("price", existing_type=sa.Float(), nullable=False)
+        batch_op.drop_column("price_display")
+        batch_op.drop_column("price_cents")
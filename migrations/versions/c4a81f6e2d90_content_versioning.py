@@ -0,0 +1,53 @@
+"""content versioning and change feed
+
+Revision ID: c4a81f6e2d90
+Revises: b7c3e91d4a28
+Create Date: 2025-11-24 11:15:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "c4a81f6e2d90"
+down_revision = "b7c3e91d4a28"
+branch_labels = None
+depends_on = None
+
+VERSIONED_TABLES = {
+    "product": "created_at",
+    "category": "created_at",
+    "blog_post": "created_at",
+    "document": "uploaded_at",
+}
+
+
+def upgrade():
+    for table_name, created_column in VERSIONED_TABLES.items():
+        with op.batch_alter_table(table_name, schema=None) as batch_op:
+            batch_op.add_column(sa.Column("updated_at", sa.DateTime(), nullable=True))
+            batch_op.add_column(sa.Column("version", sa.Integer(), nullable=False, server_default="1"))
+        table = sa.table(table_name, sa.column("updated_at"), sa.column(created_column))
+        op.execute(table.update().values(updated_at=table.c[created_column]))
+        with op.batch_alter_table(table_name, schema=None) as batch_op:
+            batch_op.alter_column("updated_at", existing_type=sa.DateTime(), nullable=False)
+            batch_op.alter_column("version", existing_type=sa.Integer(), server_default=None)
+
+    op.create_table(
+        "content_change",
+        sa.Column("seq", sa.BigInteger().with_variant(sa.Integer(), "sqlite"), nullable=False),
+        sa.Column("entity", sa.String(length=32), nullable=False),
+        sa.Column("entity_id", sa.Integer(), nullable=False),
+        sa.Column("action", sa.String(length=16), nullable=False),
+        sa.Column("version", sa.Integer(), nullable=True),
+        sa.Column("changed_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("seq"),
+    )
+
+
+def downgrade():
+    op.drop_table("content_change")
+    for table_name in reversed(list(VERSIONED_TABLES)):
+        with op.batch_alter_table(table_name, schema=None) as batch_op:
+            batch_op.drop_column("version")
+            batch_op.drop_column("updated_at")
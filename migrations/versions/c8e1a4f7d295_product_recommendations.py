@@ -0,0 +1,37 @@
+"""product recommendations
+
+Revision ID: c8e1a4f7d295
+Revises: b2d7f5a8c361
+Create Date: 2025-12-08 09:40:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "c8e1a4f7d295"
+down_revision = "b2d7f5a8c361"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "product_recommendation",
+        sa.Column("product_id", sa.Integer(), nullable=False),
+        sa.Column("rank", sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column("recommended_id", sa.Integer(), nullable=False),
+        sa.Column("score", sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(["product_id"], ["product.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["recommended_id"], ["product.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("product_id", "rank"),
+    )
+    with op.batch_alter_table("product_recommendation", schema=None) as batch_op:
+        batch_op.create_index(batch_op.f("ix_product_recommendation_recommended_id"), ["recommended_id"], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table("product_recommendation", schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f("ix_product_recommendation_recommended_id"))
+
+    op.drop_table("product_recommendation")
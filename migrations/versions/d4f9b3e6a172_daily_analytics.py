@@ -0,0 +1,52 @@
+"""daily analytics
+
+Revision ID: d4f9b3e6a172
+Revises: c8e1a4f7d295
+Create Date: 2025-12-10 14:05:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "d4f9b3e6a172"
+down_revision = "c8e1a4f7d295"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "daily_product_stat",
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("product_id", sa.Integer(), nullable=False),
+        sa.Column("views", sa.Integer(), nullable=False),
+        sa.Column("mentions", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["product_id"], ["product.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("day", "product_id"),
+    )
+    with op.batch_alter_table("daily_product_stat", schema=None) as batch_op:
+        batch_op.create_index(batch_op.f("ix_daily_product_stat_product_id"), ["product_id"], unique=False)
+
+    op.create_table(
+        "daily_blog_stat",
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("post_id", sa.Integer(), nullable=False),
+        sa.Column("views", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["post_id"], ["blog_post.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("day", "post_id"),
+    )
+    with op.batch_alter_table("daily_blog_stat", schema=None) as batch_op:
+        batch_op.create_index(batch_op.f("ix_daily_blog_stat_post_id"), ["post_id"], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table("daily_blog_stat", schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f("ix_daily_blog_stat_post_id"))
+
+    op.drop_table("daily_blog_stat")
+
+    with op.batch_alter_table("daily_product_stat", schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f("ix_daily_product_stat_product_id"))
+
+    op.drop_table("daily_product_stat")
@@ -0,0 +1,27 @@
+"""blog post pinning
+
+Revision ID: d9e5b2c7a314
+Revises: c4a81f6e2d90
+Create Date: 2025-11-26 14:05:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "d9e5b2c7a314"
+down_revision = "c4a81f6e2d90"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("blog_post", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("is_pinned", sa.Boolean(), nullable=False, server_default=sa.false()))
+    with op.batch_alter_table("blog_post", schema=None) as batch_op:
+        batch_op.alter_column("is_pinned", existing_type=sa.Boolean(), server_default=None)
+
+
+def downgrade():
+    with op.batch_alter_table("blog_post", schema=None) as batch_op:
+        batch_op.drop_column("is_pinned")
@@ -0,0 +1,33 @@
+"""editorial drafts
+
+Revision ID: e3f7a1c9b562
+Revises: d9e5b2c7a314
+Create Date: 2025-11-28 09:20:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "e3f7a1c9b562"
+down_revision = "d9e5b2c7a314"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("blog_post", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("is_published", sa.Boolean(), nullable=False, server_default=sa.true()))
+        batch_op.add_column(sa.Column("publish_at", sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column("editorial_date", sa.Date(), nullable=True))
+        batch_op.create_unique_constraint("uq_blog_post_editorial_date", ["editorial_date"])
+    with op.batch_alter_table("blog_post", schema=None) as batch_op:
+        batch_op.alter_column("is_published", existing_type=sa.Boolean(), server_default=None)
+
+
+def downgrade():
+    with op.batch_alter_table("blog_post", schema=None) as batch_op:
+        batch_op.drop_constraint("uq_blog_post_editorial_date", type_="unique")
+        batch_op.drop_column("editorial_date")
+        batch_op.drop_column("publish_at")
+        batch_op.drop_column("is_published")
@@ -0,0 +1,33 @@
+"""image placeholders
+
+Revision ID: e7a2c5d8b413
+Revises: d4f9b3e6a172
+Create Date: 2025-12-12 10:30:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "e7a2c5d8b413"
+down_revision = "d4f9b3e6a172"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ("product", "blog_post"):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column("image_width", sa.Integer(), nullable=True))
+            batch_op.add_column(sa.Column("image_height", sa.Integer(), nullable=True))
+            batch_op.add_column(sa.Column("image_color", sa.String(length=7), nullable=True))
+            batch_op.add_column(sa.Column("image_placeholder", sa.Text(), nullable=True))
+
+
+def downgrade():
+    for table in ("blog_post", "product"):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_column("image_placeholder")
+            batch_op.drop_column("image_color")
+            batch_op.drop_column("image_height")
+            batch_op.drop_column("image_width")
@@ -0,0 +1,32 @@
+"""blog article fields
+
+Revision ID: f1b8d4e6a903
+Revises: e3f7a1c9b562
+Create Date: 2025-12-01 10:45:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "f1b8d4e6a903"
+down_revision = "e3f7a1c9b562"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing rows are filled in by the backfill job on the next application start.
+    with op.batch_alter_table("blog_post", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("excerpt", sa.String(length=300), nullable=True))
+        batch_op.add_column(sa.Column("meta_description", sa.String(length=300), nullable=True))
+        batch_op.add_column(sa.Column("reading_minutes", sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column("toc", sa.JSON(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table("blog_post", schema=None) as batch_op:
+        batch_op.drop_column("toc")
+        batch_op.drop_column("reading_minutes")
+        batch_op.drop_column("meta_description")
+        batch_op.drop_column("excerpt")
@@ -0,0 +1,40 @@
+"""stripe sync backoff and archive queue
+
+Revision ID: f6d3a8c2b951
+Revises: e7a2c5d8b413
+Create Date: 2025-12-16 09:40:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "f6d3a8c2b951"
+down_revision = "e7a2c5d8b413"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("product", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("stripe_sync_attempts", sa.Integer(), server_default="0", nullable=False))
+        batch_op.add_column(sa.Column("stripe_sync_retry_at", sa.DateTime(), nullable=True))
+
+    op.create_table(
+        "stripe_archive",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("stripe_product_id", sa.String(length=64), nullable=False),
+        sa.Column("stripe_payment_link_id", sa.String(length=64), nullable=True),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("retry_at", sa.DateTime(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+
+
+def downgrade():
+    op.drop_table("stripe_archive")
+
+    with op.batch_alter_table("product", schema=None) as batch_op:
+        batch_op.drop_column("stripe_sync_retry_at")
+        batch_op.drop_column("stripe_sync_attempts")
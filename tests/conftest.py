@@ -0,0 +1,81 @@
+import os
+import shutil
+import tempfile
+
+import pytest
+
+# The app is created when the package is imported, so the environment must be in place first.
+_tmpdir = tempfile.mkdtemp(prefix="saffron-tests-")
+os.environ.update(
+    DATABASE_URL=f"sqlite:///{os.path.join(_tmpdir, 'shop.db')}",
+    SECRET_KEY="tests",
+    TESTING="1",
+    JINJA_CACHE_DIR=os.path.join(_tmpdir, "jinja"),
+    SCHEDULER_LOCK_FILE=os.path.join(_tmpdir, "scheduler.lock"),
+    STRIPE_SYNC_ENABLED="0",
+)
+for _key in [key for key in os.environ if key.startswith("DATABASE_URL_REPLICA")]:
+    del os.environ[_key]
+
+from flask_migrate import upgrade  # noqa: E402
+
+from app import app as flask_app  # noqa: E402
+from app import db  # noqa: E402
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "migrations")
+
+
+@pytest.fixture(scope="session")
+def app():
+    # Built by the migrations rather than create_all, so the tests see the indexes production has.
+    with flask_app.app_context():
+        upgrade(directory=MIGRATIONS_DIR)
+    yield flask_app
+    shutil.rmtree(_tmpdir, ignore_errors=True)
+
+
+@pytest.fixture(autouse=True)
+def _empty_tables(request):
+    yield
+    if "app" not in request.fixturenames:
+        return
+    with flask_app.app_context():
+        db.session.remove()
+        with db.engine.begin() as connection:
+            for table in reversed(db.metadata.sorted_tables):
+                connection.execute(table.delete())
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def admin_client(app, client):
+    from app.models import User
+
+    with app.app_context():
+        user = User(email="admin@example.com")
+        user.set_password("secret")
+        db.session.add(user)
+        db.session.commit()
+        session_id = user.get_id()
+    with client.session_transaction() as session:
+        session["_user_id"] = session_id
+        session["_fresh"] = True
+    return client
+
+
+@pytest.fixture
+def stripe_stub(app, monkeypatch):
+    from app import payments
+    from tests.stripe_stub import StripeStub
+
+    stub = StripeStub().start()
+    monkeypatch.setitem(app.config, "STRIPE_SECRET_KEY", "sk_test_stub")
+    monkeypatch.setitem(app.config, "STRIPE_API_BASE", stub.url)
+    monkeypatch.setitem(app.config, "STRIPE_SYNC_ENABLED", True)
+    monkeypatch.setattr(payments, "_clients", {})
+    yield stub
+    stub.stop()
@@ -0,0 +1,148 @@
+"""A small in-process stand-in for the Stripe API, enough for the catalog sync and checkout.
+
+Objects live in memory, idempotency keys replay the first response like Stripe does, and failures can be
+injected before or after a request is applied (the latter simulates a response lost on the way back).
+"""
+
+import itertools
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qsl
+
+KINDS = {
+    "products": ("product", "prod"),
+    "prices": ("price", "price"),
+    "payment_links": ("payment_link", "plink"),
+    "checkout/sessions": ("checkout.session", "cs"),
+}
+
+
+class _Rejected(Exception):
+    pass
+
+
+class StripeStub:
+    def __init__(self) -> None:
+        self.objects: Dict[str, Dict[str, Any]] = {}
+        self.requests: List[Dict[str, Any]] = []
+        self._failures: List[Dict[str, Any]] = []
+        self._replies: Dict[str, Dict[str, Any]] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def start(self) -> "StripeStub":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def fail(self, method: str, path: str, status: int = 400, after: bool = False, times: int = 1) -> None:
+        """Answer the next ``times`` matching requests with ``status``; ``after`` applies them first."""
+        self._failures.append({"method": method, "path": path, "status": status, "after": after, "times": times})
+
+    def of_kind(self, kind: str) -> List[Dict[str, Any]]:
+        return [obj for obj in self.objects.values() if obj["object"] == kind]
+
+    def create(self, kind: str, **fields: Any) -> Dict[str, Any]:
+        collection = next(name for name, (object_kind, _) in KINDS.items() if object_kind == kind)
+        return self._create(collection, {key: str(value) for key, value in fields.items()})
+
+    def calls(self, method: str, path: str) -> List[Dict[str, Any]]:
+        return [call for call in self.requests if call["method"] == method and call["path"] == path]
+
+    def _create(self, collection: str, params: Dict[str, str]) -> Dict[str, Any]:
+        kind, prefix = KINDS[collection]
+        obj_id = f"{prefix}_{next(self._ids)}"
+        obj: Dict[str, Any] = {"id": obj_id, "object": kind, "active": True, **params}
+        if kind in ("payment_link", "checkout.session"):
+            obj["url"] = f"https://stripe.test/{obj_id}"
+        if kind == "checkout.session":
+            obj.setdefault("status", "open")
+            obj.setdefault("payment_status", "unpaid")
+        self.objects[obj_id] = obj
+        return obj
+
+    def _apply(self, method: str, path: str, params: Dict[str, str]) -> Optional[Dict[str, Any]]:
+        resource = path[len("/v1/") :]
+        if method == "POST" and resource in KINDS:
+            return self._create(resource, params)
+        if method == "POST" and resource.startswith("checkout/sessions/") and resource.endswith("/expire"):
+            obj = self.objects.get(resource.split("/")[2])
+            if obj is not None and obj["status"] != "open":
+                raise _Rejected(f"Only open sessions can be expired; this one is {obj['status']}.")
+            if obj is not None:
+                obj["status"] = "expired"
+            return obj
+        collection, _, obj_id = resource.rpartition("/")
+        obj = self.objects.get(obj_id) if collection in KINDS else None
+        if obj is not None and method == "POST":
+            for key, value in params.items():
+                obj[key] = {"true": True, "false": False}.get(value, value)
+        return obj
+
+    def _respond(self, method: str, path: str, params: Dict[str, str], key: Optional[str]):
+        with self._lock:
+            self.requests.append({"method": method, "path": path, "params": params, "idempotency_key": key})
+            failure = next(
+                (f for f in self._failures if f["times"] and f["method"] == method and path.startswith(f["path"])),
+                None,
+            )
+            if failure and not failure["after"]:
+                failure["times"] -= 1
+                return failure["status"], {"error": {"type": "invalid_request_error", "message": "injected"}}
+            if key and key in self._replies:
+                return 200, self._replies[key]
+            try:
+                obj = self._apply(method, path, params)
+            except _Rejected as exc:
+                return 400, {"error": {"type": "invalid_request_error", "message": str(exc)}}
+            if obj is None:
+                return 404, {"error": {"type": "invalid_request_error", "message": f"No such object: {path}"}}
+            reply = dict(obj)
+            if key:
+                self._replies[key] = reply
+            if failure:
+                failure["times"] -= 1
+                return failure["status"], {"error": {"type": "api_error", "message": "injected"}}
+            return 200, reply
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _handle(self, method: str) -> None:
+                path, _, query = self.path.partition("?")
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0)).decode()
+                params = dict(parse_qsl(body or query))
+                status, payload = stub._respond(method, path, params, self.headers.get("Idempotency-Key"))
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                if status >= 500:
+                    self.send_header("Stripe-Should-Retry", "true")
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self) -> None:
+                self._handle("GET")
+
+            def do_POST(self) -> None:
+                self._handle("POST")
+
+            def log_message(self, *args) -> None:
+                pass
+
+        return Handler
@@ -0,0 +1,55 @@
+from decimal import Decimal
+
+import pytest
+
+from app import bulk_actions, db
+from app.models import ContentChange, Product
+
+
+def _products(*prices):
+    products = []
+    for index, price in enumerate(prices):
+        product = Product(title=f"Product {index}", description="")
+        product.price = price
+        products.append(product)
+    db.session.add_all(products)
+    db.session.commit()
+    return [product.id for product in products]
+
+
+def _logged(action):
+    rows = ContentChange.query.filter_by(action=action).order_by(ContentChange.entity_id).all()
+    return [(row.entity_id, row.version) for row in rows]
+
+
+def test_set_based_writes_log_the_new_versions(app):
+    with app.app_context():
+        first, second = _products("10.00", "20.00")
+        db.session.execute(db.update(Product).where(Product.id == second).values(version=7))
+        db.session.commit()
+
+        assert bulk_actions.reprice_products([first, second], Decimal("10")) == 2
+        assert _logged("update") == [(first, 2), (second, 8)]
+        assert [product.price_cents for product in Product.query.order_by(Product.id)] == [1100, 2200]
+
+        assert bulk_actions.delete_products([first]) == 1
+        assert _logged("delete") == [(first, 2)]
+
+
+@pytest.mark.parametrize("percent", ["Infinity", "-Infinity", "NaN"])
+def test_reprice_rejects_non_finite_percentages(app, percent):
+    with app.app_context():
+        ids = _products("10.00")
+        with pytest.raises(ValueError):
+            bulk_actions.reprice_products(ids, Decimal(percent))
+        assert Product.query.one().price_cents == 1000
+
+
+def test_bulk_reprice_form_reports_non_finite_input(app, admin_client):
+    with app.app_context():
+        ids = _products("10.00")
+    response = admin_client.post(
+        "/admin/products/bulk", data={"ids": ids, "action": "reprice", "percent": "Infinity"}, follow_redirects=True
+    )
+    assert response.status_code == 200
+    assert "Invalid price change" in response.get_data(as_text=True)
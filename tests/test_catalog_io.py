@@ -0,0 +1,110 @@
+import csv
+import io
+import zipfile
+
+from app import catalog_io, db
+from app.catalog_io import IMPORT_BATCH_SIZE
+from app.models import Category, Product
+
+
+def _upload(admin_client, text, filename="products.csv"):
+    return admin_client.post(
+        "/admin/products/import",
+        data={"file": (io.BytesIO(text.encode("utf-8")), filename)},
+        content_type="multipart/form-data",
+    )
+
+
+def test_import_reports_progress_and_rejected_rows(app, admin_client):
+    lines = ["title,price,category,stock"]
+    lines += [f"Product {index},1.00,Spices,{index}" for index in range(IMPORT_BATCH_SIZE + 1)]
+    lines += [",2.00,Spices,1", "No price,abc,Spices,1"]
+    response = _upload(admin_client, "\n".join(lines) + "\n")
+
+    assert response.status_code == 200
+    page = response.get_data(as_text=True)
+    assert f"Batch 1: {IMPORT_BATCH_SIZE} product(s) committed" in page
+    assert "Batch 2: 1 product(s) committed" in page
+    assert "Rejected rows (2)" in page
+    assert f"Row {IMPORT_BATCH_SIZE + 3}: title is required" in page
+    assert f"Row {IMPORT_BATCH_SIZE + 4}: invalid price" in page
+    with app.app_context():
+        assert Product.query.count() == IMPORT_BATCH_SIZE + 1
+
+
+def test_missing_price_is_rejected_not_imported_free(app, admin_client):
+    text = "title,price,category\nNo price,,Spices\nBlank price,  ,Spices\nPriced,0.50,Spices\n"
+    page = _upload(admin_client, text).get_data(as_text=True)
+
+    assert "Row 2: price is required" in page and "Row 3: price is required" in page
+    jsonl = '{"title": "Null price", "price": null}\n{"title": "No key"}\n'
+    page = _upload(admin_client, jsonl, filename="products.jsonl").get_data(as_text=True)
+    assert "Row 1: price is required" in page and "Row 2: price is required" in page
+    with app.app_context():
+        assert [(p.title, p.price_cents) for p in Product.query.all()] == [("Priced", 50)]
+
+
+def test_image_bytes_cap_the_batch(app, admin_client, monkeypatch):
+    monkeypatch.setattr(catalog_io, "IMPORT_BATCH_MAX_BYTES", 2500)
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as bundle:
+        for index in range(5):
+            bundle.writestr(f"photo{index}.png", bytes(1000))
+    archive.seek(0)
+    lines = ["title,price,image"] + [f"Product {index},1.00,photo{index}.png" for index in range(5)]
+    response = admin_client.post(
+        "/admin/products/import",
+        data={
+            "file": (io.BytesIO(("\n".join(lines) + "\n").encode("utf-8")), "products.csv"),
+            "images": (archive, "images.zip"),
+        },
+        content_type="multipart/form-data",
+    )
+
+    page = response.get_data(as_text=True)
+    assert "Batch 1: 3 product(s) committed up to row 4" in page
+    assert "Batch 2: 2 product(s) committed" in page
+    with app.app_context():
+        assert Product.query.count() == 5
+
+
+def test_rejected_row_does_not_create_its_category(app, admin_client):
+    text = (
+        "title,price,category,stock,image\n"
+        "Good,1.00,Kept,1,\n"
+        "Bad stock,1.00,Orphan,lots,\n"
+        "Bad image,1.00,Orphan too,1,missing.png\n"
+    )
+    _upload(admin_client, text)
+
+    with app.app_context():
+        assert [category.name for category in Category.query.all()] == ["Kept"]
+        assert [product.title for product in Product.query.all()] == ["Good"]
+
+
+def test_export_neutralises_formulas_and_round_trips(app, admin_client):
+    with app.app_context():
+        category = Category(name="@Spices")
+        db.session.add(category)
+        db.session.flush()
+        product = Product(title="=HYPERLINK(\"http://evil\")", description="-5 grams", category_id=category.id)
+        product.price = "3.50"
+        db.session.add(product)
+        db.session.commit()
+
+    exported = admin_client.get("/admin/products/export.csv").get_data(as_text=True)
+    row = next(csv.DictReader(io.StringIO(exported)))
+    assert row["title"] == "'=HYPERLINK(\"http://evil\")"
+    assert row["description"] == "'-5 grams"
+    assert row["category"] == "'@Spices"
+
+    with app.app_context():
+        db.session.query(Product).delete()
+        db.session.commit()
+    _upload(admin_client, exported)
+    with app.app_context():
+        (imported,) = Product.query.all()
+        assert imported.title == "=HYPERLINK(\"http://evil\")"
+        assert imported.description == "-5 grams"
+        assert imported.category.name == "@Spices"
+        assert Category.query.count() == 1
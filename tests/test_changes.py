@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy.orm import Session
+
+from app import db
+from app.models import ContentChange, Product
+
+
+def _change(seq, age_seconds):
+    db.session.add(
+        ContentChange(
+            seq=seq,
+            entity="product",
+            entity_id=seq,
+            action="update",
+            version=1,
+            changed_at=datetime.utcnow() - timedelta(seconds=age_seconds),
+        )
+    )
+
+
+def _feed(client, since):
+    return client.get(f"/admin/api/changes?since={since}").get_json()
+
+
+def test_feed_cursor_trails_unsettled_changes(app, admin_client):
+    settle = app.config["CHANGE_FEED_SETTLE_SECONDS"]
+    with app.app_context():
+        _change(1, settle + 60)
+        _change(2, settle + 30)
+        # seq 4 is visible, but seq 3 may still belong to a transaction that has not committed.
+        _change(4, 1)
+        db.session.commit()
+
+    data = _feed(admin_client, 0)
+    assert [item["seq"] for item in data["changes"]] == [1, 2]
+    assert data["next"] == 2
+
+    # The late commit lands below the newest seq and is still delivered from the trailing cursor.
+    with app.app_context():
+        _change(3, 1)
+        db.session.commit()
+        db.session.query(ContentChange).update({"changed_at": datetime.utcnow() - timedelta(seconds=settle + 1)})
+        db.session.commit()
+
+    data = _feed(admin_client, data["next"])
+    assert [item["seq"] for item in data["changes"]] == [3, 4]
+    assert data["next"] == 4
+    assert _feed(admin_client, 4) == {"changes": [], "next": 4}
+
+
+def test_concurrent_edits_each_bump_the_version(app):
+    with app.app_context():
+        product = Product(title="Saffron 1g", description="Spanish saffron", price="9.90")
+        db.session.add(product)
+        db.session.commit()
+        product_id = product.id
+
+        # Both sessions load version 1 before either writes.
+        other = Session(db.engine)
+        mine, theirs = db.session.get(Product, product_id), other.get(Product, product_id)
+        mine.title = "Saffron 2g"
+        db.session.commit()
+        theirs.description = "La Mancha saffron"
+        other.commit()
+        other.close()
+
+        assert mine.version == 3
+        logged = ContentChange.query.filter_by(action="update").order_by(ContentChange.seq).all()
+        assert [change.version for change in logged] == [2, 3]
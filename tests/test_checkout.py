@@ -0,0 +1,176 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import db
+from app.inventory import COMPLETED, HELD, RELEASED, release_expired_reservations, reserve_stock
+from app.models import Product, StockReservation
+
+
+@pytest.fixture
+def product_id(app):
+    with app.app_context():
+        product = Product(title="Saffron 1g", description="Spanish saffron", price="9.90", stock=1)
+        db.session.add(product)
+        db.session.commit()
+        return product.id
+
+
+@pytest.fixture
+def shopper(client):
+    with client.session_transaction() as session:
+        session["_csrf_token"] = "token"
+    return client
+
+
+def _checkout(client, product_id):
+    return client.post(f"/shop/checkout/{product_id}", data={"csrf_token": "token"})
+
+
+def _reservation(app):
+    with app.app_context():
+        reservation = StockReservation.query.one()
+        stock = db.session.get(Product, reservation.product_id).stock
+        db.session.expunge_all()
+        return reservation, stock
+
+
+def _expire_hold(app):
+    with app.app_context():
+        StockReservation.query.update({"expires_at": datetime.utcnow() - timedelta(seconds=1)})
+        db.session.commit()
+
+
+def test_concurrent_buyers_cannot_share_the_last_unit(app, product_id):
+    buyers = 8
+    barrier = threading.Barrier(buyers)
+    results = []
+
+    def buy():
+        with app.app_context():
+            barrier.wait()
+            results.append(reserve_stock(product_id, 1, 31) is not None)
+            db.session.remove()
+
+    threads = [threading.Thread(target=buy) for _ in range(buyers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(results) == [False] * (buyers - 1) + [True]
+    reservation, stock = _reservation(app)
+    assert stock == 0 and reservation.status == HELD
+
+
+def test_checkout_needs_a_post_with_the_session_token(app, client, product_id, stripe_stub):
+    assert client.get(f"/shop/checkout/{product_id}").status_code == 405
+    assert client.post(f"/shop/checkout/{product_id}", data={"csrf_token": "forged"}).status_code == 400
+    with app.app_context():
+        assert db.session.get(Product, product_id).stock == 1
+    assert "Disallow: /shop/checkout/" in client.get("/robots.txt").get_data(as_text=True)
+
+
+def test_checkout_session_expires_before_the_hold(app, shopper, product_id, stripe_stub):
+    started = time.time()
+    response = _checkout(shopper, product_id)
+
+    assert response.status_code == 303
+    (session,) = stripe_stub.of_kind("checkout.session")
+    assert response.headers["Location"] == session["url"]
+    assert session["success_url"].endswith("?session_id={CHECKOUT_SESSION_ID}")
+    expires_at = int(session["expires_at"])
+    assert started + 30 * 60 - 5 <= expires_at <= time.time() + 30 * 60
+    reservation, stock = _reservation(app)
+    assert reservation.checkout_session_id == session["id"] and stock == 0
+    assert reservation.expires_at >= datetime.utcfromtimestamp(expires_at) + timedelta(minutes=1)
+
+
+def test_success_completes_only_a_paid_session(app, shopper, product_id, stripe_stub):
+    _checkout(shopper, product_id)
+    reservation, _ = _reservation(app)
+    session = stripe_stub.objects[reservation.checkout_session_id]
+
+    # Neither the reservation token (it is in the cancel URL too) nor an unpaid session completes it.
+    shopper.get(f"/shop/success?reservation={reservation.token}")
+    shopper.get(f"/shop/success?session_id={session['id']}")
+    assert _reservation(app)[0].status == HELD
+
+    session.update(status="complete", payment_status="paid")
+    assert shopper.get(f"/shop/success?session_id={session['id']}").status_code == 200
+    reservation, stock = _reservation(app)
+    assert reservation.status == COMPLETED and stock == 0
+
+
+def test_cancel_expires_the_session_before_restocking(app, shopper, product_id, stripe_stub):
+    _checkout(shopper, product_id)
+    reservation, _ = _reservation(app)
+
+    shopper.get(f"/shop/cancel?reservation={reservation.token}")
+
+    assert stripe_stub.objects[reservation.checkout_session_id]["status"] == "expired"
+    reservation, stock = _reservation(app)
+    assert reservation.status == RELEASED and stock == 1
+
+
+def test_cancel_after_paying_keeps_the_unit_sold(app, shopper, product_id, stripe_stub):
+    _checkout(shopper, product_id)
+    reservation, _ = _reservation(app)
+    stripe_stub.objects[reservation.checkout_session_id].update(status="complete", payment_status="paid")
+
+    shopper.get(f"/shop/cancel?reservation={reservation.token}")
+
+    reservation, stock = _reservation(app)
+    assert reservation.status == HELD and stock == 0
+
+
+def test_sweeper_releases_only_sessions_stripe_expired(app, shopper, product_id, stripe_stub):
+    _checkout(shopper, product_id)
+    _expire_hold(app)
+
+    assert release_expired_reservations(app) == 1
+
+    reservation, stock = _reservation(app)
+    assert stripe_stub.objects[reservation.checkout_session_id]["status"] == "expired"
+    assert reservation.status == RELEASED and stock == 1
+
+
+def test_sweeper_completes_a_session_paid_without_a_return_visit(app, shopper, product_id, stripe_stub):
+    _checkout(shopper, product_id)
+    reservation, _ = _reservation(app)
+    stripe_stub.objects[reservation.checkout_session_id].update(status="complete", payment_status="paid")
+    _expire_hold(app)
+
+    assert release_expired_reservations(app) == 0
+
+    reservation, stock = _reservation(app)
+    assert reservation.status == COMPLETED and stock == 0
+
+
+def test_sweeper_keeps_the_hold_when_stripe_cannot_answer(app, shopper, product_id, stripe_stub):
+    _checkout(shopper, product_id)
+    _expire_hold(app)
+    stripe_stub.fail("GET", "/v1/checkout/sessions/", status=400)
+
+    assert release_expired_reservations(app) == 0
+
+    reservation, stock = _reservation(app)
+    assert reservation.status == HELD and stock == 0
+
+
+def test_open_reservations_are_capped_per_client(app, shopper, stripe_stub, monkeypatch):
+    monkeypatch.setitem(app.config, "STOCK_RESERVATIONS_PER_CLIENT", 1)
+    with app.app_context():
+        product = Product(title="Saffron 5g", description="Spanish saffron", price="39.00", stock=5)
+        db.session.add(product)
+        db.session.commit()
+        product_id = product.id
+
+    assert _checkout(shopper, product_id).status_code == 303
+    response = _checkout(shopper, product_id)
+
+    assert response.status_code == 302 and response.headers["Location"].endswith(f"/shop/product/{product_id}")
+    with app.app_context():
+        assert db.session.get(Product, product_id).stock == 4
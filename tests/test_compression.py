@@ -0,0 +1,19 @@
+import pytest
+
+
+@pytest.mark.parametrize(
+    "accept_encoding, expected",
+    [
+        ("gzip", "gzip"),
+        ("br;q=1.0, gzip;q=0.5", "br"),
+        ("br;q=0, gzip", "gzip"),
+        ("gzip;q=0", None),
+        ("identity", None),
+    ],
+)
+def test_compression_honours_refused_encodings(client, accept_encoding, expected):
+    response = client.get("/shop/", headers={"Accept-Encoding": accept_encoding})
+    assert response.status_code == 200
+    assert response.content_encoding == expected
+    if expected:
+        assert "Accept-Encoding" in response.vary
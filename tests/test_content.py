@@ -0,0 +1,107 @@
+import pytest
+
+from app.content import process_article
+
+
+def test_script_and_style_are_dropped_with_their_content():
+    article = process_article(
+        "<p>Saffron<script>alert(1)</script> threads</p><style>p { color: red }</style>"
+        "<iframe src='https://evil.test'><p>nested</p></iframe><p>Keep <b onclick='x()'>this</b></p>"
+    )
+
+    assert article.content == "<p>Saffron threads</p><p>Keep <b>this</b></p>"
+    assert article.excerpt == "Saffron threads Keep this"
+
+
+@pytest.mark.parametrize(
+    "href",
+    [
+        "javascript:alert(1)",
+        "JaVaScRiPt:alert(1)",
+        " javascript:alert(1)",
+        "java\tscript:alert(1)",
+        "&#106;avascript:alert(1)",
+        "&#x6A;avascript&#x3A;alert(1)",
+        "java&#x09;script:alert(1)",
+        "javascript&colon;alert(1)",
+        "\x01javascript:alert(1)",
+        "vbscript:msgbox(1)",
+        "data:text/html;base64,PHNjcmlwdD4=",
+    ],
+)
+def test_unsafe_urls_are_dropped(href):
+    article = process_article(f'<p><a href="{href}" title="t">link</a><img src="{href}" alt="a"></p>')
+
+    assert article.content == '<p><a title="t">link</a><img alt="a"></p>'
+
+
+def test_safe_urls_are_kept():
+    content = process_article(
+        '<p><a href="https://example.com/a?b=1&amp;c=2">x</a><a href="/blog">y</a>'
+        '<a href="mailto:shop@example.com">z</a></p>'
+    ).content
+
+    assert 'href="https://example.com/a?b=1&amp;c=2"' in content
+    assert 'href="/blog"' in content and 'href="mailto:shop@example.com"' in content
+
+
+def test_attribute_values_cannot_break_out_of_their_quotes():
+    content = process_article(
+        "<p><a href='/x\" onmouseover=\"alert(1)' title='a\"b<c>'>x</a><img src=/y alt=\"it's\"></p>"
+    ).content
+
+    assert content == (
+        '<p><a href="/x&quot; onmouseover=&quot;alert(1)" title="a&quot;b&lt;c&gt;">x</a>'
+        '<img src="/y" alt="it&#x27;s"></p>'
+    )
+
+
+def test_text_is_escaped():
+    assert process_article("<p>1 &lt; 2 &amp; <b>bold</b></p>").content == "<p>1 &lt; 2 &amp; <b>bold</b></p>"
+
+
+def test_meta_line_becomes_the_description_and_leaves_the_body():
+    article = process_article(
+        "<p>Meta description:  Where the best   saffron grows.</p><p>Intro paragraph.</p>"
+        "<p>meta description: a second one is ignored</p>"
+    )
+
+    assert article.meta_description == "Where the best saffron grows."
+    assert article.content == "<p>Intro paragraph.</p>"
+    assert article.excerpt == "Intro paragraph."
+
+
+def test_meta_line_outside_a_paragraph():
+    article = process_article("Meta description: Bare line.\n<p>Body text.</p>")
+
+    assert article.meta_description == "Bare line."
+    assert article.content == "<p>Body text.</p>"
+
+
+def test_description_falls_back_to_the_excerpt():
+    article = process_article("<p>" + "word " * 100 + "</p>")
+
+    assert len(article.meta_description) <= 161 and article.meta_description.endswith("word…")
+    assert article.reading_minutes == 1
+
+
+def test_toc_anchors_are_generated_and_deduplicated():
+    article = process_article(
+        "<h2>Why Saffron?</h2><p>a</p><h3>Grades &amp; <em>Origins</em></h3>"
+        "<h2>Why saffron</h2><h2>Why Saffron 2</h2><h2>!!!</h2><h4>Not listed</h4>"
+    )
+
+    assert article.toc == [
+        {"level": 2, "id": "why-saffron", "title": "Why Saffron?"},
+        {"level": 3, "id": "grades-origins", "title": "Grades & Origins"},
+        {"level": 2, "id": "why-saffron-2", "title": "Why saffron"},
+        {"level": 2, "id": "why-saffron-2-2", "title": "Why Saffron 2"},
+        {"level": 2, "id": "section", "title": "!!!"},
+    ]
+    assert '<h2 id="why-saffron">Why Saffron?</h2>' in article.content
+    assert '<h3 id="grades-origins">Grades &amp; <em>Origins</em></h3>' in article.content
+    assert "<h4>Not listed</h4>" in article.content
+
+
+def test_unclosed_tags_are_closed():
+    assert process_article("<ul><li>one<li>two</ul><p>open").content == "<ul><li>one</li><li>two</li></ul><p>open</p>"
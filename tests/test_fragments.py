@@ -0,0 +1,36 @@
+import io
+
+import pytest
+
+from app import db
+from app.fragments import render_product_card
+from app.images import backfill_image_traits
+from app.models import Product
+
+Image = pytest.importorskip("PIL.Image")
+
+
+def _png(width, height) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), (200, 120, 20)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def test_backfilled_traits_reach_cached_cards(app):
+    with app.app_context():
+        # Stored before placeholders existed: an image, but no traits.
+        product = Product(title="Saffron 1g", description="Spanish saffron", price="9.90", image_data=_png(64, 48))
+        db.session.add(product)
+        db.session.commit()
+        product_id = product.id
+
+    def card():
+        with app.test_request_context("/shop/"):
+            return str(render_product_card(db.session.get(Product, product_id)))
+
+    assert 'width="64"' not in card()
+
+    assert backfill_image_traits(app) == 1
+
+    rendered = card()
+    assert 'width="64" height="48"' in rendered and "background-color: #" in rendered
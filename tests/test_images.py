@@ -0,0 +1,95 @@
+import base64
+import binascii
+import io
+
+import pytest
+
+from app import images
+from app.images import decode_base64, ingest_base64_image, transcode
+
+Image = pytest.importorskip("PIL.Image")
+
+
+def _photo(mode="RGB", size=(320, 240), format="JPEG", **options) -> bytes:
+    # Noise over a gradient: compresses like a photo rather than a flat test card.
+    gradient = Image.linear_gradient("L").resize(size)
+    noise = Image.effect_noise(size, 48)
+    image = Image.merge("RGB", (gradient, noise, gradient.transpose(Image.Transpose.FLIP_LEFT_RIGHT)))
+    if mode == "RGBA":
+        image.putalpha(gradient)
+    buffer = io.BytesIO()
+    image.save(buffer, format=format, **options)
+    return buffer.getvalue()
+
+
+def test_decode_base64_streams_in_chunks(monkeypatch):
+    monkeypatch.setattr(images, "DECODE_CHUNK_CHARS", 8)
+    data = bytes(range(256)) * 3
+
+    with decode_base64(base64.b64encode(data).decode("ascii")) as decoded:
+        assert decoded.read() == data
+
+
+def test_invalid_base64_is_rejected():
+    with pytest.raises(binascii.Error):
+        decode_base64("not base64!")
+    with pytest.raises(ValueError, match="invalid base64"):
+        ingest_base64_image("not base64!", "image/png")
+
+
+def test_non_images_and_unknown_targets_pass_through():
+    text = transcode(io.BytesIO(b"plain text, not an image"), "image/png")
+    assert (text.data, text.mimetype, text.extension, text.saved_bytes) == (
+        b"plain text, not an image",
+        "image/png",
+        ".png",
+        0,
+    )
+
+    jpeg = _photo()
+    kept = transcode(io.BytesIO(jpeg), "image/jpeg", target="gif")
+    assert (kept.data, kept.mimetype, kept.extension) == (jpeg, "image/jpeg", ".jpeg")
+
+
+def test_output_that_would_grow_keeps_the_original():
+    tiny = io.BytesIO()
+    Image.new("RGB", (1, 1)).save(tiny, format="PNG")
+
+    encoded = transcode(io.BytesIO(tiny.getvalue()), "image/png", target="jpeg", quality=100)
+
+    assert encoded.data == tiny.getvalue() and encoded.mimetype == "image/png"
+
+
+def test_webp_output_is_smaller_and_labelled():
+    png = _photo(format="PNG")
+
+    encoded = transcode(io.BytesIO(png), "image/png")
+
+    assert (encoded.mimetype, encoded.extension, encoded.original_size) == ("image/webp", ".webp", len(png))
+    assert 0 < len(encoded.data) < len(png) and encoded.saved_bytes == len(png) - len(encoded.data)
+    with Image.open(io.BytesIO(encoded.data)) as image:
+        assert image.format == "WEBP" and image.size == (320, 240) and image.mode == "RGB"
+
+
+def test_metadata_is_stripped():
+    exif = Image.Exif()
+    exif[0x010F] = "Camera maker"
+    exif[0x8825] = {2: (50.0, 26.0, 0.0)}  # GPS latitude
+    jpeg = _photo(exif=exif.tobytes(), comment=b"Shot at home", quality=95)
+    with Image.open(io.BytesIO(jpeg)) as original:
+        assert original.getexif() and original.info["comment"]
+
+    for target in ("webp", "jpeg"):
+        encoded = transcode(io.BytesIO(jpeg), "image/jpeg", target=target, quality=60)
+        assert len(encoded.data) < len(jpeg)
+        with Image.open(io.BytesIO(encoded.data)) as image:
+            assert not image.getexif() and not {"exif", "comment", "xmp"} & set(image.info)
+
+
+def test_transparency_survives_webp_and_is_flattened_for_jpeg():
+    png = _photo(mode="RGBA", format="PNG")
+
+    with Image.open(io.BytesIO(transcode(io.BytesIO(png), "image/png").data)) as webp:
+        assert webp.mode == "RGBA"
+    with Image.open(io.BytesIO(transcode(io.BytesIO(png), "image/png", target="jpeg").data)) as jpeg:
+        assert jpeg.mode == "RGB" and jpeg.getpixel((0, 0))[0] > 200
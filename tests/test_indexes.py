@@ -0,0 +1,34 @@
+import pytest
+
+from app import db
+from app.models import Product
+
+
+def _plan(query):
+    compiled = query.statement.compile(dialect=db.engine.dialect, compile_kwargs={"literal_binds": True})
+    rows = db.session.execute(db.text(f"EXPLAIN QUERY PLAN {compiled}")).all()
+    return " | ".join(row[-1] for row in rows)
+
+
+@pytest.mark.parametrize(
+    "filters, order_by, index",
+    [
+        ((), (Product.created_at.desc(),), "ix_product_available_created_at"),
+        ((Product.category_id == 1,), (Product.created_at.desc(),), "ix_product_available_category_created_at"),
+        ((), (Product.price_cents.asc(), Product.id.asc()), "ix_product_available_price"),
+        ((), (Product.price_cents.desc(), Product.id.desc()), "ix_product_available_price"),
+        ((Product.category_id == 1,), (Product.price_cents.asc(),), "ix_product_available_category_price"),
+    ],
+)
+def test_storefront_listings_use_partial_indexes(app, filters, order_by, index):
+    with app.app_context():
+        plan = _plan(Product.query.filter(*filters, Product.in_stock).order_by(*order_by))
+    assert f"USING INDEX {index}" in plan
+    assert "USE TEMP B-TREE FOR ORDER BY" not in plan
+
+
+def test_admin_listing_uses_full_index(app):
+    # Hidden products are listed too, so the partial indexes do not apply.
+    with app.app_context():
+        plan = _plan(Product.query.order_by(Product.created_at.desc()))
+    assert "USING INDEX ix_product_created_at" in plan
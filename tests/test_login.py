@@ -0,0 +1,74 @@
+import pytest
+from werkzeug.middleware.proxy_fix import ProxyFix
+
+from app import auth, create_app, db
+from app.models import User
+from config import Config
+
+
+@pytest.fixture(autouse=True)
+def _reset_throttles():
+    for throttle in (auth.login_throttle, auth.address_throttle):
+        throttle._failures.clear()
+    yield
+    for throttle in (auth.login_throttle, auth.address_throttle):
+        throttle._failures.clear()
+
+
+@pytest.fixture
+def proxied_app(app):
+    class ProxiedConfig(Config):
+        TESTING = True
+        PROXY_FIX_X_FOR = 1
+
+    proxied = create_app(ProxiedConfig)
+    with proxied.app_context():
+        for email in ("first@example.com", "second@example.com"):
+            user = User(email=email)
+            user.set_password("right")
+            db.session.add(user)
+        db.session.commit()
+    return proxied
+
+
+def _login(client, email, password, client_ip):
+    return client.post(
+        "/admin/login",
+        data={"email": email, "password": password},
+        headers={"X-Forwarded-For": client_ip},
+        environ_base={"REMOTE_ADDR": "10.0.0.1"},  # the proxy
+    )
+
+
+def test_proxy_fix_is_opt_in(app, proxied_app):
+    assert not isinstance(app.wsgi_app, ProxyFix)
+    assert isinstance(proxied_app.wsgi_app, ProxyFix)
+
+
+def test_failed_logins_lock_the_account_not_everyone_behind_the_proxy(proxied_app):
+    client = proxied_app.test_client()
+    attempts = proxied_app.config["LOGIN_MAX_ATTEMPTS"]
+    for attempt in range(attempts):
+        assert _login(client, "first@example.com", "wrong", f"203.0.113.{attempt}").status_code == 200
+
+    # Rotating addresses does not help against the account limit...
+    assert _login(client, "first@example.com", "right", "203.0.113.99").status_code == 429
+    # ...and another admin behind the same proxy still signs in.
+    other = proxied_app.test_client()
+    response = _login(other, "second@example.com", "right", "198.51.100.7")
+    assert response.status_code == 302
+    assert response.headers["Location"].endswith("/admin/")
+
+
+def test_address_limit_slows_sprays_across_accounts(proxied_app):
+    proxied_app.config["LOGIN_MAX_ATTEMPTS_PER_ADDRESS"] = 3
+    auth.init_auth(proxied_app)
+    try:
+        client = proxied_app.test_client()
+        for index in range(3):
+            _login(client, f"guess{index}@example.com", "wrong", "203.0.113.5")
+        assert _login(client, "second@example.com", "right", "203.0.113.5").status_code == 429
+        assert _login(client, "second@example.com", "right", "203.0.113.6").status_code == 302
+    finally:
+        proxied_app.config["LOGIN_MAX_ATTEMPTS_PER_ADDRESS"] = Config.LOGIN_MAX_ATTEMPTS_PER_ADDRESS
+        auth.init_auth(proxied_app)
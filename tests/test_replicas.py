@@ -0,0 +1,90 @@
+import shutil
+
+import pytest
+from flask import g
+from flask_migrate import upgrade
+
+from app import create_app, db
+from app.database import STICKY_COOKIE, _mark_replica, _replica_health
+from app.models import Category
+from config import Config
+from tests.conftest import MIGRATIONS_DIR
+
+
+@pytest.fixture
+def replica_app(app, tmp_path):
+    primary_path = tmp_path / "primary.db"
+    replica_path = tmp_path / "replica.db"
+
+    class ReplicaConfig(Config):
+        TESTING = True
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{primary_path}"
+        SQLALCHEMY_ENGINE_OPTIONS = {}
+        SQLALCHEMY_BINDS = {"replica_0": {"url": f"sqlite:///{replica_path}"}}
+        SQLITE_TUNED = False
+
+    replica = create_app(ReplicaConfig)
+    with replica.app_context():
+        upgrade(directory=MIGRATIONS_DIR)
+        db.engine.dispose()
+    # Both files start from the migrated schema; the replica then "lags" by never receiving later writes.
+    shutil.copy(primary_path, replica_path)
+    _replica_health.clear()
+    with replica.app_context():
+        db.session.add(Category(name="On the primary"))
+        db.session.commit()
+    yield replica
+    with replica.app_context():
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+    _replica_health.clear()
+
+
+def _names():
+    return [category.name for category in Category.query.order_by(Category.id).all()]
+
+
+def test_storefront_reads_hit_the_replica(replica_app):
+    with replica_app.test_request_context("/shop/", method="GET"):
+        assert _names() == []
+
+
+def test_admin_reads_stay_on_the_primary(replica_app):
+    with replica_app.test_request_context("/admin/", method="GET"):
+        assert _names() == ["On the primary"]
+
+
+def test_writes_hit_the_primary(replica_app):
+    with replica_app.test_request_context("/shop/", method="GET"):
+        db.session.add(Category(name="Written"))
+        db.session.commit()
+    with replica_app.app_context():
+        primary = db.session.execute(db.select(Category.name).order_by(Category.id), bind_arguments={"bind": db.engine})
+        assert primary.scalars().all() == ["On the primary", "Written"]
+        replica = db.engines["replica_0"]
+        with replica.connect() as connection:
+            assert connection.execute(db.select(db.func.count(Category.id))).scalar() == 0
+
+
+def test_reads_after_a_write_stay_on_the_primary(replica_app):
+    with replica_app.test_request_context("/shop/", method="GET"):
+        db.session.add(Category(name="Pending"))
+        db.session.flush()
+        assert _names() == ["On the primary", "Pending"]
+        db.session.commit()
+        # Read-your-writes for the rest of the request, and a sticky cookie for the next ones.
+        assert _names() == ["On the primary", "Pending"]
+        assert g.db_sticky is True
+
+
+def test_sticky_cookie_pins_follow_up_requests_to_the_primary(replica_app):
+    with replica_app.test_request_context("/shop/", method="GET", headers={"Cookie": f"{STICKY_COOKIE}=9999999999"}):
+        assert _names() == ["On the primary"]
+
+
+def test_unhealthy_replica_falls_back_to_the_primary(replica_app):
+    replica_app.config["DB_REPLICA_CHECK_INTERVAL"] = 3600
+    _mark_replica("replica_0", False)
+    with replica_app.test_request_context("/shop/", method="GET"):
+        assert _names() == ["On the primary"]
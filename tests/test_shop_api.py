@@ -0,0 +1,78 @@
+import pytest
+
+from app import db
+from app.models import Product
+from app.routes.shop import PRODUCTS_PER_PAGE_MAX
+
+
+def _product(title, **fields):
+    product = Product(title=title, description=f"{title} description", **fields)
+    product.price = fields.pop("price", "9.99")
+    db.session.add(product)
+    return product
+
+
+def _titles(response):
+    return sorted(item["title"] for item in response.get_json()["products"])
+
+
+def test_hidden_products_are_never_listed_publicly(app, client):
+    with app.app_context():
+        _product("Visible")
+        _product("Hidden", is_available=False)
+        _product("Sold out", stock=0)
+        db.session.commit()
+
+    for available in ("1", "0", "any"):
+        response = client.get(f"/shop/api/products?available={available}")
+        assert response.status_code == 200
+        assert _titles(response) == ["Visible"]
+
+
+def test_staff_can_list_hidden_products(app, admin_client):
+    with app.app_context():
+        _product("Visible")
+        _product("Hidden", is_available=False)
+        db.session.commit()
+
+    assert _titles(admin_client.get("/shop/api/products?available=0")) == ["Hidden"]
+    assert _titles(admin_client.get("/shop/api/products?available=any")) == ["Hidden", "Visible"]
+
+
+def test_products_are_paginated_with_a_hard_cap(app, client):
+    with app.app_context():
+        for index in range(PRODUCTS_PER_PAGE_MAX + 5):
+            _product(f"Product {index:03d}", price=f"{index + 1}.00")
+        db.session.commit()
+
+    data = client.get("/shop/api/products?sort=price_asc&per_page=1000").get_json()
+    assert data["total"] == PRODUCTS_PER_PAGE_MAX + 5
+    assert data["per_page"] == PRODUCTS_PER_PAGE_MAX
+    assert len(data["products"]) == PRODUCTS_PER_PAGE_MAX
+
+    second = client.get(f"/shop/api/products?sort=price_asc&per_page={PRODUCTS_PER_PAGE_MAX}&page=2").get_json()
+    assert [item["title"] for item in second["products"]] == [
+        f"Product {index:03d}" for index in range(PRODUCTS_PER_PAGE_MAX, PRODUCTS_PER_PAGE_MAX + 5)
+    ]
+
+
+def test_facets_only_request_skips_the_product_rows(app, client):
+    with app.app_context():
+        _product("Visible", image_width=640, image_height=480)
+        db.session.commit()
+
+    data = client.get("/shop/api/products?per_page=0").get_json()
+    assert data["products"] == []
+    assert data["total"] == 1
+    assert sum(bucket["count"] for bucket in data["facets"]["price_buckets"]) == 1
+
+    (item,) = client.get("/shop/api/products").get_json()["products"]
+    assert (item["image_width"], item["image_height"]) == (640, 480)
+
+
+@pytest.mark.parametrize("value", ["nan", "-NaN", "snan", "inf", "-Infinity", "abc", "1e100"])
+def test_malformed_price_bounds_are_rejected(app, client, value):
+    for name in ("min_price", "max_price"):
+        response = client.get(f"/shop/api/products?{name}={value}")
+        assert response.status_code == 400
+        assert response.get_json() == {"error": "Invalid price range."}
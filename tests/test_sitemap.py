@@ -0,0 +1,68 @@
+import gzip
+
+import pytest
+
+from app import db, sitemap
+from app.models import ContentChange, Product
+
+
+@pytest.fixture(autouse=True)
+def _fresh_sitemap():
+    sitemap._states.clear()
+    yield
+    sitemap._states.clear()
+
+
+def test_each_encoding_has_its_own_etag(app, client):
+    with app.app_context():
+        product = Product(title="Saffron", description="Threads")
+        product.price = "9.99"
+        db.session.add(product)
+        db.session.commit()
+
+    compressed = client.get("/sitemap.xml", headers={"Accept-Encoding": "gzip"})
+    identity = client.get("/sitemap.xml", headers={"Accept-Encoding": "gzip;q=0"})
+
+    assert compressed.content_encoding == "gzip"
+    assert identity.content_encoding is None
+    assert gzip.decompress(compressed.data) == identity.data
+    assert b"/shop/product/" in identity.data
+    assert compressed.headers["ETag"] != identity.headers["ETag"]
+    assert "Accept-Encoding" in compressed.vary and "Accept-Encoding" in identity.vary
+
+    # A tag only revalidates the representation it was issued for.
+    gzip_etag = compressed.headers["ETag"]
+    assert client.get("/sitemap.xml", headers={"Accept-Encoding": "gzip", "If-None-Match": gzip_etag}).status_code == 304
+    assert client.get("/sitemap.xml", headers={"Accept-Encoding": "identity", "If-None-Match": gzip_etag}).status_code == 200
+
+
+def test_rendering_does_not_hold_the_global_lock(app, client, monkeypatch):
+    render = sitemap._render_documents
+    held = []
+
+    def checked_render():
+        held.append(sitemap._lock.locked())
+        return render()
+
+    monkeypatch.setattr(sitemap, "_render_documents", checked_render)
+    assert client.get("/sitemap.xml").status_code == 200
+    assert held == [False]
+
+
+def test_late_commit_below_the_newest_seq_refreshes_the_sitemap(app, client):
+    with app.app_context():
+        db.session.add(ContentChange(seq=5, entity="product", entity_id=0, action="update", version=1))
+        db.session.commit()
+    assert b"/shop/product/" not in client.get("/sitemap.xml").data
+
+    # A transaction that took seq 3 commits after seq 5 was read: the max seq does not move.
+    with app.app_context():
+        product = Product(title="Saffron", description="Threads", price="9.99")
+        db.session.add(product)
+        db.session.flush()
+        db.session.query(ContentChange).filter(ContentChange.seq > 5).update({"seq": 3})
+        db.session.commit()
+    for state in sitemap._states.values():
+        state["checked_at"] = float("-inf")
+
+    assert b"/shop/product/" in client.get("/sitemap.xml").data
@@ -0,0 +1,61 @@
+import pytest
+from flask_migrate import upgrade
+from sqlalchemy import text
+
+from app import create_app, db
+from app.database import SQLITE_READER_BIND
+from app.models import Category
+from config import Config
+from tests.conftest import MIGRATIONS_DIR
+
+
+@pytest.fixture
+def tuned_app(app, tmp_path):
+    url = f"sqlite:///{tmp_path / 'tuned.db'}"
+
+    class TunedConfig(Config):
+        TESTING = True
+        SQLALCHEMY_DATABASE_URI = url
+        SQLITE_PROFILE = "production"
+        SQLITE_TUNED = True
+        SQLALCHEMY_ENGINE_OPTIONS = {"pool_size": 1, "max_overflow": 0}
+        SQLALCHEMY_BINDS = {SQLITE_READER_BIND: {"url": url, "pool_size": 2, "max_overflow": 2}}
+
+    tuned = create_app(TunedConfig)
+    with tuned.app_context():
+        upgrade(directory=MIGRATIONS_DIR)
+        db.session.add(Category(name="Spices"))
+        db.session.commit()
+    yield tuned
+    with tuned.app_context():
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+def test_tuned_profile_is_opt_in():
+    assert Config.SQLITE_PROFILE == "default"
+    assert not Config.SQLITE_TUNED
+    assert SQLITE_READER_BIND not in Config.SQLALCHEMY_BINDS
+
+
+def test_selects_use_the_reader_and_text_goes_to_the_writer(tuned_app):
+    with tuned_app.app_context():
+        reader, writer = db.engines[SQLITE_READER_BIND], db.engine
+        assert db.session.get_bind(clause=db.select(Category.id)) is reader
+        assert db.session.get_bind(clause=text("SELECT 1")) is writer
+        assert db.session.get_bind(clause=text("SELECT 1").columns(db.column("x"))) is writer
+        assert db.session.get_bind(clause=db.select(Category.id).with_for_update()) is writer
+
+
+def test_text_writes_succeed_under_the_tuned_profile(tuned_app):
+    with tuned_app.app_context():
+        db.session.execute(text("UPDATE category SET name = :name"), {"name": "Saffron"})
+        renamed = db.session.execute(
+            text("UPDATE category SET description = 'red' RETURNING id").columns(db.column("id"))
+        ).all()
+        db.session.commit()
+        assert len(renamed) == 1
+        assert [(c.name, c.description) for c in Category.query.all()] == [("Saffron", "red")]
+        # Reads moved back to the reader once the write committed.
+        assert db.session.get_bind(clause=db.select(Category.id)) is db.engines[SQLITE_READER_BIND]
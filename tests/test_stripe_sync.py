@@ -0,0 +1,128 @@
+from datetime import datetime, timedelta
+
+from app import bulk_actions, db
+from app.models import Category, Product, StripeArchive
+from app.payments import sync_stripe_catalog
+
+
+def _add_product(app, title="Saffron 1g", price="9.90", **fields) -> int:
+    with app.app_context():
+        product = Product(title=title, description="Spanish saffron", price=price, **fields)
+        db.session.add(product)
+        db.session.commit()
+        return product.id
+
+
+def _product(app, product_id):
+    with app.app_context():
+        product = db.session.get(Product, product_id)
+        db.session.expunge_all()
+        return product
+
+
+def test_sync_creates_product_and_price(app, stripe_stub):
+    product_id = _add_product(app)
+
+    assert sync_stripe_catalog(app) == 1
+
+    product = _product(app, product_id)
+    (stripe_product,) = stripe_stub.of_kind("product")
+    (price,) = stripe_stub.of_kind("price")
+    assert product.stripe_product_id == stripe_product["id"]
+    assert product.stripe_price_id == price["id"]
+    assert price["unit_amount"] == "990" and price["product"] == stripe_product["id"]
+    assert stripe_product["default_price"] == price["id"]
+    assert product.stripe_synced_version == product.version
+    assert sync_stripe_catalog(app) == 0
+
+
+def test_reprice_creates_new_price_and_archives_old(app, stripe_stub):
+    product_id = _add_product(app)
+    sync_stripe_catalog(app)
+    old_price_id = _product(app, product_id).stripe_price_id
+
+    with app.app_context():
+        db.session.get(Product, product_id).price = "12.50"
+        db.session.commit()
+    assert sync_stripe_catalog(app) == 1
+
+    product = _product(app, product_id)
+    assert product.stripe_price_id != old_price_id
+    assert stripe_stub.objects[old_price_id]["active"] is False
+    assert stripe_stub.objects[product.stripe_price_id]["unit_amount"] == "1250"
+    assert stripe_stub.objects[product.stripe_product_id]["default_price"] == product.stripe_price_id
+    assert len(stripe_stub.of_kind("product")) == 1
+
+
+def test_lost_response_is_retried_idempotently(app, stripe_stub):
+    _add_product(app)
+    # Stripe creates the product but the reply never arrives; the client retries with the same key.
+    stripe_stub.fail("POST", "/v1/products", status=500, after=True)
+
+    assert sync_stripe_catalog(app) == 1
+
+    creates = stripe_stub.calls("POST", "/v1/products")
+    assert len(creates) == 2
+    assert creates[0]["idempotency_key"] == creates[1]["idempotency_key"]
+    assert len(stripe_stub.of_kind("product")) == 1
+
+
+def test_failing_product_backs_off_without_blocking_the_rest(app, stripe_stub, monkeypatch):
+    monkeypatch.setattr("app.payments.SYNC_BATCH_SIZE", 1)
+    failing_id = _add_product(app, title="Rejected")
+    other_id = _add_product(app, title="Fine")
+    stripe_stub.fail("POST", "/v1/prices", status=400)
+
+    assert sync_stripe_catalog(app) == 0
+    failing = _product(app, failing_id)
+    assert failing.stripe_sync_attempts == 1 and failing.stripe_sync_retry_at > datetime.utcnow()
+    assert failing.stripe_product_id  # kept, so the retry reuses it
+
+    assert sync_stripe_catalog(app) == 1
+    assert _product(app, other_id).stripe_price_id
+
+    with app.app_context():
+        db.session.get(Product, failing_id).stripe_sync_retry_at = datetime.utcnow() - timedelta(seconds=1)
+        db.session.commit()
+    assert sync_stripe_catalog(app) == 1
+    failing = _product(app, failing_id)
+    assert failing.stripe_sync_attempts == 0 and failing.stripe_sync_retry_at is None
+    assert len(stripe_stub.of_kind("product")) == 2
+
+
+def test_recycled_row_id_gets_fresh_idempotency_keys(app, stripe_stub):
+    first_id = _add_product(app, title="Old")
+    sync_stripe_catalog(app)
+    with app.app_context():
+        bulk_actions.delete_products([first_id])
+
+    second_id = _add_product(app, title="New")
+    assert second_id == first_id  # SQLite reuses the highest deleted rowid
+    sync_stripe_catalog(app)
+
+    keys = [call["idempotency_key"] for call in stripe_stub.calls("POST", "/v1/products")]
+    assert len(keys) == 2 and keys[0] != keys[1]
+    assert _product(app, second_id).stripe_product_id != stripe_stub.of_kind("product")[0]["id"]
+
+
+def test_deleted_products_are_archived_in_stripe(app, stripe_stub):
+    with app.app_context():
+        category = Category(name="Spices")
+        db.session.add(category)
+        db.session.commit()
+        category_id = category.id
+    bulk_id = _add_product(app, title="Bulk deleted")
+    cascade_id = _add_product(app, title="Category deleted", category_id=category_id)
+    sync_stripe_catalog(app)
+    stripe_ids = {_product(app, bulk_id).stripe_product_id, _product(app, cascade_id).stripe_product_id}
+
+    with app.app_context():
+        bulk_actions.delete_products([bulk_id])
+        db.session.delete(db.session.get(Category, category_id))
+        db.session.commit()
+        assert StripeArchive.query.count() == 2
+
+    assert sync_stripe_catalog(app) == 2
+    assert all(stripe_stub.objects[stripe_id]["active"] is False for stripe_id in stripe_ids)
+    with app.app_context():
+        assert StripeArchive.query.count() == 0
@@ -0,0 +1,146 @@
+import json
+from datetime import datetime
+
+import pytest
+from flask import Blueprint, Flask
+
+from app import auth, db, sitemap, tenancy
+from app.fragments import render_product_card
+from app.models import Product, User
+from app.tenancy import _Registry, load_tenants, tenant_context, tenant_key
+
+SPECS = {
+    "saffron": {"hosts": ["Saffron.example", "www.saffron.example"], "schema": "shop_saffron"},
+    "vanilla": {"hosts": ["vanilla.example"], "config": {"SHOP_NAME": "Vanilla", "STRIPE_SECRET_KEY": "env:VANILLA_SK"}},
+}
+
+
+def _load(tmp_path, specs):
+    path = tmp_path / "tenants.json"
+    path.write_text(json.dumps(specs))
+    return load_tenants(str(path))
+
+
+@pytest.fixture
+def shops(tmp_path, monkeypatch):
+    monkeypatch.setenv("VANILLA_SK", "sk_vanilla")
+    return _load(tmp_path, SPECS)
+
+
+def test_load_tenants_reads_hosts_schemas_and_private_config(shops):
+    saffron, vanilla = shops["saffron"], shops["vanilla"]
+
+    assert saffron.schema == "shop_saffron" and saffron.hosts == ("saffron.example", "www.saffron.example")
+    assert vanilla.schema == "vanilla" and vanilla.search_path == '"vanilla"'
+    assert vanilla.config["STRIPE_SECRET_KEY"] == "sk_vanilla" and vanilla.config["SHOP_NAME"] == "Vanilla"
+    assert saffron.config["BASE_URL"] == "https://saffron.example"
+    # Unset private keys are None, so they never fall through to the process config.
+    assert saffron.config["STRIPE_SECRET_KEY"] is None and saffron.config["OPENAI_API_KEY"] is None
+
+
+@pytest.mark.parametrize(
+    "specs, message",
+    [
+        ({"Saffron": {}}, "lowercase SQL identifiers"),
+        ({"saffron": {"schema": "shop-saffron"}}, "lowercase SQL identifiers"),
+        ({"saffron": {"schema": "pg_catalog"}}, "not pg_*"),
+        ({"saffron": {"schema": 'x"; drop'}}, "lowercase SQL identifiers"),
+        ({"saffron": {"config": {"SECRET_KEY": "x", "SQLALCHEMY_DATABASE_URI": "y"}}}, "SECRET_KEY, SQLALCHEMY"),
+        ({"a": {"hosts": ["shop.example"]}, "b": {"hosts": ["SHOP.example"]}}, "'shop.example' is claimed by"),
+        ({"a": {"schema": "shop"}, "b": {"schema": "shop"}}, "'schema:shop' is claimed by both 'a' and 'b'"),
+        ({"shop": {}, "b": {"schema": "shop"}}, "'schema:shop' is claimed"),
+    ],
+)
+def test_load_tenants_rejects_invalid_specs(tmp_path, specs, message):
+    with pytest.raises(ValueError, match=message.replace("*", r"\*")):
+        _load(tmp_path, specs)
+
+
+@pytest.fixture
+def tenant_app(shops):
+    # init_tenancy needs PostgreSQL; host resolution only needs the registry and the request hooks.
+    app = Flask(__name__)
+    hosts = {host: tenant for tenant in shops.values() for host in tenant.hosts}
+    app.extensions["tenancy"] = _Registry(tenants=shops, hosts=hosts, default=None)
+    app.before_request(tenancy._resolve_tenant)
+    app.teardown_request(tenancy._release_tenant)
+    health = Blueprint("health", __name__)
+    health.add_url_rule("/healthz", "healthz", lambda: "ok")
+    app.register_blueprint(health)
+    app.add_url_rule("/", "index", lambda: tenant_key())
+    return app
+
+
+def test_requests_resolve_their_shop_by_host(tenant_app):
+    client = tenant_app.test_client()
+
+    assert client.get("/", headers={"Host": "saffron.example"}).get_data(as_text=True) == "saffron"
+    assert client.get("/", headers={"Host": "WWW.Saffron.example:8443"}).get_data(as_text=True) == "saffron"
+    assert client.get("/", headers={"Host": "vanilla.example"}).get_data(as_text=True) == "vanilla"
+    # The shop is released at teardown, so nothing leaks into code running after the request.
+    assert tenant_key() == ""
+
+
+def test_unknown_host_is_not_found_except_for_health_checks(tenant_app):
+    client = tenant_app.test_client()
+
+    assert client.get("/", headers={"Host": "other.example"}).status_code == 404
+    assert client.get("/healthz", headers={"Host": "10.0.0.7:8000"}).status_code == 200
+
+
+def test_unknown_host_falls_back_to_the_default_shop(tenant_app, shops):
+    tenant_app.extensions["tenancy"].default = shops["vanilla"]
+
+    assert tenant_app.test_client().get("/", headers={"Host": "other.example"}).get_data(as_text=True) == "vanilla"
+
+
+def test_product_cards_are_cached_per_shop(app, shops):
+    updated_at = datetime(2026, 1, 1)
+
+    def card(shop, title):
+        product = Product(id=1, title=title, description="", price="9.90", version=1, updated_at=updated_at)
+        with app.test_request_context("/shop/"), tenant_context(shops[shop]):
+            return str(render_product_card(product))
+
+    assert "Saffron 1g" in card("saffron", "Saffron 1g")
+    # Same id, version and timestamp in another shop's schema: a different product.
+    assert "Vanilla pod" in card("vanilla", "Vanilla pod")
+    assert "Saffron 1g" in card("saffron", "Renamed elsewhere")
+
+
+def test_session_users_are_cached_per_shop(app, shops, monkeypatch):
+    monkeypatch.setattr(auth, "_user_cache", auth._UserCache(max_entries=8, ttl=60))
+    with app.app_context():
+        user = User(email="admin@example.com")
+        user.set_password("secret")
+        db.session.add(user)
+        db.session.commit()
+        session_id = user.get_id()
+
+    def load(shop):
+        with app.test_request_context("/admin/"), tenant_context(shops[shop]):
+            return auth.load_session_user(session_id)
+
+    assert load("saffron").email == "admin@example.com"
+    with app.app_context():
+        User.query.delete()
+        db.session.commit()
+    # Cached for the shop that loaded it; user ids repeat across schemas, so no other shop reuses it.
+    assert load("saffron") is not None
+    assert load("vanilla") is None
+
+
+def test_sitemaps_are_cached_per_shop(app, shops):
+    sitemap._states.clear()
+
+    def urls(shop):
+        with app.test_request_context("/sitemap.xml"), tenant_context(shops[shop]):
+            return sitemap.get_sitemap_document("sitemap.xml")[0].decode()
+
+    try:
+        assert "https://saffron.example/" in urls("saffron")
+        vanilla = urls("vanilla")
+        assert "https://vanilla.example/" in vanilla and "saffron.example" not in vanilla
+        assert set(sitemap._states) == {"saffron", "vanilla"}
+    finally:
+        sitemap._states.clear()
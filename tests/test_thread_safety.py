@@ -0,0 +1,92 @@
+"""db.session must be private to each request, whether requests run on threads (gthread) or greenlets (gevent)."""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app import db
+from app.models import Category, Product
+
+WORKERS = 8
+
+
+def _session_is_private(app, barrier, name):
+    with app.app_context():
+        db.session.add(Category(name=name))
+        barrier.wait()  # every worker now has an uncommitted object in "its" session
+        pending = sorted(obj.name for obj in db.session.new)
+        session_id = id(db.session())
+        db.session.rollback()
+        return pending, session_id
+
+
+def test_each_thread_gets_its_own_session(app):
+    barrier = threading.Barrier(WORKERS)
+    with ThreadPoolExecutor(max_workers=WORKERS) as executor:
+        results = list(executor.map(lambda i: _session_is_private(app, barrier, f"thread-{i}"), range(WORKERS)))
+
+    assert [pending for pending, _ in results] == [[f"thread-{i}"] for i in range(WORKERS)]
+    assert len({session_id for _, session_id in results}) == WORKERS
+
+
+def test_each_greenlet_gets_its_own_session(app):
+    gevent = pytest.importorskip("gevent")
+    from gevent.lock import Semaphore
+
+    arrived = []
+    gate = Semaphore(0)
+
+    class GreenletBarrier:
+        def wait(self):
+            arrived.append(1)
+            if len(arrived) == WORKERS:
+                for _ in range(WORKERS):
+                    gate.release()
+            gate.acquire()
+
+    barrier = GreenletBarrier()
+    greenlets = [gevent.spawn(_session_is_private, app, barrier, f"greenlet-{i}") for i in range(WORKERS)]
+    gevent.joinall(greenlets, raise_error=True)
+    results = [greenlet.value for greenlet in greenlets]
+
+    assert [pending for pending, _ in results] == [[f"greenlet-{i}"] for i in range(WORKERS)]
+    assert len({session_id for _, session_id in results}) == WORKERS
+
+
+def test_concurrent_requests_across_blueprints(app, admin_client):
+    with app.app_context():
+        products = []
+        for index in range(WORKERS):
+            product = Product(title=f"Threaded {index}", description="Saffron threads")
+            product.price = "5.00"
+            products.append(product)
+        db.session.add_all(products)
+        db.session.commit()
+        product_ids = [product.id for product in products]
+    session_cookie = admin_client.get_cookie("session")
+
+    def worker(index):
+        client = app.test_client()
+        client.set_cookie("session", session_cookie.value)
+        product_id = product_ids[index]
+        statuses = []
+        for _ in range(5):
+            page = client.get(f"/shop/product/{product_id}")
+            # A response rendered from another request's session would show another product.
+            assert f"Threaded {index}" in page.get_data(as_text=True)
+            statuses.append(page.status_code)
+            for path in ("/", "/shop/", "/shop/api/products", "/blog", "/sitemap.xml", "/healthz", "/admin/products"):
+                statuses.append(client.get(path).status_code)
+            toggle = "make_unavailable" if index % 2 else "make_available"
+            response = client.post("/admin/products/bulk", data={"ids": [product_id], "action": toggle})
+            statuses.append(response.status_code)
+            client.post("/admin/products/bulk", data={"ids": [product_id], "action": "make_available"})
+        return statuses
+
+    with ThreadPoolExecutor(max_workers=WORKERS) as executor:
+        statuses = [status for result in executor.map(worker, range(WORKERS)) for status in result]
+
+    assert set(statuses) <= {200, 302}
+    with app.app_context():
+        assert Product.query.filter_by(is_available=True).count() == WORKERS